@@ -5,6 +5,9 @@ from time import time
 
 from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
 
+from app.core.realtime_frames import decode_audio_frame, encode_ack
+from app.core.realtime_pipeline import PipelinedIngest
+from app.core.settings import settings
 from app.schema.classroom import (
     ClassroomEndRequest,
     ClassroomEndResponse,
@@ -12,7 +15,7 @@ from app.schema.classroom import (
     ClassroomOpenResponse,
     RealtimeAudioFrame,
 )
-from app.schema.classroom_queries import FinalReportResponse, StageSummariesResponse
+from app.schema.classroom_queries import FinalReportResponse, ReportDraftResponse, StageSummariesResponse
 
 
 router = APIRouter(tags=["classroom"])
@@ -43,20 +46,45 @@ async def get_stage_summaries(session_id: str, request: Request) -> StageSummari
 async def get_final_report(session_id: str, request: Request) -> FinalReportResponse:
     ctx = request.app.state.ctx
     report = await ctx.get_final_report(session_id)
-    return FinalReportResponse(ok=True, session_id=session_id, report=report)
+    job = await ctx.get_final_report_job(session_id)
+    return FinalReportResponse(ok=True, session_id=session_id, report=report, job=job)
+
+
+@router.get("/classroom/{session_id}/report_draft", response_model=ReportDraftResponse)
+async def get_report_draft(session_id: str, request: Request) -> ReportDraftResponse:
+    ctx = request.app.state.ctx
+    draft = await ctx.get_report_draft(session_id)
+    return ReportDraftResponse(ok=True, session_id=session_id, draft=draft)
 
 
 @router.websocket("/classroom/realtime")
 async def classroom_realtime_ws(websocket: WebSocket):
+    """
+    文本消息为 JSON 帧（audio_chunk 为 base64）；二进制消息为 realtime_frames 定义的二进制帧（原始音频），
+    同一连接可以混用。二进制帧的 ack 会带回客户端的 seq。
+
+    ?pipeline=1 开启流水线模式（见 PipelinedIngest）：每帧必须带严格递增的 seq，服务端不逐帧应答，
+    而是按 ack_every / ack_ms 发送累计 ack；window 为在途窗口，超过服务端上限时取上限。
+    """
     ctx = websocket.app.state.ctx
     await websocket.accept()
+    if websocket.query_params.get("pipeline") in ("1", "true"):
+        await _classroom_realtime_pipelined(websocket, ctx)
+        return
     try:
         while True:
-            raw = await websocket.receive_text()
-            data = json.loads(raw)
-            frame = RealtimeAudioFrame.model_validate(data)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            raw = message.get("bytes")
+            if raw is not None:
+                frame = decode_audio_frame(raw)
+                await ctx.handle_realtime_audio_frame(frame)
+                await websocket.send_text(encode_ack(time(), frame.seq))
+                continue
+            frame = RealtimeAudioFrame.model_validate_json(message.get("text") or "")
             await ctx.handle_realtime_audio_frame(frame)
-            await websocket.send_text(json.dumps({"ok": True, "timestamp": time()}, ensure_ascii=False))
+            await websocket.send_text(encode_ack(time()))
     except WebSocketDisconnect:
         return
     except Exception as e:
@@ -64,3 +92,50 @@ async def classroom_realtime_ws(websocket: WebSocket):
             await websocket.send_text(json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False))
         except Exception:
             pass
+
+
+def _query_int(websocket: WebSocket, name: str, default: int) -> int:
+    value = websocket.query_params.get(name)
+    return int(value) if value else default
+
+
+async def _classroom_realtime_pipelined(websocket: WebSocket, ctx) -> None:
+    async def send(text: str) -> None:
+        # 连接断开后已入队的帧仍要处理完（否则客户端重连重传时只会重复已落库的帧），ack 发送失败直接忽略
+        try:
+            await websocket.send_text(text)
+        except Exception:
+            pass
+
+    try:
+        pipeline = PipelinedIngest(
+            handle=ctx.handle_realtime_audio_frame,
+            send=send,
+            window=min(_query_int(websocket, "window", settings.realtime_pipeline_window), settings.realtime_pipeline_window),
+            ack_every=_query_int(websocket, "ack_every", settings.realtime_pipeline_ack_every),
+            ack_ms=_query_int(websocket, "ack_ms", settings.realtime_pipeline_ack_ms),
+        )
+    except ValueError as e:
+        await websocket.send_text(json.dumps({"ok": False, "error": f"bad pipeline params: {e}"}, ensure_ascii=False))
+        return
+    await websocket.send_text(pipeline.hello())
+    pipeline.start()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                await pipeline.close()
+                return
+            raw = message.get("bytes")
+            if raw is not None:
+                frame = decode_audio_frame(raw)
+            else:
+                frame = RealtimeAudioFrame.model_validate_json(message.get("text") or "")
+            await pipeline.submit(frame)
+    except WebSocketDisconnect:
+        await pipeline.close()
+    except Exception as e:
+        # 已入队的帧照常处理并 ack，再报告出错原因（处理协程自身失败时已经报告过）
+        await pipeline.close()
+        if not pipeline.failed:
+            await send(json.dumps({"ok": False, "error": str(e)}, ensure_ascii=False))
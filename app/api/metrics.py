@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Request
+
+from app.schema.metrics import RuntimeMetricsResponse
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics/runtime", response_model=RuntimeMetricsResponse)
+async def runtime_metrics(request: Request) -> RuntimeMetricsResponse:
+    ctx = request.app.state.ctx
+    return RuntimeMetricsResponse(ok=True, metrics=ctx.runtime_metrics())
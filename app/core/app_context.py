@@ -1,21 +1,39 @@
 from __future__ import annotations
 
 import asyncio
-from time import time
+import uuid
+from time import perf_counter, time
 
-from redis.asyncio import Redis
+import httpx
+from redis.asyncio import BlockingConnectionPool, Redis
 
+from app.core.asr_client import AsrConfig, AsrResult, AsrSpeaker, VolcengineAsrWsClient
 from app.core.event_bus import EventBus
-from app.core.asr_client import VolcengineAsrWsClient
 from app.core.classroom_session_manager import ClassroomSessionManager
+from app.core.context_cache import SessionContextCache
+from app.core.final_report import FinalReportGenerator, ProgressFn, ReportDrafter
+from app.core.job_workers import JobWorkerPool
+from app.core.realtime_frames import BinaryAudioFrame, utterance_from_frame
 from app.core.schedulers import StageSummaryScheduler
 from app.core.settings import settings
-from app.core.summarization import LlmSummarizer
+from app.core.summarization import LlmSummarizer, format_utterance_line
+from app.infra.codec import FactCodec
 from app.infra.redis_fact_store import RedisFactStore
-from app.llm.ark_client import ArkChatClient
+from app.infra.redis_job_queue import Job, RedisJobQueue
+from app.infra.redis_session_lease import RedisSessionLeaseManager
+from app.infra.timeline import build_timeline
+from app.infra.utterance_write_behind import UtteranceWriteBehind
+from app.llm.admission import PRIORITY_COMMAND, PRIORITY_FINAL, PRIORITY_STAGE, LlmAdmissionController
+from app.llm.ark_client import ArkChatClient, ArkClientError
+from app.llm.prompt_builder import build_estimator
+from app.llm.resilience import CircuitBreaker, RetryPolicy
+from app.llm.response_cache import LlmResponseCache
+from app.llm.single_flight import SingleFlight
+from app.multimodal.audio_buffer import SessionAudioBuffer
+from app.multimodal.vad import VadBatcher, VadConfig, VoiceActivityDetector
 from app.schema.events import EmittedEvent
 from app.schema.agent_command import AgentCommandRequest
-from app.schema.classroom import ClassroomOpenRequest, RealtimeAudioFrame, UtteranceFact
+from app.schema.classroom import ClassroomOpenRequest, RealtimeAudioFrame
 
 
 class AppContext:
@@ -30,128 +48,531 @@ class AppContext:
 
     def __init__(self) -> None:
         self.event_bus = EventBus()
-        self.session_manager = ClassroomSessionManager()
+        self.asr_config = (
+            AsrConfig(
+                url=settings.asr_ws_url,
+                app_key=settings.asr_app_key,
+                access_key=settings.asr_access_key,
+                resource_id=settings.asr_resource_id,
+                sample_rate=settings.asr_sample_rate,
+                queue_frames=settings.asr_queue_frames,
+                reconnect_max_s=settings.asr_reconnect_max_s,
+                final_timeout_s=settings.asr_final_timeout_s,
+                end_window_ms=settings.asr_end_window_ms or (
+                    max(200, settings.vad_hangover_ms - 100) if settings.vad_enabled else 0
+                ),
+            )
+            if settings.asr_enabled
+            else None
+        )
+        self.session_manager = ClassroomSessionManager(asr_factory=self._new_asr_client)
+        self.vad: VadBatcher | None = None
+        if self.asr_config is not None and settings.vad_enabled:
+            self.vad = VadBatcher(
+                VoiceActivityDetector(
+                    VadConfig(
+                        sample_rate=settings.asr_sample_rate,
+                        min_energy_db=settings.vad_min_energy_db,
+                        snr_db=settings.vad_snr_db,
+                        hangover_ms=settings.vad_hangover_ms,
+                    ),
+                    backend=settings.vad_backend,
+                ),
+                self._forward_speech,
+                batch_ms=settings.vad_batch_ms,
+            )
 
-        self.redis: Redis = Redis.from_url(settings.redis_url, decode_responses=False)
-        self.store = RedisFactStore(self.redis)
+        # 有上限的阻塞连接池：连接用满时排队等待，而不是每个并发命令新建一条连接
+        self.redis: Redis = Redis(
+            connection_pool=BlockingConnectionPool.from_url(
+                settings.redis_url,
+                max_connections=max(1, settings.redis_max_connections),
+                decode_responses=False,
+            )
+        )
+        self.store = RedisFactStore(
+            self.redis,
+            timeline=build_timeline(
+                settings.timeline_backend,
+                stream_maxlen=settings.timeline_stream_maxlen,
+                stream_skew_s=settings.timeline_stream_skew_s,
+            ),
+            codec=FactCodec(
+                settings.fact_codec,
+                compress=settings.fact_codec_compress,
+                compress_min_bytes=settings.fact_codec_compress_min_bytes,
+            ),
+        )
+        self.utterance_writer = UtteranceWriteBehind(
+            self.store,
+            flush_ms=settings.utterance_flush_ms,
+            batch_size=settings.utterance_batch_size,
+        )
 
         if not settings.ark_api_key:
             raise RuntimeError("缺少 ARK_API_KEY：请通过环境变量配置火山方舟 API Key。")
+        self.llm_admission = LlmAdmissionController(
+            max_concurrency=settings.llm_max_concurrency,
+            requests_per_s=settings.llm_requests_per_s,
+            tokens_per_min=settings.llm_tokens_per_min,
+        )
         self.llm_client = ArkChatClient(
             base_url=settings.ark_base_url,
             api_key=settings.ark_api_key,
             model=settings.ark_model,
+            timeout_s=settings.ark_timeout_s,
+            retry=RetryPolicy(
+                max_attempts=settings.ark_retry_max_attempts,
+                base_s=settings.ark_retry_base_ms / 1000,
+                max_s=settings.ark_retry_max_ms / 1000,
+            ),
+            hedge_quantile=settings.ark_hedge_quantile if settings.ark_hedge_enabled else None,
+            hedge_min_delay_s=settings.ark_hedge_min_delay_ms / 1000,
+            breaker=(
+                CircuitBreaker(
+                    failure_threshold=settings.ark_breaker_failure_threshold,
+                    reset_s=settings.ark_breaker_reset_s,
+                )
+                if settings.ark_breaker_failure_threshold > 0
+                else None
+            ),
+            admission=self.llm_admission,
+            expected_output_tokens=settings.llm_expected_output_tokens,
+            single_flight=SingleFlight() if settings.llm_single_flight else None,
+        )
+        self.llm_cache: LlmResponseCache | None = None
+        if settings.llm_cache_enabled:
+            self.llm_cache = LlmResponseCache(
+                self.redis,
+                lru_size=settings.llm_cache_lru_size,
+                ttl_s=settings.llm_cache_ttl_s,
+            )
+        self.summarizer = LlmSummarizer(
+            self.llm_client,
+            cache=self.llm_cache,
+            cache_kinds=frozenset(k.strip() for k in settings.llm_cache_kinds.split(",") if k.strip()),
+            prompt_budgets={
+                PRIORITY_STAGE: settings.llm_stage_prompt_tokens,
+                PRIORITY_FINAL: settings.llm_final_prompt_tokens,
+                PRIORITY_COMMAND: settings.llm_command_prompt_tokens,
+            },
+            estimator=build_estimator(settings.llm_tokenizer),
         )
-        self.summarizer = LlmSummarizer(self.llm_client)
+        self.context_cache: SessionContextCache | None = None
+        # 缓存只感知本进程的写入：切分调度时阶段总结由其他 worker 写入，缓存会缺失，因此不启用
+        if settings.context_cache_enabled and not settings.stage_summary_partition:
+            self.context_cache = SessionContextCache(max_lines=settings.context_cache_lines)
 
-        self.stage_scheduler = StageSummaryScheduler(store=self.store, summarizer=self.summarizer, settings=settings)
+        leases = None
+        if settings.stage_summary_partition:
+            leases = RedisSessionLeaseManager(self.redis, ttl_s=settings.stage_summary_lease_ttl_s)
+        self.stage_scheduler = StageSummaryScheduler(
+            store=self.store,
+            summarizer=self.summarizer,
+            settings=settings,
+            leases=leases,
+            on_stage_summary=self._on_stage_summary,
+        )
+        self.report_drafter: ReportDrafter | None = None
+        if settings.report_draft_enabled:
+            self.report_drafter = ReportDrafter(
+                store=self.store,
+                summarizer=self.summarizer,
+                concurrency=settings.report_draft_concurrency,
+            )
+        self.final_report = FinalReportGenerator(store=self.store, summarizer=self.summarizer, settings=settings)
+        self.final_report_queue = RedisJobQueue(
+            self.redis,
+            name="final_report",
+            visibility_s=settings.final_report_visibility_s,
+            max_attempts=settings.final_report_max_attempts,
+            retry_base_s=settings.final_report_retry_base_s,
+        )
+        self.final_report_workers: JobWorkerPool | None = None
+        if settings.final_report_workers > 0:
+            self.final_report_workers = JobWorkerPool(
+                queue=self.final_report_queue,
+                handler=self._run_final_report_job,
+                concurrency=settings.final_report_workers,
+                poll_interval_s=settings.final_report_poll_interval_s,
+                on_dead=self._on_final_report_dead,
+            )
         self._bg_started = False
 
     async def start_background(self) -> None:
         if self._bg_started:
             return
         self._bg_started = True
+        try:
+            await self.store.rebuild_running_index()
+        except Exception:
+            pass
+        if settings.utterance_flush_ms > 0:
+            self.utterance_writer.start()
         self.stage_scheduler.start()
+        if self.final_report_workers is not None:
+            self.final_report_workers.start()
 
     async def shutdown(self) -> None:
+        # 先把 VAD 积压的帧交给 ASR，再关闭 ASR 连接，让最后的定稿分句进入 write-behind 缓冲再刷盘
+        if self.vad is not None:
+            self.vad.flush()
+        clients = [s.asr for s in self.session_manager.sessions() if s.asr is not None]
+        if clients:
+            await asyncio.gather(*(c.close() for c in clients), return_exceptions=True)
+        await self.utterance_writer.close()
         await self.stage_scheduler.stop()
+        if self.report_drafter is not None:
+            await self.report_drafter.stop()
+        if self.final_report_workers is not None:
+            await self.final_report_workers.stop()
         await self.llm_client.aclose()
         await self.redis.aclose()
+        # 外部传入的连接池不随 aclose 关闭
+        await self.redis.connection_pool.disconnect()
 
     async def open_classroom(self, req: ClassroomOpenRequest) -> None:
         session = await self.session_manager.create(req.session_id)
+        if settings.audio_buffer_max_mb_per_session > 0:
+            session.audio = SessionAudioBuffer(
+                max_bytes=int(settings.audio_buffer_max_mb_per_session * 1024 * 1024),
+                track_seconds=settings.audio_buffer_track_seconds,
+                sample_rate=settings.asr_sample_rate,
+            )
         await self.store.init_classroom(req.session_id, req.model_dump())
+        self.stage_scheduler.on_session_opened(req.session_id)
+        if self.context_cache is not None:
+            self.context_cache.open(req.session_id)
+        if self.report_drafter is not None:
+            self.report_drafter.open(req.session_id)
 
-        session.asr = VolcengineAsrWsClient(session_id=req.session_id)
-        await session.asr.connect()
+        await session.ensure_asr()
 
     async def end_classroom(self, session_id: str, end_time: float) -> None:
         await self.session_manager.mark_ending(session_id)
         await self.store.set_status(session_id, "ENDING")
+        # 等 ASR 返回最后的定稿分句并写入缓冲，随后的 flush 才是完整的
+        session = self.session_manager.lookup(session_id)
+        if self.vad is not None:
+            self.vad.forget(session_id)
+        if session.asr is not None:
+            await session.asr.close()
+        session.audio = None
 
         await asyncio.sleep(0)
+        await self.utterance_writer.flush(session_id)
 
         await self.store.set_status(session_id, "ENDED")
         await self.session_manager.mark_ended(session_id)
-        asyncio.create_task(self._generate_final_report(session_id), name=f"final-report-{session_id}")
-
-    async def _generate_final_report(self, session_id: str) -> None:
-        utterances = await self.store.list_utterances(session_id, start_ts_exclusive=0.0, limit=5000)
-        stage_summaries = await self.store.list_stage_summaries(session_id, limit=2000)
-
-        utter_text = "\n".join(
-            [f"[{u.get('role')}][{u.get('user_name')}] {u.get('text')}" for u in utterances if u.get("text")]
-        ).strip()
-        stage_text = "\n".join(
-            [f"[{s.get('timestamp')}] {s.get('summary')}" for s in stage_summaries if s.get("summary")]
-        ).strip()
-
-        report = await self.summarizer.summarize_final(
-            utterances_text=utter_text,
-            stage_summaries_text=stage_text,
-            course_meta_text=None,
+        self.stage_scheduler.on_session_ended(session_id)
+        if self.context_cache is not None:
+            self.context_cache.discard(session_id)
+        if self.report_drafter is not None:
+            self.report_drafter.discard(session_id)
+        await self.final_report_queue.enqueue(session_id)
+        if self.final_report_workers is not None:
+            self.final_report_workers.wake()
+
+    def _on_stage_summary(self, session_id: str, summary: dict) -> None:
+        if self.context_cache is not None:
+            self.context_cache.on_stage_summary(session_id, summary)
+        if self.report_drafter is not None:
+            self.report_drafter.on_stage_summary(session_id, summary)
+
+    async def _run_final_report_job(self, job: Job, progress: ProgressFn) -> None:
+        await self._generate_final_report(job.job_id, on_progress=progress)
+
+    async def _on_final_report_dead(self, job: Job, error: str) -> None:
+        await self.event_bus.publish(
+            job.job_id,
+            EmittedEvent(
+                type="final_report_failed",
+                timestamp=time(),
+                payload={"session_id": job.job_id, "attempts": job.attempts, "error": error},
+            ),
         )
-        report_payload = {"session_id": session_id, "timestamp": time(), "result": report}
+
+    async def _generate_final_report(self, session_id: str, *, on_progress: ProgressFn | None = None) -> None:
+        report = await self.final_report.generate(session_id, on_progress=on_progress)
+        report_payload = {
+            "session_id": session_id,
+            "timestamp": time(),
+            "result": report.result,
+            "generation": report.generation,
+        }
         await self.store.set_final_report(session_id, report_payload)
         await self.event_bus.publish(session_id, EmittedEvent(type="final_report_ready", timestamp=time(), payload=report_payload))
 
-    async def handle_realtime_audio_frame(self, frame: RealtimeAudioFrame) -> None:
-        session = await self.session_manager.get(frame.session_id)
-        async with session.lock:
-            if session.status != "RUNNING":
-                raise RuntimeError(f"classroom not running: {frame.session_id} status={session.status}")
+    async def handle_realtime_audio_frame(self, frame: RealtimeAudioFrame | BinaryAudioFrame) -> int:
+        """
+        处理一帧实时数据，返回该帧在课堂内的接收序号（ClassroomSession.seq，跨连接递增）。
 
-            if session.asr is None:
-                session.asr = VolcengineAsrWsClient(session_id=frame.session_id)
-                await session.asr.connect()
-            _ = session.asr.validate_audio_chunk(frame.audio_chunk)
+        注册表与状态都是无锁读；整个处理过程（包括写入 Redis）不持有任何锁，
+        end_classroom 通过 mark_ending 等待处理中的帧完成后再 flush。
+        """
+        session = self.session_manager.lookup(frame.session_id)
+        if not session.enter():
+            raise RuntimeError(f"classroom not running: {frame.session_id} status={session.status}")
+        try:
+            asr = session.asr or await session.ensure_asr()
+            if isinstance(frame, BinaryAudioFrame):
+                audio, codec = frame.audio, frame.codec
+            else:
+                audio, codec = asr.validate_audio_chunk(frame.audio_chunk), "pcm_s16le"
+            if asr.streaming:
+                # 只入队，发送与识别结果写入都在 ASR 客户端的后台协程里
+                speaker = AsrSpeaker(user_id=frame.user_id, user_name=frame.user_name, role=frame.role)
+                if self.vad is not None and codec == "pcm_s16le":
+                    # 攒批判定，静音帧在 VAD 里丢弃；语音帧由 _forward_speech 写入音频缓冲并送入 ASR，
+                    # 静音不占缓冲的路数
+                    target = (asr, speaker, session.audio)
+                    self.vad.submit(frame.session_id, frame.user_id, frame.timestamp, audio, frame.is_last, target)
+                else:
+                    if session.audio is not None and codec == "pcm_s16le":
+                        session.audio.write(frame.user_id, frame.timestamp, audio)
+                    asr.feed_audio(audio, codec=codec, speaker=speaker, timestamp=frame.timestamp, is_last=frame.is_last)
+            elif isinstance(frame, BinaryAudioFrame):
+                asr.feed_audio(audio, codec=codec)
 
             if frame.mock_text:
-                fact = UtteranceFact(
-                    session_id=frame.session_id,
-                    user_id=frame.user_id,
-                    user_name=frame.user_name,
-                    role=frame.role,
-                    text=frame.mock_text,
-                    start_time=frame.timestamp,
-                    end_time=frame.timestamp,
-                    timestamp=frame.timestamp,
-                    confidence=1.0,
-                )
-                await self.store.append_utterance(frame.session_id, frame.timestamp, fact.model_dump())
+                await self._ingest_utterance(frame.session_id, frame.timestamp, utterance_from_frame(frame))
+            return session.next_seq()
+        finally:
+            session.leave()
+
+    async def _ingest_utterance(self, session_id: str, timestamp: float, utterance: dict) -> None:
+        await self.utterance_writer.append(session_id, timestamp, utterance)
+        self.stage_scheduler.on_utterance(session_id, utterance)
+        if self.context_cache is not None:
+            self.context_cache.on_utterance(session_id, utterance)
+
+    def _forward_speech(
+        self,
+        target: tuple[VolcengineAsrWsClient, AsrSpeaker, SessionAudioBuffer | None],
+        audio,
+        timestamp: float,
+        is_last: bool,
+    ) -> None:
+        asr, speaker, buffer = target
+        if buffer is not None:
+            # 先写缓冲再入队：断线重连时补发的音频与送给 ASR 的一致
+            buffer.write(speaker.user_id, timestamp, audio)
+        asr.feed_audio(audio, codec="pcm_s16le", speaker=speaker, timestamp=timestamp, is_last=is_last)
+
+    def _new_asr_client(self, session_id: str) -> VolcengineAsrWsClient:
+        def audio_source(user_id: str, start_ts: float, end_ts: float) -> tuple[float, list[memoryview]]:
+            audio = self.session_manager.lookup(session_id).audio
+            return audio.view(user_id, start_ts, end_ts) if audio is not None else (start_ts, [])
+
+        return VolcengineAsrWsClient(
+            session_id=session_id,
+            config=self.asr_config,
+            on_result=self._on_asr_result,
+            audio_source=audio_source,
+        )
+
+    async def _on_asr_result(self, session_id: str, speaker: AsrSpeaker, result: AsrResult) -> None:
+        # 字段与顺序同 UtteranceFact.model_dump()。时间线按到达时间（定稿结果回来的时刻）排序：
+        # end_time 是音频里的时间，识别有延迟、各发言人延迟不同，按它排序的发言可能落在已推进的
+        # 阶段总结游标之前而永远不被总结；音频时间保留在 start_time / end_time 字段里
+        arrived_at = time()
+        utterance = {
+            "session_id": session_id,
+            "user_id": speaker.user_id,
+            "user_name": speaker.user_name,
+            "role": speaker.role,
+            "text": result.text,
+            "start_time": result.start_time,
+            "end_time": result.end_time,
+            "timestamp": arrived_at,
+            "confidence": result.confidence,
+        }
+        await self._ingest_utterance(session_id, arrived_at, utterance)
 
     async def handle_agent_command(self, req: AgentCommandRequest) -> None:
-        prog = await self.store.get_progress(req.session_id)
-        utterances = await self.store.list_utterances(
+        context = self.context_cache.get(req.session_id) if self.context_cache is not None else None
+        if context is None:
+            context = await self._load_command_context(req.session_id)
+
+        if settings.agent_command_stream:
+            reply = await self._stream_command_reply(req, context)
+        else:
+            reply = await self.summarizer.command_reply(
+                instruction=req.instruction,
+                image_url=req.image_url,
+                context_text=context,
+                use_cache=not req.bypass_cache,
+            )
+            await self.event_bus.publish(
+                req.session_id,
+                EmittedEvent(type="im_request", timestamp=time(), payload={"text": reply, "task": "agent_command"}),
+            )
+
+    async def _stream_command_reply(self, req: AgentCommandRequest, context: str) -> str:
+        """
+        流式生成指令回复：增量按 AGENT_COMMAND_DELTA_FLUSH_MS 合并后以 im_request_delta 推送，
+        结束后再推送一条完整的 im_request（与非流式一致，旧客户端只看这一条即可）。
+        首个增量之前流式调用失败时退回非流式调用；之后失败时推送带 partial / error 的 im_request 再抛出。
+        """
+        reply_id = uuid.uuid4().hex
+        flush_s = settings.agent_command_delta_flush_ms / 1000
+        parts: list[str] = []
+        pending: list[str] = []
+        seq = 0
+        last_flush = perf_counter()
+
+        async def publish_delta() -> None:
+            nonlocal seq, last_flush
+            event = EmittedEvent(
+                type="im_request_delta",
+                timestamp=time(),
+                payload={"delta": "".join(pending), "seq": seq, "reply_id": reply_id, "task": "agent_command"},
+            )
+            pending.clear()
+            seq += 1
+            last_flush = perf_counter()
+            await self.event_bus.publish(req.session_id, event)
+
+        try:
+            async for delta in self.summarizer.command_reply_stream(
+                instruction=req.instruction,
+                image_url=req.image_url,
+                context_text=context,
+                use_cache=not req.bypass_cache,
+            ):
+                if not parts and not delta.strip():
+                    continue
+                parts.append(delta)
+                pending.append(delta)
+                if perf_counter() - last_flush >= flush_s or seq == 0:
+                    await publish_delta()
+        except Exception as e:
+            if parts or not isinstance(e, (ArkClientError, httpx.HTTPError)):
+                if parts:
+                    # 已推送过增量：同一个 reply_id 补一条终止的 im_request（partial），客户端据此结束这条回复
+                    await self.event_bus.publish(
+                        req.session_id,
+                        EmittedEvent(
+                            type="im_request",
+                            timestamp=time(),
+                            payload={
+                                "text": "".join(parts).strip(),
+                                "task": "agent_command",
+                                "reply_id": reply_id,
+                                "partial": True,
+                                "error": f"{type(e).__name__}: {e}",
+                            },
+                        ),
+                    )
+                raise
+            reply = await self.summarizer.command_reply(
+                instruction=req.instruction,
+                image_url=req.image_url,
+                context_text=context,
+                use_cache=not req.bypass_cache,
+            )
+        else:
+            if pending:
+                await publish_delta()
+            reply = "".join(parts).strip()
+
+        await self.event_bus.publish(
             req.session_id,
+            EmittedEvent(
+                type="im_request",
+                timestamp=time(),
+                payload={"text": reply, "task": "agent_command", "reply_id": reply_id},
+            ),
+        )
+        return reply
+
+    async def _load_command_context(self, session_id: str) -> str:
+        """
+        从 Redis 读取指令上下文（缓存未命中时）。课堂仍在进行则同时回填缓存。
+        """
+        cache = self.context_cache
+        if cache is not None:
+            cache.begin_warm(session_id)
+        await self.utterance_writer.flush(session_id)
+
+        prog = await self.store.get_progress(session_id)
+        utterances = await self.store.list_last_utterances(
+            session_id,
+            settings.context_cache_lines,
             start_ts_exclusive=max(0.0, prog.last_stage_summary_ts - 3600),
-            limit=500,
         )
-        stage_summaries = await self.store.list_stage_summaries(req.session_id, limit=200)
+        stage_summaries = await self.store.list_last_stage_summaries(session_id, 1)
+
+        if cache is not None:
+            if prog.status == "RUNNING":
+                context = cache.finish_warm(
+                    session_id,
+                    utterances=utterances,
+                    last_stage_summary=stage_summaries[-1] if stage_summaries else None,
+                )
+                if context is not None:
+                    return context
+            else:
+                cache.abort_warm(session_id)
 
         context_lines: list[str] = []
         if stage_summaries:
             last = stage_summaries[-1]
             if last.get("summary"):
                 context_lines.append(f"[阶段总结] {last.get('summary')}")
-        for u in utterances[-80:]:
-            context_lines.append(f"[{u.get('role')}][{u.get('user_name')}] {u.get('text')}")
-        context = "\n".join([x for x in context_lines if x.strip()]).strip()
-
-        reply = await self.summarizer.command_reply(
-            instruction=req.instruction,
-            image_url=req.image_url,
-            context_text=context,
-        )
-        event = EmittedEvent(
-            type="im_request",
-            timestamp=time(),
-            payload={"text": reply, "task": "agent_command"},
-        )
-        await self.event_bus.publish(req.session_id, event)
+        for u in utterances:
+            context_lines.append(format_utterance_line(u))
+        return "\n".join([x for x in context_lines if x.strip()]).strip()
+
+    def runtime_metrics(self) -> dict:
+        return {
+            "stage_scheduler": self.stage_scheduler.stats(),
+            "utterance_writer": self.utterance_writer.stats(),
+            "context_cache": self.context_cache.stats() if self.context_cache is not None else None,
+            "llm": self.llm_client.stats(),
+            "llm_admission": self.llm_admission.stats(),
+            "llm_cache": self.llm_cache.stats() if self.llm_cache is not None else None,
+            "prompts": self.summarizer.prompt_stats.stats(),
+            "report_drafter": self.report_drafter.stats() if self.report_drafter is not None else None,
+            "final_report_workers": self.final_report_workers.stats() if self.final_report_workers is not None else None,
+            "asr": self._asr_stats(),
+            "audio_buffers": self._audio_buffer_stats(),
+            "vad": self.vad.stats() if self.vad is not None else None,
+        }
+
+    def _audio_buffer_stats(self) -> dict:
+        total = {"sessions": 0, "tracks": 0, "allocated_bytes": 0, "evictions": 0, "overflow_frames": 0}
+        for session in self.session_manager.sessions():
+            if session.audio is None:
+                continue
+            stats = session.audio.stats()
+            total["sessions"] += 1
+            for k in ("tracks", "allocated_bytes", "evictions", "overflow_frames"):
+                total[k] += stats[k]
+        return total
+
+    def _asr_stats(self) -> dict | None:
+        if self.asr_config is None:
+            return None
+        keys = ("streams", "connects", "reconnects", "frames_sent", "dropped", "replayed_bytes", "replay_misses", "results", "result_errors")
+        total = {"sessions": 0, **{k: 0 for k in keys}}
+        for session in self.session_manager.sessions():
+            if session.asr is None or session.status == "ENDED":
+                continue
+            total["sessions"] += 1
+            stats = session.asr.stats()
+            for k in keys:
+                total[k] += stats[k]
+        return total
 
     async def list_stage_summaries(self, session_id: str) -> list[dict]:
         return await self.store.list_stage_summaries(session_id, limit=2000)
 
     async def get_final_report(self, session_id: str) -> dict | None:
         return await self.store.get_final_report(session_id)
+
+    async def get_report_draft(self, session_id: str) -> dict | None:
+        return await self.store.get_report_draft(session_id)
+
+    async def get_final_report_job(self, session_id: str) -> dict | None:
+        return await self.final_report_queue.status(session_id)
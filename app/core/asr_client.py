@@ -1,7 +1,25 @@
 from __future__ import annotations
 
+import asyncio
 import base64
+import uuid
+from bisect import bisect_right
 from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.core.asr_protocol import (
+    FULL_SERVER_RESPONSE,
+    SERVER_ERROR,
+    AsrProtocolError,
+    decode_message,
+    encode_audio_request,
+    encode_full_client_request,
+)
+
+try:
+    import websockets
+except ImportError:  # pragma: no cover - 可选依赖
+    websockets = None
 
 
 @dataclass(frozen=True)
@@ -12,29 +30,411 @@ class AsrResult:
     end_time: float
 
 
-class VolcengineAsrWsClient:
+@dataclass(frozen=True)
+class AsrSpeaker:
+    user_id: str
+    user_name: str
+    role: str
+
+
+@dataclass(frozen=True)
+class AsrConfig:
+    url: str
+    app_key: str = ""
+    access_key: str = ""
+    resource_id: str = "volc.bigasr.sauc.duration"
+    sample_rate: int = 16000
+    queue_frames: int = 500
+    reconnect_base_s: float = 0.5
+    reconnect_max_s: float = 10.0
+    final_timeout_s: float = 5.0
+    # 服务端判停的静音时长（end_window_size，毫秒），0 为服务端默认。开启 VAD 时静音被丢弃，
+    # 服务端只看得到每段末尾的拖尾，需不大于拖尾时长才能按段定稿
+    end_window_ms: int = 0
+
+
+ResultHandler = Callable[[str, AsrSpeaker, AsrResult], Awaitable[None]]
+# (user_id, start_ts, end_ts) -> (实际起点时间, 音频 memoryview 列表)，例如 SessionAudioBuffer.view
+AudioSource = Callable[[str, float, float], tuple[float, list[memoryview]]]
+
+# 重连补发时每个音频包的最大字节数（16kHz 16bit 单声道约 1 秒）
+_REPLAY_CHUNK_BYTES = 32000
+
+_CLOSE = object()
+
+# 发送的音频与上一段的时间差超过该值（静音被 VAD 丢弃、客户端断流）时记一个新锚点
+_CLOCK_GAP_TOLERANCE_S = 0.05
+
+_AUDIO_FORMATS = {
+    "pcm_s16le": {"format": "pcm", "codec": "raw"},
+    "opus": {"format": "ogg", "codec": "opus"},
+}
+
+
+class _SentAudioClock:
     """
-    火山引擎 ASR WebSocket 客户端占位实现。
+    一条连接已发送音频的时间轴。服务端返回的时间是相对本连接第一帧音频的毫秒数，只计发送了的音频；
+    静音被 VAD 丢弃后它与 timestamp 不再线性对应。发送的音频与上一段不连续时记一个锚点
+    (已发送毫秒数, 该处的 timestamp)，换算时取不晚于该偏移的最后一个锚点再加上偏差。
+    byte_rate 为空（opus 等无法按字节换算时长的编码）时只有第一帧一个锚点，与线性换算一致。
+    """
+
+    def __init__(self, byte_rate: int | None) -> None:
+        self._byte_rate = byte_rate
+        self._offsets_ms: list[float] = []
+        self._stamps: list[float] = []
+        self._sent_ms = 0.0
+
+    def sent(self, timestamp: float, nbytes: int) -> None:
+        if not self._stamps:
+            self._mark(timestamp)
+        elif self._byte_rate:
+            expected = self._stamps[-1] + (self._sent_ms - self._offsets_ms[-1]) / 1000
+            if abs(timestamp - expected) > _CLOCK_GAP_TOLERANCE_S:
+                self._mark(timestamp)
+        if self._byte_rate:
+            self._sent_ms += nbytes * 1000 / self._byte_rate
 
-    TODO:
-    - 按火山引擎 ASR SDK/协议建立 WebSocket 长连接
-    - 支持 new_full_client_request 初始化帧
-    - 支持 new_audio_only_request 音频帧
-    - 在接收协程里持续产出 AsrResult
+    def spans(self, since_ts: float, until_ts: float) -> list[tuple[float, float]]:
+        """[since_ts, until_ts) 内实际发送过的音频时间段（重连补发用，不补发被 VAD 丢弃的静音）。"""
+        out: list[tuple[float, float]] = []
+        for i, (offset, stamp) in enumerate(zip(self._offsets_ms, self._stamps)):
+            end_ms = self._offsets_ms[i + 1] if i + 1 < len(self._offsets_ms) else self._sent_ms
+            a, b = max(stamp, since_ts), min(stamp + (end_ms - offset) / 1000, until_ts)
+            if b > a:
+                out.append((a, b))
+        return out
+
+    def to_ts(self, offset_ms: float) -> float:
+        if not self._stamps:
+            return 0.0
+        i = max(0, bisect_right(self._offsets_ms, offset_ms) - 1)
+        return self._stamps[i] + (offset_ms - self._offsets_ms[i]) / 1000
+
+    def _mark(self, timestamp: float) -> None:
+        if self._offsets_ms and self._offsets_ms[-1] == self._sent_ms:
+            self._stamps[-1] = timestamp
+            return
+        self._offsets_ms.append(self._sent_ms)
+        self._stamps.append(timestamp)
+
+
+class _AsrStream:
+    """
+    单个发言人的流式识别连接：feed 只入队，发送与接收在后台协程中进行。
 
-    当前为了不阻塞架构改造，只提供：
-    - validate_audio_chunk：把 base64 解成 bytes，确保格式可用
+    - 连接懒建立：有音频才连接；服务端关闭 / 网络错误后按指数退避重连，下一帧音频从新连接重新开始
+    - 断开时服务端尚未定稿的那一段：配置了 audio_source（PCM 环形缓冲）时，重连后先从缓冲补发
+      “上一次定稿之后”的音频再继续；否则这一段会丢失
+    - 队列满时丢弃最旧的音频帧，识别落后不会反压到实时帧处理
+    - 只有客户端的最后一帧（is_last）才结束连接；VAD 段落之间连接保持，不重复建连
+    - 服务端返回的时间是相对本连接已发送音频的毫秒数，按 _SentAudioClock 换算回 timestamp
     """
 
-    def __init__(self, *, session_id: str) -> None:
+    def __init__(self, client: VolcengineAsrWsClient, speaker: AsrSpeaker, codec: str) -> None:
+        self._client = client
+        self.speaker = speaker
+        self.codec = codec
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, client.config.queue_frames))
+        self._task: asyncio.Task | None = None
+        self._current = None
+        # 尚未定稿音频的起点时间：连接开始发送时设置，每次定稿推进，重连时从这里补发
+        self._unfinal_from: float | None = None
+        # 上一条连接的发送时间轴：重连时只补发其中实际发送过的时间段
+        self._clock: _SentAudioClock | None = None
+
+        self.connects = 0
+        self.replayed_bytes = 0
+        # 重连时需要补发、但缓冲里已没有对应音频的次数（该段未定稿的音频丢失）
+        self.replay_misses = 0
+        self.reconnects = 0
+        self.frames_sent = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(
+            self._run(), name=f"asr-{self._client.session_id}-{self.speaker.user_id}"
+        )
+
+    def push(self, item: tuple[memoryview | bytes, float, bool] | object) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(item)
+
+    async def wait_closed(self, timeout: float) -> None:
+        if self._task is None:
+            return
+        done, _ = await asyncio.wait([self._task], timeout=timeout)
+        if not done:
+            self._task.cancel()
+            await asyncio.wait([self._task])
+
+    async def _run(self) -> None:
+        cfg = self._client.config
+        backoff = cfg.reconnect_base_s
+        pending = None
+        while True:
+            item = pending if pending is not None else await self._queue.get()
+            pending = None
+            if item is _CLOSE:
+                return
+            self._current = item
+            try:
+                if await self._session(item):
+                    return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.reconnects += 1
+                self._client.last_error = f"{type(e).__name__}: {e}"
+                # 带着发送失败的那一帧重连；正在收尾时不再重连
+                if self._current is _CLOSE:
+                    return
+                pending = self._current
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, cfg.reconnect_max_s)
+                continue
+            backoff = cfg.reconnect_base_s
+
+    async def _session(self, item: tuple[memoryview | bytes, float, bool]) -> bool:
+        """
+        建立一次连接并持续发送，直到发送了最后一包。返回 True 表示整个流已关闭（close()），
+        False 表示客户端标记的最后一帧已定稿、后续音频走新连接。发送失败时抛出异常，由 _run 重连。
+        """
+        cfg = self._client.config
+        headers = {
+            "X-Api-App-Key": cfg.app_key,
+            "X-Api-Access-Key": cfg.access_key,
+            "X-Api-Resource-Id": cfg.resource_id,
+            "X-Api-Connect-Id": uuid.uuid4().hex,
+        }
+        async with websockets.connect(cfg.url, additional_headers=headers, max_size=None) as ws:
+            self.connects += 1
+            await ws.send(encode_full_client_request(self._client.request_payload(self.speaker, self.codec)))
+            clock = _SentAudioClock(self._client.config.sample_rate * 2 if self.codec == "pcm_s16le" else None)
+            base_ts, replay = self._replay(until_ts=item[1], seq=2, clock=clock)
+            self._clock = clock
+            if self._unfinal_from is None:
+                self._unfinal_from = base_ts
+            receiver = asyncio.create_task(self._receive(ws, clock=clock))
+            try:
+                for msg in replay:
+                    await ws.send(msg)
+                seq = 2 + len(replay)
+                while True:
+                    if item is _CLOSE:
+                        await ws.send(encode_audio_request(b"", seq=seq, last=True))
+                        await asyncio.wait([receiver], timeout=cfg.final_timeout_s)
+                        return True
+                    audio, timestamp, is_last = item
+                    clock.sent(timestamp, len(audio))
+                    await ws.send(encode_audio_request(audio, seq=seq, last=is_last))
+                    self.frames_sent += 1
+                    seq += 1
+                    if is_last:
+                        await asyncio.wait([receiver], timeout=cfg.final_timeout_s)
+                        self._unfinal_from = None
+                        return False
+                    if receiver.done():
+                        receiver.result()
+                        raise AsrProtocolError("asr server closed the stream")
+                    item = self._current = await self._queue.get()
+            finally:
+                if not receiver.done():
+                    receiver.cancel()
+                elif not receiver.cancelled():
+                    # 发送先失败时接收协程的断线异常不再单独上报，由 _run 统一重连
+                    receiver.exception()
+
+    def _replay(self, *, until_ts: float, seq: int, clock: _SentAudioClock) -> tuple[float, list[bytes]]:
+        """
+        取出 [上一次定稿, until_ts) 的缓冲音频并编码成音频包，返回 (本连接的时间起点, 音频包)。
+        在同一个同步步骤里完成拷贝，期间缓冲不会被写入方覆盖。缓冲按时间对齐（空洞补零），只补发上一条连接
+        实际发送过的时间段，被 VAD 丢弃的静音不补发。
+        """
+        source = self._client.audio_source
+        if source is None or self._unfinal_from is None or self.codec != "pcm_s16le":
+            return until_ts, []
+        if self._clock is not None:
+            spans = self._clock.spans(self._unfinal_from, until_ts)
+        else:
+            spans = [(self._unfinal_from, until_ts)]
+        messages = []
+        byte_rate = self._client.config.sample_rate * 2
+        first: float | None = None
+        for a, b in spans:
+            start, views = source(self.speaker.user_id, a, b)
+            sent = 0
+            for mv in views:
+                for off in range(0, len(mv), _REPLAY_CHUNK_BYTES):
+                    chunk = mv[off : off + _REPLAY_CHUNK_BYTES]
+                    messages.append(encode_audio_request(chunk, seq=seq + len(messages)))
+                    clock.sent(start + sent / byte_rate, len(chunk))
+                    sent += len(chunk)
+                    self.replayed_bytes += len(chunk)
+            if sent and first is None:
+                first = start
+        if first is None:
+            if spans:
+                self.replay_misses += 1
+            return until_ts, []
+        return first, messages
+
+    async def _receive(self, ws, clock: _SentAudioClock) -> None:
+        emitted_end_ms = -1
+        async for data in ws:
+            if isinstance(data, str):
+                continue
+            msg = decode_message(data)
+            if msg.msg_type == SERVER_ERROR:
+                raise AsrProtocolError(f"asr server error {msg.error_code}: {msg.error_message}")
+            if msg.msg_type != FULL_SERVER_RESPONSE:
+                continue
+            payload_result = (msg.payload or {}).get("result") or {}
+            for u in payload_result.get("utterances") or ():
+                end_ms = int(u.get("end_time", 0))
+                if not u.get("definite") or end_ms <= emitted_end_ms or not u.get("text"):
+                    continue
+                emitted_end_ms = end_ms
+                asr_result = AsrResult(
+                    text=u["text"],
+                    confidence=u.get("confidence"),
+                    start_time=clock.to_ts(int(u.get("start_time", 0))),
+                    end_time=clock.to_ts(end_ms),
+                )
+                self._unfinal_from = asr_result.end_time
+                self._client.emit(self.speaker, asr_result)
+            if msg.is_last:
+                return
+
+
+class VolcengineAsrWsClient:
+    """
+    火山引擎流式 ASR 客户端（每个课堂一个实例）。
+
+    - 未配置 config 时只做校验（与原占位实现一致）：validate_audio_chunk 解码 base64，feed_audio 检查 PCM 长度
+    - 配置 config 后，课堂内每个发言人（user_id）一条长连接：full client request 初始化，之后逐帧 audio only request
+    - feed_audio 只把音频放进该发言人的发送队列，不等待网络，实时帧的 ack 路径上没有 I/O
+    - 接收协程解析定稿的分句，产出 (发言人, AsrResult)：可以用 results() 迭代，
+      或在构造时传 on_result，由客户端的分发协程逐条回调（写入发言记录等）
+    - audio_source 为可选的音频缓冲读取接口，断线重连时用来补发未定稿的音频
+    - close() 向所有连接发送最后一包，等待定稿结果分发完成后返回
+    """
+
+    def __init__(
+        self,
+        *,
+        session_id: str,
+        config: AsrConfig | None = None,
+        on_result: ResultHandler | None = None,
+        audio_source: AudioSource | None = None,
+    ) -> None:
         self.session_id = session_id
+        self.config = config
+        self._on_result = on_result
+        self.audio_source = audio_source
+        self._streams: dict[str, _AsrStream] = {}
+        self._results: asyncio.Queue = asyncio.Queue()
+        self._dispatch_task: asyncio.Task | None = None
+        self._closed = False
+
+        self.results_emitted = 0
+        self.result_errors = 0
+        self.last_error: str | None = None
+
+    @property
+    def streaming(self) -> bool:
+        return self.config is not None
 
     async def connect(self) -> None:
-        return None
+        if self.config is None:
+            return None
+        if websockets is None:
+            raise RuntimeError("ASR_ENABLED=true 需要安装 websockets：pip install websockets")
+        if self._on_result is not None and self._dispatch_task is None:
+            self._dispatch_task = asyncio.create_task(self._dispatch(), name=f"asr-dispatch-{self.session_id}")
 
     async def close(self) -> None:
-        return None
+        if self._closed:
+            return
+        self._closed = True
+        timeout = self.config.final_timeout_s if self.config is not None else 0.0
+        for stream in self._streams.values():
+            stream.push(_CLOSE)
+        if self._streams:
+            await asyncio.gather(*(s.wait_closed(timeout + 1.0) for s in self._streams.values()))
+        self._results.put_nowait(None)
+        if self._dispatch_task is not None:
+            await asyncio.wait([self._dispatch_task], timeout=timeout + 1.0)
 
     def validate_audio_chunk(self, audio_chunk_b64: str) -> bytes:
         return base64.b64decode(audio_chunk_b64)
 
+    def feed_audio(
+        self,
+        audio: memoryview | bytes,
+        *,
+        codec: str = "pcm_s16le",
+        speaker: AsrSpeaker | None = None,
+        timestamp: float = 0.0,
+        is_last: bool = False,
+    ) -> None:
+        if codec == "pcm_s16le" and len(audio) % 2:
+            raise ValueError(f"pcm_s16le audio must have even length, got {len(audio)}")
+        if self.config is None or speaker is None or self._closed:
+            return
+        stream = self._streams.get(speaker.user_id)
+        if stream is None:
+            stream = _AsrStream(self, speaker, codec)
+            self._streams[speaker.user_id] = stream
+            stream.start()
+        # memoryview 指向不可变的 WS 消息 bytes，入队不复制；发送时与协议头一起拼接成一条消息
+        stream.push((audio, timestamp, is_last))
+
+    def request_payload(self, speaker: AsrSpeaker, codec: str) -> dict:
+        return {
+            "user": {"uid": f"{self.session_id}:{speaker.user_id}"},
+            "audio": {**_AUDIO_FORMATS[codec], "rate": self.config.sample_rate, "bits": 16, "channel": 1},
+            "request": {
+                "model_name": "bigmodel",
+                "enable_punc": True,
+                "show_utterances": True,
+                "result_type": "single",
+                **({"end_window_size": self.config.end_window_ms} if self.config.end_window_ms > 0 else {}),
+            },
+        }
+
+    def emit(self, speaker: AsrSpeaker, result: AsrResult) -> None:
+        self.results_emitted += 1
+        self._results.put_nowait((speaker, result))
+
+    async def results(self) -> AsyncIterator[tuple[AsrSpeaker, AsrResult]]:
+        while True:
+            item = await self._results.get()
+            if item is None:
+                return
+            yield item
+
+    async def _dispatch(self) -> None:
+        async for speaker, result in self.results():
+            try:
+                await self._on_result(self.session_id, speaker, result)
+            except Exception as e:
+                self.result_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+
+    def stats(self) -> dict:
+        streams = self._streams.values()
+        return {
+            "streams": len(self._streams),
+            "connects": sum(s.connects for s in streams),
+            "reconnects": sum(s.reconnects for s in streams),
+            "frames_sent": sum(s.frames_sent for s in streams),
+            "dropped": sum(s.dropped for s in streams),
+            "replayed_bytes": sum(s.replayed_bytes for s in streams),
+            "replay_misses": sum(s.replay_misses for s in streams),
+            "results": self.results_emitted,
+            "result_errors": self.result_errors,
+            "last_error": self.last_error,
+        }
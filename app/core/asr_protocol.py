@@ -0,0 +1,143 @@
+"""
+火山引擎大模型流式语音识别（/api/v3/sauc/bigmodel）WebSocket 二进制协议：
+
+    byte0  高 4 位协议版本（1），低 4 位头部长度（单位 4 字节，固定 1）
+    byte1  高 4 位消息类型，低 4 位类型相关标志
+           0b0001 full client request / 0b0010 audio only request
+           0b1001 full server response / 0b1111 server error
+           标志：bit0 带 sequence，bit1 最后一包
+    byte2  高 4 位序列化（0 无 / 1 JSON），低 4 位压缩（0 无 / 1 gzip）
+    byte3  保留
+
+头部之后：带 sequence 时为 int32 序号（最后一包为负数）；随后 uint32 payload 长度 + payload。
+server error 为 uint32 错误码 + uint32 消息长度 + UTF-8 消息。所有整数均为大端。
+
+客户端（VolcengineAsrWsClient）与本地假服务（tests/fake_asr_server.py）共用这里的编解码。
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import struct
+from dataclasses import dataclass
+from typing import Any
+
+
+_VERSION_HEADER = 0x11
+
+FULL_CLIENT_REQUEST = 0b0001
+AUDIO_ONLY_REQUEST = 0b0010
+FULL_SERVER_RESPONSE = 0b1001
+SERVER_ERROR = 0b1111
+
+FLAG_SEQUENCE = 0b0001
+FLAG_LAST = 0b0010
+
+SERIAL_NONE = 0
+SERIAL_JSON = 1
+COMPRESS_NONE = 0
+COMPRESS_GZIP = 1
+
+_HEADER = struct.Struct(">BBBB")
+_INT = struct.Struct(">i")
+_UINT = struct.Struct(">I")
+
+
+class AsrProtocolError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class AsrMessage:
+    msg_type: int
+    seq: int | None
+    is_last: bool
+    payload: Any = None
+    error_code: int | None = None
+    error_message: str | None = None
+
+
+def _pack(msg_type: int, payload: bytes, *, seq: int | None, last: bool, serial: int, compress: int) -> bytes:
+    flags = (FLAG_SEQUENCE if seq is not None else 0) | (FLAG_LAST if last else 0)
+    parts = [_HEADER.pack(_VERSION_HEADER, (msg_type << 4) | flags, (serial << 4) | compress, 0)]
+    if seq is not None:
+        parts.append(_INT.pack(-abs(seq) if last else seq))
+    parts.append(_UINT.pack(len(payload)))
+    parts.append(payload)
+    return b"".join(parts)
+
+
+def _json_payload(obj: Any, compress: int) -> bytes:
+    raw = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    return gzip.compress(raw) if compress == COMPRESS_GZIP else raw
+
+
+def encode_full_client_request(payload: dict[str, Any], *, seq: int = 1, compress: int = COMPRESS_GZIP) -> bytes:
+    return _pack(
+        FULL_CLIENT_REQUEST,
+        _json_payload(payload, compress),
+        seq=seq,
+        last=False,
+        serial=SERIAL_JSON,
+        compress=compress,
+    )
+
+
+def encode_audio_request(audio: bytes | bytearray | memoryview, *, seq: int, last: bool = False) -> bytes:
+    # 音频不压缩：PCM 的 gzip 收益很小，Opus 本身已压缩
+    return _pack(AUDIO_ONLY_REQUEST, audio, seq=seq, last=last, serial=SERIAL_NONE, compress=COMPRESS_NONE)
+
+
+def encode_server_response(
+    payload: dict[str, Any], *, seq: int | None = None, last: bool = False, compress: int = COMPRESS_GZIP
+) -> bytes:
+    return _pack(
+        FULL_SERVER_RESPONSE,
+        _json_payload(payload, compress),
+        seq=seq,
+        last=last,
+        serial=SERIAL_JSON,
+        compress=compress,
+    )
+
+
+def encode_server_error(code: int, message: str) -> bytes:
+    msg = message.encode("utf-8")
+    header = _HEADER.pack(_VERSION_HEADER, SERVER_ERROR << 4, SERIAL_JSON << 4, 0)
+    return b"".join((header, _UINT.pack(code), _UINT.pack(len(msg)), msg))
+
+
+def decode_message(data: bytes | bytearray | memoryview) -> AsrMessage:
+    mv = memoryview(data)
+    if len(mv) < _HEADER.size:
+        raise AsrProtocolError(f"asr message too short: {len(mv)} bytes")
+    b0, b1, b2, _ = _HEADER.unpack_from(mv)
+    off = (b0 & 0x0F) * 4
+    msg_type, flags = b1 >> 4, b1 & 0x0F
+    serial, compress = b2 >> 4, b2 & 0x0F
+
+    try:
+        if msg_type == SERVER_ERROR:
+            (code,) = _UINT.unpack_from(mv, off)
+            (size,) = _UINT.unpack_from(mv, off + 4)
+            message = str(mv[off + 8 : off + 8 + size], "utf-8")
+            return AsrMessage(msg_type, None, True, error_code=code, error_message=message)
+
+        seq = None
+        if flags & FLAG_SEQUENCE:
+            (seq,) = _INT.unpack_from(mv, off)
+            off += 4
+        (size,) = _UINT.unpack_from(mv, off)
+    except struct.error as e:
+        raise AsrProtocolError(f"truncated asr message: {e}") from e
+    off += 4
+    if off + size > len(mv):
+        raise AsrProtocolError("asr payload length exceeds message")
+    body = mv[off : off + size]
+
+    is_last = bool(flags & FLAG_LAST) or (seq is not None and seq < 0)
+    if serial == SERIAL_NONE:
+        return AsrMessage(msg_type, seq, is_last, payload=body)
+    raw = gzip.decompress(body) if compress == COMPRESS_GZIP else bytes(body)
+    return AsrMessage(msg_type, seq, is_last, payload=json.loads(raw) if raw else None)
@@ -3,8 +3,10 @@ from __future__ import annotations
 import asyncio
 from dataclasses import dataclass, field
 from time import time
+from typing import Callable
 
 from app.core.asr_client import VolcengineAsrWsClient
+from app.multimodal.audio_buffer import SessionAudioBuffer
 
 
 @dataclass
@@ -13,13 +15,63 @@ class ClassroomSession:
     created_at: float = field(default_factory=lambda: time())
     seq: int = 0
     status: str = "RUNNING"
+    # 只用于 ASR 客户端的懒创建；帧处理热路径不持有
     lock: asyncio.Lock = field(default_factory=asyncio.Lock)
     asr: VolcengineAsrWsClient | None = None
+    asr_factory: Callable[[str], VolcengineAsrWsClient] | None = field(default=None, repr=False)
+    audio: SessionAudioBuffer | None = field(default=None, repr=False)
+    inflight: int = 0
+    _idle: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def __post_init__(self) -> None:
+        self._idle.set()
 
     def next_seq(self) -> int:
         self.seq += 1
         return self.seq
 
+    def enter(self) -> bool:
+        """
+        帧处理开始：课堂仍在 RUNNING 时登记一个处理中的帧并返回 True。
+        状态判断与计数之间没有 await，对其他协程是原子的。
+        """
+        if self.status != "RUNNING":
+            return False
+        self.inflight += 1
+        self._idle.clear()
+        return True
+
+    def leave(self) -> None:
+        self.inflight -= 1
+        if self.inflight <= 0:
+            self.inflight = 0
+            self._idle.set()
+
+    async def wait_idle(self) -> None:
+        await self._idle.wait()
+
+    async def ensure_asr(self) -> VolcengineAsrWsClient:
+        asr = self.asr
+        if asr is not None:
+            return asr
+        async with self.lock:
+            if self.asr is not None:
+                return self.asr
+            if self.asr_factory is not None:
+                asr = self.asr_factory(self.session_id)
+            else:
+                asr = VolcengineAsrWsClient(session_id=self.session_id)
+            self.asr = asr
+        # 锁内只创建并发布客户端，connect 在锁外进行：并发调用方直接拿到同一个实例，
+        # 连接前送入的音频在发送队列里等待；connect 失败时撤回，下次调用重新创建
+        try:
+            await asr.connect()
+        except BaseException:
+            if self.asr is asr:
+                self.asr = None
+            raise
+        return asr
+
 
 class ClassroomSessionManager:
     """
@@ -27,34 +79,44 @@ class ClassroomSessionManager:
 
     职责：
     - 管理 session 生命周期
-    - 管理与 session 绑定的运行时资源（例如 ASR 客户端、序号、互斥锁）
+    - 管理与 session 绑定的运行时资源（例如 ASR 客户端、序号、处理中帧计数）
+
+    注册表按写时复制维护：create 在锁内复制出新 dict 再整体替换引用，
+    lookup 只读当前引用、不加锁，所有课堂的帧处理之间没有共享锁。
     """
 
-    def __init__(self) -> None:
+    def __init__(self, *, asr_factory: Callable[[str], VolcengineAsrWsClient] | None = None) -> None:
         self._sessions: dict[str, ClassroomSession] = {}
         self._lock = asyncio.Lock()
+        self._asr_factory = asr_factory
 
     async def create(self, session_id: str) -> ClassroomSession:
         async with self._lock:
             if session_id in self._sessions:
                 raise ValueError(f"session already exists: {session_id}")
-            s = ClassroomSession(session_id=session_id)
-            self._sessions[session_id] = s
+            s = ClassroomSession(session_id=session_id, asr_factory=self._asr_factory)
+            sessions = dict(self._sessions)
+            sessions[session_id] = s
+            self._sessions = sessions
             return s
 
+    def lookup(self, session_id: str) -> ClassroomSession:
+        s = self._sessions.get(session_id)
+        if s is None:
+            raise ValueError(f"session not found: {session_id}")
+        return s
+
     async def get(self, session_id: str) -> ClassroomSession:
-        async with self._lock:
-            s = self._sessions.get(session_id)
-            if s is None:
-                raise ValueError(f"session not found: {session_id}")
-            return s
+        return self.lookup(session_id)
+
+    def sessions(self) -> list[ClassroomSession]:
+        return list(self._sessions.values())
 
     async def mark_ending(self, session_id: str) -> None:
-        s = await self.get(session_id)
-        async with s.lock:
-            s.status = "ENDING"
+        """置为 ENDING 后不再接收新帧，并等待已进入处理的帧全部完成（替代原先对 session.lock 的等待）。"""
+        s = self.lookup(session_id)
+        s.status = "ENDING"
+        await s.wait_idle()
 
     async def mark_ended(self, session_id: str) -> None:
-        s = await self.get(session_id)
-        async with s.lock:
-            s.status = "ENDED"
+        self.lookup(session_id).status = "ENDED"
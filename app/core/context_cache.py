@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+from app.core.summarization import format_utterance_line
+
+
+@dataclass
+class _SessionContext:
+    lines: deque[tuple[float, str]]
+    stage_line: str | None = None
+    stage_ts: float = 0.0
+    rendered: str | None = None
+    warm: bool = False
+    warmups: int = 0
+
+
+class SessionContextCache:
+    """
+    /agent/command 的课堂上下文缓存（进程内，按课堂）。
+
+    - 保存最近 max_lines 条已渲染的发言行与最近一条阶段总结，由发言写入和阶段总结写入增量更新
+    - 渲染好的上下文字符串在内容变化前复用，命中时无需访问 Redis
+    - 未命中（例如进程重启后）由调用方从 Redis 读取后通过 begin_warm / finish_warm 回填；
+      回填期间到达的发言会被暂存并与 Redis 结果去重合并
+    - 只感知本进程内的写入，不会从 Redis 刷新：默认关闭，只在单 worker 或按 session 粘性路由、且阶段总结不切分时启用
+    """
+
+    def __init__(self, *, max_lines: int = 80, lookback_s: float = 3600.0) -> None:
+        self._max_lines = max_lines
+        self._lookback_s = lookback_s
+        self._entries: dict[str, _SessionContext] = {}
+        self._hits = 0
+        self._misses = 0
+
+    def stats(self) -> dict:
+        total = self._hits + self._misses
+        return {
+            "sessions": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / total, 4) if total else 0.0,
+        }
+
+    def open(self, session_id: str) -> None:
+        self._entries[session_id] = _SessionContext(lines=deque(maxlen=self._max_lines), warm=True)
+
+    def discard(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
+
+    def on_utterance(self, session_id: str, utterance: dict[str, Any]) -> None:
+        e = self._entries.get(session_id)
+        if e is None or not utterance.get("text"):
+            return
+        e.lines.append((float(utterance.get("timestamp") or 0.0), format_utterance_line(utterance)))
+        e.rendered = None
+
+    def on_stage_summary(self, session_id: str, summary: dict[str, Any]) -> None:
+        e = self._entries.get(session_id)
+        if e is None:
+            return
+        e.stage_line = f"[阶段总结] {summary.get('summary')}" if summary.get("summary") else None
+        e.stage_ts = float(summary.get("timestamp") or 0.0)
+        e.rendered = None
+
+    def get(self, session_id: str) -> str | None:
+        e = self._entries.get(session_id)
+        if e is None or not e.warm:
+            self._misses += 1
+            return None
+        self._hits += 1
+        if e.rendered is None:
+            e.rendered = self._render(e)
+        return e.rendered
+
+    def begin_warm(self, session_id: str) -> None:
+        e = self._entries.get(session_id)
+        if e is None:
+            e = _SessionContext(lines=deque(maxlen=self._max_lines))
+            self._entries[session_id] = e
+        e.warmups += 1
+
+    def finish_warm(
+        self,
+        session_id: str,
+        *,
+        utterances: list[dict[str, Any]],
+        last_stage_summary: dict[str, Any] | None,
+    ) -> str | None:
+        e = self._entries.get(session_id)
+        if e is None:
+            return None
+        loaded = [
+            (float(u.get("timestamp") or 0.0), format_utterance_line(u)) for u in utterances if u.get("text")
+        ]
+        seen = set(loaded)
+        merged = loaded + [x for x in e.lines if x not in seen]
+        e.lines = deque(merged[-self._max_lines :], maxlen=self._max_lines)
+        if last_stage_summary is not None and float(last_stage_summary.get("timestamp") or 0.0) >= e.stage_ts:
+            self.on_stage_summary(session_id, last_stage_summary)
+        e.warmups -= 1
+        if e.warmups <= 0:
+            e.warm = True
+        e.rendered = self._render(e)
+        return e.rendered
+
+    def abort_warm(self, session_id: str) -> None:
+        e = self._entries.get(session_id)
+        if e is None:
+            return
+        e.warmups -= 1
+        if e.warmups <= 0 and not e.warm:
+            self._entries.pop(session_id, None)
+
+    def _render(self, e: _SessionContext) -> str:
+        since = max(0.0, e.stage_ts - self._lookback_s)
+        context_lines: list[str] = []
+        if e.stage_line:
+            context_lines.append(e.stage_line)
+        for ts, line in e.lines:
+            if ts > since:
+                context_lines.append(line)
+        return "\n".join([x for x in context_lines if x.strip()]).strip()
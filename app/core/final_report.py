@@ -0,0 +1,456 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from time import time
+from typing import Any, Awaitable, Callable
+
+from app.core.settings import Settings
+from app.core.summarization import LlmSummarizer, StageSummary, format_utterance_line
+from app.infra.redis_fact_store import RedisFactStore
+from app.llm.admission import PRIORITY_FINAL, PRIORITY_STAGE
+from app.llm.prompt_builder import PromptReport
+
+
+ProgressFn = Callable[[dict[str, Any]], Awaitable[None]]
+
+_PAGE_SIZE = 1000
+_MAX_SPEAKERS = 50
+# 合并层数上限：每层至少两两合并，8 层足以覆盖任何实际的课堂长度，防止模型输出不收缩时无限合并
+_MAX_REDUCE_LEVELS = 8
+
+
+@dataclass
+class _Speaker:
+    utterances: int = 0
+    chars: int = 0
+
+
+@dataclass
+class _Timeline:
+    """
+    一次性分页扫描整节课得到的信息：发言统计、最后一个阶段总结窗口之后的发言（tail），
+    以及全部发言行（仅在单次调用放得下时保留，超出后丢弃以控制内存）。
+    """
+
+    utterances: int = 0
+    speakers: dict[tuple[str, str], _Speaker] = field(default_factory=dict)
+    tail: list[dict[str, Any]] = field(default_factory=list)
+    all_lines: list[str] | None = None
+    all_tokens: int = 0
+
+
+@dataclass(frozen=True)
+class FinalReport:
+    result: dict[str, Any]
+    generation: dict[str, Any]
+
+
+class FinalReportGenerator:
+    """
+    课后报告生成：
+
+    - single：整节课发言 + 阶段总结一次调用（旧行为，超出 LLM_FINAL_PROMPT_TOKENS 时由 PromptBuilder 抽样裁剪）
+    - map_reduce：已有阶段总结直接复用为各窗口的小结；最后一个窗口之后的发言按
+      final_report_chunk_utterances 条 / 阶段总结 prompt 预算切块，并行调用 summarize_stage（map，
+      按 final 优先级排队），再把全部小结与发言统计汇总为 summarize_final 的结构（reduce）
+    - auto（默认）：单次调用放得下时走 single，否则走 map_reduce
+    - incremental：课中已有 ReportDrafter 维护的草稿时（auto / map_reduce），只把草稿之后的阶段总结与
+      尾部发言（超过一个分块时先 map）合并进草稿，下课后通常只需一次小 prompt 调用
+    - 窗口小结合起来仍超过课后报告预算时（很长的课），先把相邻窗口按 stage 预算分组合并（merge_windows），
+      逐层合并直到放得下，而不是在汇总 prompt 里裁掉最早的窗口
+
+    map / 合并产生的小结只用于本次报告，不写回阶段总结时间线。generation 记录实际方式、分块数、合并层数，
+    以及汇总 prompt 是否仍有内容被裁剪、或 Stream 时间线已裁掉开头的发言（truncated / timeline_trimmed）。
+    """
+
+    def __init__(self, *, store: RedisFactStore, summarizer: LlmSummarizer, settings: Settings) -> None:
+        if settings.final_report_mode not in ("auto", "single", "map_reduce"):
+            raise ValueError(f"unknown final report mode: {settings.final_report_mode}")
+        self._store = store
+        self._summarizer = summarizer
+        self._mode = settings.final_report_mode
+        self._chunk_utterances = max(1, int(settings.final_report_chunk_utterances))
+        self._map_concurrency = max(1, int(settings.final_report_map_concurrency))
+        self._use_draft = settings.report_draft_enabled
+
+    async def generate(self, session_id: str, *, on_progress: ProgressFn | None = None) -> FinalReport:
+        """
+        on_progress 在各阶段（scanning / mapping / reducing）及每个分块完成时回调，用于上报任务进度。
+        """
+
+        async def progress(phase: str, **kw: Any) -> None:
+            if on_progress is not None:
+                await on_progress({"phase": phase, **kw})
+
+        await progress("scanning")
+        stage_summaries = [s for s in await _read_stage_summaries(self._store, session_id) if s.get("summary")]
+        covered_until = max((_window_end(s) for s in stage_summaries), default=0.0)
+        stage_text = "\n".join([f"[{s.get('timestamp')}] {s.get('summary')}" for s in stage_summaries]).strip()
+        draft = None
+        if self._use_draft and self._mode != "single":
+            draft = await self._store.get_report_draft(session_id)
+
+        final_budget = self._summarizer.prompt_budget(PRIORITY_FINAL)
+        single_limit = final_budget - self._summarizer.estimate_tokens(stage_text) if final_budget > 0 else 0
+        # 阶段总结本身就放不下时 single 只能裁剪，auto 直接走 map_reduce
+        keep_lines = draft is None and (final_budget <= 0 or single_limit > 0)
+        tl = await self._scan(session_id, covered_until=covered_until, single_limit=single_limit, keep_lines=keep_lines)
+        # Stream 时间线按 MAXLEN 裁剪后，开头的发言已读不到，报告只能基于剩下的部分
+        trimmed = await self._store.utterances_trimmed(session_id)
+        reports: list[PromptReport] = []
+
+        mode = self._mode
+        if draft is not None:
+            mode = "incremental"
+        elif mode == "auto":
+            mode = "single" if tl.all_lines is not None else "map_reduce"
+        if mode == "single":
+            await progress("reducing")
+            result = await self._single(session_id, tl, stage_text, on_report=reports.append)
+            return FinalReport(
+                result=result,
+                generation={
+                    "mode": "single",
+                    "utterances": tl.utterances,
+                    "chunks_reused": 0,
+                    "chunks_mapped": 0,
+                    "reduce_levels": 0,
+                    "windows_merged": 0,
+                    "truncated": trimmed or any(r.truncated for r in reports),
+                    "timeline_trimmed": trimmed,
+                },
+            )
+
+        reused = stage_summaries
+        if draft is not None:
+            folded_ts = float(draft.get("stage_ts") or 0.0)
+            reused = [s for s in stage_summaries if float(s.get("timestamp") or 0.0) > folded_ts]
+        chunks = self._chunk(tl.tail)
+        tail_text = ""
+        if draft is not None and len(chunks) == 1:
+            # 草稿之后只剩一个分块的发言：直接随合并一起提交，省掉一次小结
+            tail_text = "\n".join(format_utterance_line(u) for u in chunks[0])
+            chunks = []
+        await progress("mapping", chunks_done=0, chunks_total=len(chunks))
+        mapped = await self._map(chunks, progress)
+        windows: list[tuple[float, StageSummary | dict[str, Any]]] = [(_window_end(s), s) for s in reused]
+        windows += [(float(chunk[-1].get("timestamp") or 0.0), stage) for chunk, stage in zip(chunks, mapped)]
+        windows.sort(key=lambda x: x[0])
+        await progress("reducing")
+        lines, levels, merged = await self._reduce_windows(windows, progress)
+        if draft is not None and not lines and not tail_text:
+            # 草稿之后没有新的阶段总结和发言：草稿就是最终报告
+            result = draft.get("result")
+        elif draft is not None:
+            result = await self._summarizer.fold_final(
+                draft=draft.get("result"),
+                stage_summaries_text="\n".join(lines),
+                utterances_text=tail_text,
+                participation_text=_participation_text(tl),
+                on_report=reports.append,
+            )
+        else:
+            result = await self._summarizer.summarize_final(
+                utterances_text="",
+                stage_summaries_text="\n".join(lines),
+                course_meta_text=None,
+                participation_text=_participation_text(tl),
+                on_report=reports.append,
+            )
+        return FinalReport(
+            result=result,
+            generation={
+                "mode": mode,
+                "utterances": tl.utterances,
+                "chunks_reused": len(reused),
+                "chunks_mapped": len(chunks),
+                "reduce_levels": levels,
+                "windows_merged": merged,
+                "truncated": trimmed or any(r.truncated for r in reports),
+                "timeline_trimmed": trimmed,
+            },
+        )
+
+    async def _scan(self, session_id: str, *, covered_until: float, single_limit: int, keep_lines: bool) -> _Timeline:
+        tl = _Timeline(all_lines=[] if keep_lines else None)
+        cursor: str | None = None
+        while True:
+            items, cursor = await self._store.read_utterances(
+                session_id, cursor=cursor, start_ts_exclusive=0.0, limit=_PAGE_SIZE
+            )
+            for u in items:
+                if not u.get("text"):
+                    continue
+                line = format_utterance_line(u)
+                tl.utterances += 1
+                sp = tl.speakers.setdefault((str(u.get("role")), str(u.get("user_name"))), _Speaker())
+                sp.utterances += 1
+                sp.chars += len(str(u.get("text")))
+                if float(u.get("timestamp") or 0.0) > covered_until:
+                    tl.tail.append(u)
+                if tl.all_lines is not None:
+                    tl.all_lines.append(line)
+                    tl.all_tokens += self._summarizer.estimate_tokens(line) + 1
+                    if single_limit > 0 and tl.all_tokens > single_limit:
+                        tl.all_lines = None
+            if len(items) < _PAGE_SIZE:
+                return tl
+
+    async def _single(
+        self,
+        session_id: str,
+        tl: _Timeline,
+        stage_text: str,
+        *,
+        on_report: Callable[[PromptReport], None] | None = None,
+    ) -> dict[str, Any]:
+        lines = tl.all_lines
+        if lines is None:
+            # 显式 single 且超出预算：重新读取全部发言，交给 PromptBuilder 均匀抽样
+            lines = []
+            cursor: str | None = None
+            while True:
+                items, cursor = await self._store.read_utterances(
+                    session_id, cursor=cursor, start_ts_exclusive=0.0, limit=_PAGE_SIZE
+                )
+                lines += [format_utterance_line(u) for u in items if u.get("text")]
+                if len(items) < _PAGE_SIZE:
+                    break
+        return await self._summarizer.summarize_final(
+            utterances_text="\n".join(lines).strip(),
+            stage_summaries_text=stage_text,
+            course_meta_text=None,
+            on_report=on_report,
+        )
+
+    def _chunk(self, utterances: list[dict[str, Any]]) -> list[list[dict[str, Any]]]:
+        budget = self._summarizer.prompt_budget(PRIORITY_STAGE)
+        # 预留约 10% 给阶段总结的指令模板
+        max_tokens = int(budget * 0.9) if budget > 0 else 0
+        chunks: list[list[dict[str, Any]]] = []
+        cur: list[dict[str, Any]] = []
+        cur_tokens = 0
+        for u in utterances:
+            cost = self._summarizer.estimate_tokens(format_utterance_line(u)) + 1
+            if cur and (len(cur) >= self._chunk_utterances or (max_tokens and cur_tokens + cost > max_tokens)):
+                chunks.append(cur)
+                cur, cur_tokens = [], 0
+            cur.append(u)
+            cur_tokens += cost
+        if cur:
+            chunks.append(cur)
+        return chunks
+
+    async def _map(
+        self,
+        chunks: list[list[dict[str, Any]]],
+        progress: Callable[..., Awaitable[None]],
+    ) -> list[StageSummary]:
+        sem = asyncio.Semaphore(self._map_concurrency)
+        done = 0
+
+        async def one(chunk: list[dict[str, Any]]) -> StageSummary:
+            nonlocal done
+            async with sem:
+                stage = await self._summarizer.summarize_stage(
+                    utterances_text="\n".join(format_utterance_line(u) for u in chunk),
+                    priority=PRIORITY_FINAL,
+                )
+            done += 1
+            await progress("mapping", chunks_done=done, chunks_total=len(chunks))
+            return stage
+
+        return list(await asyncio.gather(*(one(c) for c in chunks)))
+
+    async def _reduce_windows(
+        self,
+        windows: list[tuple[float, StageSummary | dict[str, Any]]],
+        progress: Callable[..., Awaitable[None]],
+    ) -> tuple[list[str], int, int]:
+        """
+        窗口小结合起来超过课后报告预算时逐层合并：相邻窗口按 stage 预算分组，每组（至少两个窗口）合并为一个小结，
+        直到放得下或无法再合并（每个窗口都已单独超过分组预算，剩余部分由汇总 prompt 裁剪并记为 truncated）。
+        返回 (窗口行, 合并层数, 合并调用次数)。
+        """
+        items = [(ts, _window_line(ts, s)) for ts, s in windows]
+        final_budget = self._summarizer.prompt_budget(PRIORITY_FINAL)
+        if final_budget <= 0:
+            return [line for _, line in items], 0, 0
+        # 预留约 40% 给指令模板、发言统计、草稿与尾部发言
+        target = int(final_budget * 0.6)
+        stage_budget = self._summarizer.prompt_budget(PRIORITY_STAGE)
+        group_limit = int(stage_budget * 0.9) if stage_budget > 0 else target
+        sem = asyncio.Semaphore(self._map_concurrency)
+        levels = merged = 0
+
+        async def merge(group: list[tuple[float, str]]) -> tuple[float, str]:
+            if len(group) == 1:
+                return group[0]
+            async with sem:
+                stage = await self._summarizer.merge_windows(
+                    windows_text="\n".join(line for _, line in group),
+                    priority=PRIORITY_FINAL,
+                )
+            return group[-1][0], _window_line(group[-1][0], stage)
+
+        while levels < _MAX_REDUCE_LEVELS:
+            costs = [self._summarizer.estimate_tokens(line) + 1 for _, line in items]
+            if sum(costs) <= target:
+                break
+            groups: list[list[tuple[float, str]]] = []
+            cur: list[tuple[float, str]] = []
+            cur_tokens = 0
+            for item, cost in zip(items, costs):
+                if cur and cur_tokens + cost > group_limit:
+                    groups.append(cur)
+                    cur, cur_tokens = [], 0
+                cur.append(item)
+                cur_tokens += cost
+            if cur:
+                groups.append(cur)
+            to_merge = sum(1 for g in groups if len(g) > 1)
+            if not to_merge:
+                break
+            levels += 1
+            merged += to_merge
+            await progress("reducing", level=levels, groups=to_merge)
+            items = list(await asyncio.gather(*(merge(g) for g in groups)))
+        return [line for _, line in items], levels, merged
+
+
+async def _read_stage_summaries(store: RedisFactStore, session_id: str) -> list[dict[str, Any]]:
+    out: list[dict[str, Any]] = []
+    cursor: str | None = None
+    while True:
+        items, cursor = await store.read_stage_summaries(session_id, cursor=cursor, limit=_PAGE_SIZE)
+        out += items
+        if len(items) < _PAGE_SIZE:
+            return out
+
+
+def _window_end(summary: dict[str, Any]) -> float:
+    window = summary.get("window") or {}
+    return float(window.get("end_ts_inclusive") or summary.get("timestamp") or 0.0)
+
+
+def _window_line(ts: float, s: StageSummary | dict[str, Any]) -> str:
+    if isinstance(s, StageSummary):
+        summary, points = s.summary, s.knowledge_points
+    else:
+        summary, points = s.get("summary"), s.get("knowledge_points") or []
+    line = f"[{ts}] {summary}"
+    if points:
+        line += f"（知识点：{'、'.join(str(p) for p in points)}）"
+    return line
+
+
+def _participation_text(tl: _Timeline) -> str:
+    speakers = sorted(tl.speakers.items(), key=lambda x: x[1].utterances, reverse=True)
+    lines = [f"共 {tl.utterances} 条发言，{len(speakers)} 人发言"]
+    lines += [
+        f"[{role}][{name}] 发言 {sp.utterances} 条，{sp.chars} 字"
+        for (role, name), sp in speakers[:_MAX_SPEAKERS]
+    ]
+    return "\n".join(lines)
+
+
+class ReportDrafter:
+    """
+    课中滚动维护课后报告草稿（class:{id}:report_draft，结构同 summarize_final）：
+
+    - 每次写入阶段总结后（on_stage_summary）把尚未合并的阶段总结合并进草稿（fold_final，按 final 优先级排队）
+    - 同一课堂同时只有一个更新任务，更新期间到达的阶段总结在本次结束后再合并；最多 concurrency 个课堂同时更新
+    - 草稿记录已合并到的阶段总结时间戳 stage_ts，下课时 FinalReportGenerator 只合并之后的增量
+    - 更新失败或进程重启只会让草稿落后，下课时会补齐
+    - 下课时 discard 之后迟到的阶段总结不再更新草稿（报告已在生成），重新开课（open）后恢复
+    """
+
+    def __init__(self, *, store: RedisFactStore, summarizer: LlmSummarizer, concurrency: int = 4) -> None:
+        self._store = store
+        self._summarizer = summarizer
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._dirty: set[str] = set()
+        self._discarded: set[str] = set()
+
+        self._updates = 0
+        self._folded = 0
+        self._errors = 0
+
+    def stats(self) -> dict:
+        return {
+            "inflight": len(self._tasks),
+            "updates": self._updates,
+            "stage_summaries_folded": self._folded,
+            "errors": self._errors,
+        }
+
+    def open(self, session_id: str) -> None:
+        self._discarded.discard(session_id)
+
+    def on_stage_summary(self, session_id: str, summary: dict[str, Any]) -> None:
+        if session_id in self._discarded:
+            return
+        if session_id in self._tasks:
+            self._dirty.add(session_id)
+            return
+        task = asyncio.create_task(self._run(session_id), name=f"report-draft-{session_id}")
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda t, sid=session_id: self._forget(sid, t))
+
+    def discard(self, session_id: str) -> None:
+        self._discarded.add(session_id)
+        self._dirty.discard(session_id)
+        task = self._tasks.pop(session_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def stop(self) -> None:
+        pending = list(self._tasks.values())
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.wait(pending, timeout=3.0)
+
+    def _forget(self, session_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(session_id) is task:
+            del self._tasks[session_id]
+
+    async def _run(self, session_id: str) -> None:
+        async with self._sem:
+            while True:
+                self._dirty.discard(session_id)
+                try:
+                    await self.update(session_id)
+                except Exception:
+                    self._errors += 1
+                if session_id not in self._dirty:
+                    return
+
+    async def update(self, session_id: str) -> dict[str, Any] | None:
+        draft = await self._store.get_report_draft(session_id)
+        folded_ts = float(draft.get("stage_ts") or 0.0) if draft else 0.0
+        pending = [
+            s
+            for s in await _read_stage_summaries(self._store, session_id)
+            if s.get("summary") and float(s.get("timestamp") or 0.0) > folded_ts
+        ]
+        if not pending:
+            return draft
+        result = await self._summarizer.fold_final(
+            draft=draft.get("result") if draft else None,
+            stage_summaries_text="\n".join(_window_line(_window_end(s), s) for s in pending),
+        )
+        new_draft = {
+            "session_id": session_id,
+            "timestamp": time(),
+            "stage_ts": max(float(s.get("timestamp") or 0.0) for s in pending),
+            "covered_until": max(_window_end(s) for s in pending),
+            "stage_summaries": (int(draft.get("stage_summaries") or 0) if draft else 0) + len(pending),
+            "result": result,
+        }
+        await self._store.set_report_draft(session_id, new_draft)
+        self._updates += 1
+        self._folded += len(pending)
+        return new_draft
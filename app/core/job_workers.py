@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from app.infra.redis_job_queue import Job, RedisJobQueue
+
+
+ProgressFn = Callable[[dict[str, Any]], Awaitable[None]]
+JobHandler = Callable[[Job, ProgressFn], Awaitable[None]]
+DeadLetterHandler = Callable[[Job, str], Awaitable[None]]
+
+
+class JobWorkerPool:
+    """
+    RedisJobQueue 的进程内 worker 池：
+
+    - 最多 concurrency 个任务同时执行；空闲时每 poll_interval_s 领取一次，本进程入队后 wake() 立即领取
+    - 每轮先回收可见性超时的任务（其他 worker 崩溃 / 被杀时遗留的任务）
+    - 执行期间每 visibility_s / 3 续期一次；handler 通过 progress 回调上报的进度随续期写入任务状态
+    - handler 抛异常按队列配置重试，进入死信时调用 on_dead（包括回收超时任务时进入死信的）
+    - stop() 取消执行中的任务并放回队列（不计尝试次数），由其他 worker / 新进程继续
+    """
+
+    def __init__(
+        self,
+        *,
+        queue: RedisJobQueue,
+        handler: JobHandler,
+        concurrency: int = 4,
+        poll_interval_s: float = 1.0,
+        on_dead: DeadLetterHandler | None = None,
+    ) -> None:
+        self._queue = queue
+        self._handler = handler
+        self._concurrency = max(1, concurrency)
+        self._poll_interval_s = poll_interval_s
+        self._on_dead = on_dead
+        self._task: asyncio.Task | None = None
+        self._stop = asyncio.Event()
+        self._wakeup = asyncio.Event()
+        self._running: dict[str, asyncio.Task] = {}
+
+        self._completed = 0
+        self._retried = 0
+        self._dead = 0
+        self._lost = 0
+        self._reaped = 0
+        self._last_depth: dict[str, int] = {}
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name=f"job-workers-{self._queue.name}")
+
+    async def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._task is not None:
+            await asyncio.wait([self._task], timeout=3.0)
+        pending = list(self._running.values())
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.wait(pending, timeout=3.0)
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self._queue.worker_id,
+            "concurrency": self._concurrency,
+            "running": len(self._running),
+            "completed": self._completed,
+            "retried": self._retried,
+            "dead": self._dead,
+            "lost": self._lost,
+            "reaped": self._reaped,
+            "queue": self._last_depth,
+        }
+
+    async def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                await self._poll()
+            except Exception:
+                pass
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval_s)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self) -> None:
+        reaped, dead = await self._queue.reap_expired()
+        self._reaped += reaped
+        for job in dead:
+            await self._dead_letter(job, "visibility timeout")
+        while len(self._running) < self._concurrency and not self._stop.is_set():
+            job = await self._queue.claim()
+            if job is None:
+                break
+            task = asyncio.create_task(self._execute(job), name=f"job-{self._queue.name}-{job.job_id}")
+            self._running[job.job_id] = task
+            task.add_done_callback(lambda _t, jid=job.job_id: self._on_done(jid))
+        self._last_depth = await self._queue.depth()
+
+    def _on_done(self, job_id: str) -> None:
+        self._running.pop(job_id, None)
+        # 空出槽位后立即领取下一个
+        self._wakeup.set()
+
+    async def _execute(self, job: Job) -> None:
+        progress: dict[str, Any] | None = None
+
+        async def report(p: dict[str, Any]) -> None:
+            nonlocal progress
+            progress = p
+            try:
+                await self._queue.extend(job, progress=p)
+            except Exception:
+                pass
+
+        async def keepalive() -> None:
+            while True:
+                await asyncio.sleep(self._queue.visibility_s / 3)
+                try:
+                    await self._queue.extend(job, progress=progress)
+                except Exception:
+                    pass
+
+        heartbeat = asyncio.create_task(keepalive())
+        try:
+            await self._handler(job, report)
+        except asyncio.CancelledError:
+            heartbeat.cancel()
+            await asyncio.shield(self._queue.release(job))
+            raise
+        except Exception as e:
+            heartbeat.cancel()
+            outcome = await self._queue.fail(job, f"{type(e).__name__}: {e}")
+            if outcome == "retrying":
+                self._retried += 1
+            elif outcome == "dead":
+                await self._dead_letter(job, str(e))
+            else:
+                self._lost += 1
+            return
+        heartbeat.cancel()
+        if await self._queue.ack(job):
+            self._completed += 1
+        else:
+            self._lost += 1
+
+    async def _dead_letter(self, job: Job, error: str) -> None:
+        self._dead += 1
+        if self._on_dead is not None:
+            try:
+                await self._on_dead(job, error)
+            except Exception:
+                pass
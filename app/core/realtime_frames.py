@@ -0,0 +1,160 @@
+"""
+/classroom/realtime 二进制帧协议（WebSocket binary message）：
+
+    偏移  长度  字段
+    0     2     magic  b"AF"
+    2     1     version（当前 1）
+    3     1     flags：bit0 is_last，bit1 带 mock_text
+    4     1     codec：0 pcm_s16le，1 opus
+    5     1     role：0 teacher，1 student
+    6     8     timestamp（float64，秒）
+    14    4     seq（uint32，客户端帧序号）
+    18    2×4   session_id / user_id / user_name / mock_text 的 UTF-8 字节长度（uint16）
+    26    ...   上述 4 个字符串依次排列，其后到消息末尾全部是音频字节
+
+所有整数 / 浮点均为小端。音频不做 base64，解码后以 memoryview 交给下游，不复制。
+"""
+
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass
+from typing import Any
+
+
+_HEADER = struct.Struct("<2sBBBBdIHHHH")
+_MAGIC = b"AF"
+_VERSION = 1
+
+FLAG_LAST = 0x01
+FLAG_MOCK_TEXT = 0x02
+
+_CODECS = ("pcm_s16le", "opus")
+_ROLES = ("teacher", "student")
+
+
+# ack 只有 timestamp / seq 会变化：预先编码好模板，输出与 json.dumps 完全一致（float 同样按 repr 输出）
+_ACK = '{"ok": true, "timestamp": %r}'
+_ACK_SEQ = '{"ok": true, "timestamp": %r, "seq": %d}'
+_ACK_CUMULATIVE = '{"ok": true, "timestamp": %r, "ack": %d, "count": %d, "session_seq": %d}'
+
+
+class FrameDecodeError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class BinaryAudioFrame:
+    session_id: str
+    user_id: str
+    user_name: str
+    role: str
+    timestamp: float
+    seq: int
+    codec: str
+    audio: memoryview
+    is_last: bool = False
+    mock_text: str | None = None
+
+
+def encode_audio_frame(
+    *,
+    session_id: str,
+    user_id: str,
+    user_name: str,
+    role: str,
+    timestamp: float,
+    seq: int,
+    audio: bytes | bytearray | memoryview,
+    codec: str = "pcm_s16le",
+    is_last: bool = False,
+    mock_text: str | None = None,
+) -> bytes:
+    sid, uid, uname = session_id.encode("utf-8"), user_id.encode("utf-8"), user_name.encode("utf-8")
+    text = mock_text.encode("utf-8") if mock_text else b""
+    flags = (FLAG_LAST if is_last else 0) | (FLAG_MOCK_TEXT if mock_text else 0)
+    header = _HEADER.pack(
+        _MAGIC,
+        _VERSION,
+        flags,
+        _CODECS.index(codec),
+        _ROLES.index(role),
+        timestamp,
+        seq & 0xFFFFFFFF,
+        len(sid),
+        len(uid),
+        len(uname),
+        len(text),
+    )
+    return b"".join((header, sid, uid, uname, text, audio))
+
+
+def decode_audio_frame(data: bytes | bytearray | memoryview) -> BinaryAudioFrame:
+    mv = memoryview(data)
+    if len(mv) < _HEADER.size:
+        raise FrameDecodeError(f"frame too short: {len(mv)} bytes")
+    magic, version, flags, codec, role, timestamp, seq, n_sid, n_uid, n_uname, n_text = _HEADER.unpack_from(mv)
+    if magic != _MAGIC:
+        raise FrameDecodeError("bad frame magic")
+    if version != _VERSION:
+        raise FrameDecodeError(f"unsupported frame version: {version}")
+    if codec >= len(_CODECS) or role >= len(_ROLES):
+        raise FrameDecodeError(f"bad codec/role: {codec}/{role}")
+
+    off = _HEADER.size
+    end = off + n_sid + n_uid + n_uname + n_text
+    if end > len(mv):
+        raise FrameDecodeError("frame header lengths exceed payload")
+    session_id = str(mv[off : off + n_sid], "utf-8")
+    off += n_sid
+    user_id = str(mv[off : off + n_uid], "utf-8")
+    off += n_uid
+    user_name = str(mv[off : off + n_uname], "utf-8")
+    off += n_uname
+    mock_text = str(mv[off : off + n_text], "utf-8") if flags & FLAG_MOCK_TEXT else None
+    if not session_id or not user_id or not user_name:
+        raise FrameDecodeError("session_id / user_id / user_name must not be empty")
+    if end == len(mv):
+        raise FrameDecodeError("frame has no audio")
+
+    return BinaryAudioFrame(
+        session_id=session_id,
+        user_id=user_id,
+        user_name=user_name,
+        role=_ROLES[role],
+        timestamp=timestamp,
+        seq=seq,
+        codec=_CODECS[codec],
+        audio=mv[end:],
+        is_last=bool(flags & FLAG_LAST),
+        mock_text=mock_text,
+    )
+
+
+def encode_ack(timestamp: float, seq: int | None = None) -> str:
+    if seq is None:
+        return _ACK % timestamp
+    return _ACK_SEQ % (timestamp, seq)
+
+
+def encode_cumulative_ack(timestamp: float, seq: int, count: int, session_seq: int) -> str:
+    """流水线模式的累计 ack：seq 及之前的帧都已处理，count 为本次 ack 覆盖的帧数。"""
+    return _ACK_CUMULATIVE % (timestamp, seq, count, session_seq)
+
+
+def utterance_from_frame(frame: Any) -> dict[str, Any]:
+    """
+    由已校验的 mock_text 帧（RealtimeAudioFrame / BinaryAudioFrame）直接构造发言记录，
+    字段与顺序同 UtteranceFact.model_dump()，省去一次模型构造与导出；编码只在写入 Redis 时进行一次。
+    """
+    return {
+        "session_id": frame.session_id,
+        "user_id": frame.user_id,
+        "user_name": frame.user_name,
+        "role": frame.role,
+        "text": frame.mock_text,
+        "start_time": frame.timestamp,
+        "end_time": frame.timestamp,
+        "timestamp": frame.timestamp,
+        "confidence": 1.0,
+    }
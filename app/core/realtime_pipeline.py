@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from time import perf_counter, time
+from typing import Any, Awaitable, Callable
+
+from app.core.realtime_frames import encode_cumulative_ack
+
+
+FrameHandler = Callable[[Any], Awaitable[int]]
+SendText = Callable[[str], Awaitable[None]]
+
+
+class PipelineError(RuntimeError):
+    pass
+
+
+class PipelinedIngest:
+    """
+    /classroom/realtime 流水线模式（一个连接一个实例，与传输层无关）：
+
+    - 读循环 submit() 只做序号检查并入队，不等待处理完成，客户端可以连续发送
+    - 单个处理协程按到达顺序调用 handle，同一连接内帧的处理顺序不变
+    - 累计 ack：每处理 ack_every 帧，或最早一个未 ack 的帧处理完已超过 ack_ms，发送一次
+      {"ok": true, "ack": 最后处理的 seq, "count": 本次覆盖帧数, "session_seq": 课堂内接收序号}
+    - 在途窗口：最多 window 帧排队等待处理；队列满时 submit() 阻塞，读循环停止读取 socket，
+      由 TCP 流控把背压传回客户端（客户端也应自行保证未 ack 帧数不超过 window）
+    - 任一帧处理失败：先 ack 已处理的帧，再发送 {"ok": false, "seq": 失败帧, "error": ...}，随后结束
+    """
+
+    def __init__(
+        self,
+        *,
+        handle: FrameHandler,
+        send: SendText,
+        window: int = 256,
+        ack_every: int = 20,
+        ack_ms: int = 100,
+    ) -> None:
+        self._handle = handle
+        self._send = send
+        self.window = max(1, window)
+        self.ack_every = max(1, ack_every)
+        self.ack_ms = max(0, ack_ms)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.window)
+        self._task: asyncio.Task | None = None
+
+        self._last_submitted: int | None = None
+        self._processed_seq: int | None = None
+        self._session_seq = 0
+        self._unacked = 0
+        self._ack_deadline = 0.0
+        self._error: str | None = None
+
+        self.frames = 0
+        self.acks = 0
+
+    def hello(self) -> str:
+        return json.dumps(
+            {"ok": True, "mode": "pipelined", "window": self.window, "ack_every": self.ack_every, "ack_ms": self.ack_ms},
+            ensure_ascii=False,
+        )
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="realtime-pipeline")
+
+    @property
+    def failed(self) -> bool:
+        return self._error is not None
+
+    async def submit(self, frame: Any) -> None:
+        seq = getattr(frame, "seq", None)
+        if seq is None:
+            raise PipelineError("pipelined mode requires seq on every frame")
+        if self._last_submitted is not None and seq <= self._last_submitted:
+            raise PipelineError(f"seq must increase: got {seq} after {self._last_submitted}")
+        if self._error is not None or (self._task is not None and self._task.done()):
+            raise PipelineError(self._error or "pipeline closed")
+        self._last_submitted = seq
+        await self._put(frame)
+
+    async def close(self) -> None:
+        """不再提交新帧：处理完已入队的帧、发送最后一次 ack 后返回。"""
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._put(None)
+        await asyncio.wait([self._task])
+
+    async def _put(self, item: Any) -> None:
+        if not self._queue.full():
+            self._queue.put_nowait(item)
+            return
+        # 处理协程已退出时队列不会再被消费，不能在满队列上一直等待
+        put = asyncio.ensure_future(self._queue.put(item))
+        done, _ = await asyncio.wait([put, self._task], return_when=asyncio.FIRST_COMPLETED)
+        if put not in done:
+            put.cancel()
+            raise PipelineError(self._error or "pipeline closed")
+
+    async def _run(self) -> None:
+        while True:
+            if self._unacked:
+                timeout = self._ack_deadline - perf_counter()
+                if timeout <= 0:
+                    await self._flush_ack()
+                    continue
+                try:
+                    frame = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    await self._flush_ack()
+                    continue
+            else:
+                frame = await self._queue.get()
+
+            if frame is None:
+                await self._flush_ack()
+                return
+            try:
+                self._session_seq = await self._handle(frame)
+            except Exception as e:
+                self._error = str(e)
+                await self._flush_ack()
+                await self._send(json.dumps({"ok": False, "seq": frame.seq, "error": str(e)}, ensure_ascii=False))
+                return
+
+            self.frames += 1
+            self._processed_seq = frame.seq
+            self._unacked += 1
+            if self._unacked == 1:
+                self._ack_deadline = perf_counter() + self.ack_ms / 1000
+            if self._unacked >= self.ack_every:
+                await self._flush_ack()
+
+    async def _flush_ack(self) -> None:
+        if not self._unacked or self._processed_seq is None:
+            return
+        count, self._unacked = self._unacked, 0
+        self.acks += 1
+        await self._send(encode_cumulative_ack(time(), self._processed_seq, count, self._session_seq))
@@ -2,24 +2,65 @@ from __future__ import annotations
 
 import asyncio
 from time import time
+from typing import Any, Callable
 
 from app.core.settings import Settings
-from app.core.summarization import LlmSummarizer
+from app.core.stage_trigger import StageSummaryTrigger
+from app.core.summarization import LlmSummarizer, format_utterance_line
 from app.infra.redis_fact_store import RedisFactStore
+from app.infra.redis_session_lease import RedisSessionLeaseManager
 
 
 class StageSummaryScheduler:
     """
     阶段性智能处理层：周期性扫描 RUNNING 课堂，触发阶段总结。
+
+    - 每个课堂一个后台任务，用信号量限制并发（stage_summary_concurrency <= 1 时逐个处理）；
+      同一课堂在上一次处理结束前不会被再次调度（in-flight 保护）
+    - stage_summary_trigger="event"：由 StageSummaryTrigger 决定哪些课堂到期，
+      只有同时满足 min_chars 与 min_interval_s 的课堂才会读 Redis；"poll" 为每个 tick 扫描全部 RUNNING 课堂
+    - leases 不为空时（多 worker / 多节点）：每个 tick 续期租约并按 rendezvous hash 重新切分，
+      只处理本 worker 持有租约的课堂；发言可能写在其他 worker，所以事件模式下每 min_interval_s 兜底检查一次
     """
 
-    def __init__(self, *, store: RedisFactStore, summarizer: LlmSummarizer, settings: Settings) -> None:
+    def __init__(
+        self,
+        *,
+        store: RedisFactStore,
+        summarizer: LlmSummarizer,
+        settings: Settings,
+        leases: RedisSessionLeaseManager | None = None,
+        on_stage_summary: Callable[[str, dict[str, Any]], None] | None = None,
+    ) -> None:
         self._store = store
+        self._on_stage_summary = on_stage_summary
         self._summarizer = summarizer
         self._settings = settings
         self._task: asyncio.Task | None = None
         self._stop = asyncio.Event()
 
+        self._interval_s = float(settings.stage_summary_tick_interval_s)
+        self._concurrency = max(1, int(settings.stage_summary_concurrency))
+        self._sem = asyncio.Semaphore(self._concurrency)
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._processing: set[str] = set()
+        self._leases = leases
+        self._trigger: StageSummaryTrigger | None = None
+        if settings.stage_summary_trigger == "event":
+            self._trigger = StageSummaryTrigger(
+                min_chars=settings.stage_summary_min_chars,
+                min_interval_s=settings.stage_summary_min_interval_s,
+                recheck_s=settings.stage_summary_min_interval_s if leases is not None else None,
+            )
+
+        self._ticks = 0
+        self._last_tick_lag_s = 0.0
+        self._max_tick_lag_s = 0.0
+        self._last_queue_wait_s = 0.0
+        self._max_queue_wait_s = 0.0
+        self._last_running = 0
+        self._skipped_inflight = 0
+
     def start(self) -> None:
         if self._task is not None:
             return
@@ -29,74 +70,179 @@ class StageSummaryScheduler:
         self._stop.set()
         if self._task is not None:
             await asyncio.wait([self._task], timeout=3.0)
+        pending = list(self._inflight.values())
+        if pending:
+            await asyncio.wait(pending, timeout=3.0)
+            for t in pending:
+                t.cancel()
+        if self._leases is not None:
+            try:
+                await self._leases.release_all()
+            except Exception:
+                pass
+
+    def on_session_opened(self, session_id: str) -> None:
+        if self._trigger is not None:
+            self._trigger.track(session_id)
+
+    def on_session_ended(self, session_id: str) -> None:
+        if self._trigger is not None:
+            self._trigger.discard(session_id)
+
+    def on_utterance(self, session_id: str, utterance: dict) -> None:
+        if self._trigger is None or not utterance.get("text"):
+            return
+        self._trigger.on_utterance(
+            session_id,
+            float(utterance.get("timestamp") or 0.0),
+            len(format_utterance_line(utterance)) + 1,
+        )
+
+    def stats(self) -> dict:
+        """
+        调度指标，用于评估并发上限是否足够：
+        - tick_lag_s：实际 tick 开始时间相对计划时间的滞后
+        - queue_wait_s：课堂任务等待并发槽位的时间
+        """
+        return {
+            "trigger": "event" if self._trigger is not None else "poll",
+            "tracked_sessions": len(self._trigger) if self._trigger is not None else None,
+            "worker_id": self._leases.worker_id if self._leases is not None else None,
+            "alive_workers": len(self._leases.alive_workers) if self._leases is not None else None,
+            "owned_sessions": len(self._leases.owned) if self._leases is not None else None,
+            "concurrency": self._concurrency,
+            "ticks": self._ticks,
+            "running_sessions": self._last_running,
+            "inflight": len(self._inflight),
+            "skipped_inflight": self._skipped_inflight,
+            "last_tick_lag_s": round(self._last_tick_lag_s, 4),
+            "max_tick_lag_s": round(self._max_tick_lag_s, 4),
+            "last_queue_wait_s": round(self._last_queue_wait_s, 4),
+            "max_queue_wait_s": round(self._max_queue_wait_s, 4),
+        }
 
     async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._trigger is not None and self._leases is None:
+            try:
+                for session_id in await self._list_running_sessions():
+                    self._trigger.probe(session_id)
+            except Exception:
+                pass
+        next_at = loop.time()
         while not self._stop.is_set():
+            lag = max(0.0, loop.time() - next_at)
+            self._last_tick_lag_s = lag
+            self._max_tick_lag_s = max(self._max_tick_lag_s, lag)
+            self._ticks += 1
             try:
                 await self._tick()
             except Exception:
                 pass
-            await asyncio.sleep(2.0)
+            next_at = max(next_at + self._interval_s, loop.time())
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
 
     async def _tick(self) -> None:
-        sessions = await self._list_running_sessions()
+        running: list[str] | None = None
+        if self._leases is not None:
+            running = await self._refresh_leases()
+
+        if self._trigger is not None:
+            sessions = self._trigger.pop_due()
+        else:
+            sessions = running if running is not None else await self._list_running_sessions()
+            self._last_running = len(sessions)
+        if self._leases is not None:
+            sessions = [sid for sid in sessions if self._leases.owns(sid)]
+        # concurrency=1 也走后台任务（信号量为 1 时逐个处理）：tick 不被长时间的 LLM 调用阻塞，
+        # 每轮照常续期租约，正在处理的课堂记在 _processing 里，不会在处理中途被其他 worker 接管
         for session_id in sessions:
+            if session_id in self._inflight:
+                self._skipped_inflight += 1
+                continue
+            task = asyncio.create_task(self._process_guarded(session_id), name=f"stage-summary-{session_id}")
+            self._inflight[session_id] = task
+            task.add_done_callback(lambda _t, sid=session_id: self._inflight.pop(sid, None))
+
+    async def _process_guarded(self, session_id: str) -> None:
+        queued_at = time()
+        async with self._sem:
+            wait = time() - queued_at
+            self._last_queue_wait_s = wait
+            self._max_queue_wait_s = max(self._max_queue_wait_s, wait)
+            if self._stop.is_set():
+                return
+            if self._leases is not None and not self._leases.owns(session_id):
+                return
+            self._processing.add(session_id)
             try:
                 await self._process_session(session_id)
             except Exception:
-                continue
+                self._retry_later(session_id)
+            finally:
+                self._processing.discard(session_id)
+
+    def _retry_later(self, session_id: str) -> None:
+        if self._trigger is not None:
+            self._trigger.probe(session_id, at=time() + self._settings.stage_summary_min_interval_s)
+
+    async def _refresh_leases(self) -> list[str]:
+        assert self._leases is not None
+        running = await self._list_running_sessions()
+        self._last_running = len(running)
+        gained, _ = await self._leases.rebalance(running, busy=set(self._processing))
+        if self._trigger is not None:
+            for session_id in sorted(gained):
+                self._trigger.probe(session_id)
+        return running
 
     async def _list_running_sessions(self) -> list[str]:
-        keys = await self._store._r.keys("class:*:progress")
-        out: list[str] = []
-        for k in keys:
-            if isinstance(k, (bytes, bytearray)):
-                k = k.decode("utf-8", errors="replace")
-            parts = str(k).split(":")
-            if len(parts) < 3:
-                continue
-            session_id = parts[1]
-            try:
-                prog = await self._store.get_progress(session_id)
-            except Exception:
-                continue
-            if prog.status == "RUNNING":
-                out.append(session_id)
-        return out
+        return await self._store.list_running_sessions()
 
     async def _process_session(self, session_id: str) -> None:
         prog = await self._store.get_progress(session_id)
+        if prog.status != "RUNNING":
+            self.on_session_ended(session_id)
+            return
         now = time()
         if (now - prog.last_stage_summary_ts) < self._settings.stage_summary_min_interval_s:
+            if self._trigger is not None:
+                self._trigger.probe(session_id, at=prog.last_stage_summary_ts + self._settings.stage_summary_min_interval_s)
             return
 
-        utterances = await self._store.list_utterances(
+        utterances, next_cursor = await self._store.read_utterances(
             session_id,
+            cursor=prog.stage_cursor,
             start_ts_exclusive=prog.last_stage_summary_ts,
             limit=self._settings.stage_summary_max_utterances,
         )
-        if not utterances:
-            return
-
-        text = "\n".join(
-            [f"[{u.get('role')}][{u.get('user_name')}] {u.get('text')}" for u in utterances if u.get("text")]
-        ).strip()
-        if len(text) < self._settings.stage_summary_min_chars:
+        text = "\n".join([format_utterance_line(u) for u in utterances if u.get("text")]).strip()
+        if not utterances or len(text) < self._settings.stage_summary_min_chars:
+            if self._trigger is not None:
+                self._trigger.on_checked(
+                    session_id,
+                    last_summary_ts=prog.last_stage_summary_ts,
+                    last_utterance_ts=prog.last_utterance_ts,
+                    pending_chars=len(text),
+                )
             return
 
         stage = await self._summarizer.summarize_stage(utterances_text=text)
-        await self._store.append_stage_summary(
-            session_id,
-            stage.timestamp,
-            {
-                "timestamp": stage.timestamp,
-                "summary": stage.summary,
-                "knowledge_points": stage.knowledge_points,
-                "classroom_insights": stage.classroom_insights,
-                "window": {
-                    "start_ts_exclusive": prog.last_stage_summary_ts,
-                    "end_ts_inclusive": utterances[-1].get("timestamp", stage.timestamp),
-                },
+        summary = {
+            "timestamp": stage.timestamp,
+            "summary": stage.summary,
+            "knowledge_points": stage.knowledge_points,
+            "classroom_insights": stage.classroom_insights,
+            "window": {
+                "start_ts_exclusive": prog.last_stage_summary_ts,
+                "first_utterance_ts": utterances[0].get("timestamp"),
+                "end_ts_inclusive": utterances[-1].get("timestamp", stage.timestamp),
             },
-        )
-
+        }
+        await self._store.append_stage_summary(session_id, stage.timestamp, summary, cursor=next_cursor)
+        if self._on_stage_summary is not None:
+            self._on_stage_summary(session_id, summary)
+        if self._trigger is not None:
+            self._trigger.on_summarized(session_id, float(summary["window"]["end_ts_inclusive"]))
+            if len(utterances) >= self._settings.stage_summary_max_utterances:
+                self._trigger.probe(session_id, at=stage.timestamp + self._settings.stage_summary_min_interval_s)
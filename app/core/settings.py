@@ -8,14 +8,98 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
     redis_url: str = Field(default="redis://localhost:6379/0")
+    redis_max_connections: int = Field(default=64)
 
     ark_base_url: str = Field(default="https://ark.cn-beijing.volces.com/api/v3")
     ark_api_key: str | None = Field(default=None)
     ark_model: str = Field(default="doubao-seed-1-8-251228")
+    ark_timeout_s: float = Field(default=60.0)
+    ark_retry_max_attempts: int = Field(default=3)
+    ark_retry_base_ms: int = Field(default=200)
+    ark_retry_max_ms: int = Field(default=5000)
+    ark_hedge_enabled: bool = Field(default=False)
+    ark_hedge_quantile: float = Field(default=0.95)
+    ark_hedge_min_delay_ms: int = Field(default=2000)
+    ark_breaker_failure_threshold: int = Field(default=5)
+    ark_breaker_reset_s: float = Field(default=30.0)
+
+    llm_max_concurrency: int = Field(default=16)
+    llm_requests_per_s: float = Field(default=0.0)
+    llm_tokens_per_min: int = Field(default=0)
+    llm_expected_output_tokens: int = Field(default=800)
+    llm_single_flight: bool = Field(default=True)
+
+    llm_tokenizer: str = Field(default="chars")
+    llm_stage_prompt_tokens: int = Field(default=8000)
+    llm_final_prompt_tokens: int = Field(default=32000)
+    llm_command_prompt_tokens: int = Field(default=4000)
+
+    llm_cache_enabled: bool = Field(default=False)
+    llm_cache_kinds: str = Field(default="stage,final,command")
+    llm_cache_ttl_s: int = Field(default=86400)
+    llm_cache_lru_size: int = Field(default=256)
+
+    agent_command_stream: bool = Field(default=True)
+    agent_command_delta_flush_ms: int = Field(default=50)
+
+    timeline_backend: str = Field(default="zset")
+    timeline_stream_maxlen: int = Field(default=20000)
+    timeline_stream_skew_s: float = Field(default=30.0)
+
+    fact_codec: str = Field(default="json")
+    fact_codec_compress: str = Field(default="none")
+    fact_codec_compress_min_bytes: int = Field(default=2048)
+
+    utterance_flush_ms: int = Field(default=20)
+    utterance_batch_size: int = Field(default=256)
+
+    asr_enabled: bool = Field(default=False)
+    asr_ws_url: str = Field(default="wss://openspeech.bytedance.com/api/v3/sauc/bigmodel")
+    asr_app_key: str = Field(default="")
+    asr_access_key: str = Field(default="")
+    asr_resource_id: str = Field(default="volc.bigasr.sauc.duration")
+    asr_sample_rate: int = Field(default=16000)
+    asr_queue_frames: int = Field(default=500)
+    asr_reconnect_max_s: float = Field(default=10.0)
+    asr_final_timeout_s: float = Field(default=5.0)
+    asr_end_window_ms: int = Field(default=0)
+
+    audio_buffer_max_mb_per_session: float = Field(default=2.0)
+    audio_buffer_track_seconds: float = Field(default=20.0)
+
+    vad_enabled: bool = Field(default=True)
+    vad_backend: str = Field(default="auto")  # auto / numpy / python
+    vad_batch_ms: float = Field(default=20.0)
+    vad_min_energy_db: float = Field(default=-50.0)
+    vad_snr_db: float = Field(default=10.0)
+    vad_hangover_ms: int = Field(default=400)
+
+    realtime_pipeline_window: int = Field(default=256)
+    realtime_pipeline_ack_every: int = Field(default=20)
+    realtime_pipeline_ack_ms: int = Field(default=100)
+
+    context_cache_enabled: bool = Field(default=False)
+    context_cache_lines: int = Field(default=80)
 
     stage_summary_min_interval_s: int = Field(default=120)
     stage_summary_min_chars: int = Field(default=1200)
     stage_summary_max_utterances: int = Field(default=120)
+    stage_summary_tick_interval_s: float = Field(default=2.0)
+    stage_summary_concurrency: int = Field(default=8)
+    stage_summary_trigger: str = Field(default="event")
+    stage_summary_partition: bool = Field(default=False)
+    stage_summary_lease_ttl_s: float = Field(default=15.0)
+
+    final_report_mode: str = Field(default="auto")
+    final_report_chunk_utterances: int = Field(default=200)
+    final_report_map_concurrency: int = Field(default=4)
+    final_report_workers: int = Field(default=4)
+    final_report_visibility_s: float = Field(default=120.0)
+    final_report_max_attempts: int = Field(default=3)
+    final_report_retry_base_s: float = Field(default=5.0)
+    final_report_poll_interval_s: float = Field(default=1.0)
+    report_draft_enabled: bool = Field(default=True)
+    report_draft_concurrency: int = Field(default=4)
 
 
 settings = Settings()
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import heapq
+from collections import deque
+from dataclasses import dataclass, field
+from time import time
+
+
+@dataclass
+class _TriggerState:
+    # 已被阶段总结覆盖的最后一条发言的时间戳（发言时间线的时间，不是总结生成的时间）
+    last_summary_ts: float = 0.0
+    pending_chars: int = 0
+    pending: deque[tuple[float, int]] = field(default_factory=deque)
+    armed_at: float | None = None
+
+
+class StageSummaryTrigger:
+    """
+    阶段总结触发引擎（进程内，事件驱动）。
+
+    - 由 append_utterance 之后的 on_utterance 喂入：累计“上次阶段总结之后”的字符数
+    - 满足 min_chars 后按 last_summary_ts + min_interval_s 放入最小堆
+    - 调度器每个 tick 只 pop 已到期的课堂，空闲课堂不产生任何 Redis 读
+    - recheck_s：检查后仍不满足条件时，隔多久再兜底检查一次（发言写入在其他 worker 时使用）
+    """
+
+    def __init__(self, *, min_chars: int, min_interval_s: float, recheck_s: float | None = None) -> None:
+        self._min_chars = int(min_chars)
+        self._min_interval_s = float(min_interval_s)
+        self._recheck_s = recheck_s
+        self._states: dict[str, _TriggerState] = {}
+        self._heap: list[tuple[float, int, str]] = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def track(self, session_id: str, *, last_summary_ts: float = 0.0) -> None:
+        if session_id not in self._states:
+            self._states[session_id] = _TriggerState(last_summary_ts=last_summary_ts)
+
+    def discard(self, session_id: str) -> None:
+        self._states.pop(session_id, None)
+
+    def probe(self, session_id: str, *, at: float | None = None) -> None:
+        """强制在 at（默认现在）检查一次该课堂，用于重启后从 Redis 对齐状态。"""
+        self.track(session_id)
+        self._arm(session_id, self._states[session_id], time() if at is None else at)
+
+    def on_utterance(self, session_id: str, timestamp: float, chars: int) -> None:
+        st = self._states.get(session_id)
+        if st is None:
+            st = _TriggerState()
+            self._states[session_id] = st
+        if timestamp <= st.last_summary_ts:
+            return
+        st.pending.append((timestamp, chars))
+        st.pending_chars += chars
+        if st.armed_at is None and st.pending_chars >= self._min_chars:
+            self._arm(session_id, st, st.last_summary_ts + self._min_interval_s)
+
+    def on_summarized(self, session_id: str, covered_until: float) -> None:
+        """
+        covered_until 为本次总结窗口最后一条发言的时间戳：LLM 调用期间到达的发言不在窗口里，计数要保留。
+        """
+        st = self._states.get(session_id)
+        if st is None:
+            return
+        st.last_summary_ts = max(st.last_summary_ts, covered_until)
+        while st.pending and st.pending[0][0] <= covered_until:
+            st.pending_chars -= st.pending.popleft()[1]
+        st.armed_at = None
+        if st.pending_chars >= self._min_chars:
+            self._arm(session_id, st, covered_until + self._min_interval_s)
+        elif self._recheck_s is not None:
+            self._arm(session_id, st, covered_until + max(self._min_interval_s, self._recheck_s))
+
+    def on_checked(self, session_id: str, *, last_summary_ts: float, last_utterance_ts: float, pending_chars: int) -> None:
+        """
+        到期检查后没有生成总结时，用 Redis 里的真实值校正计数。last_summary_ts 为上次总结生成的时间，
+        只用于计算下次到期时间；覆盖位置不变（未总结的发言已全部计入 pending_chars）。
+        """
+        st = self._states.get(session_id)
+        if st is None:
+            return
+        st.pending = deque([(last_utterance_ts, pending_chars)]) if pending_chars > 0 else deque()
+        st.pending_chars = pending_chars
+        st.armed_at = None
+        if pending_chars >= self._min_chars:
+            self._arm(session_id, st, last_summary_ts + self._min_interval_s)
+        elif self._recheck_s is not None:
+            self._arm(session_id, st, time() + self._recheck_s)
+
+    def pop_due(self, now: float | None = None) -> list[str]:
+        now = time() if now is None else now
+        out: list[str] = []
+        while self._heap and self._heap[0][0] <= now:
+            at, _, session_id = heapq.heappop(self._heap)
+            st = self._states.get(session_id)
+            if st is None or st.armed_at != at:
+                continue
+            st.armed_at = None
+            out.append(session_id)
+        return out
+
+    def next_due_at(self) -> float | None:
+        return self._heap[0][0] if self._heap else None
+
+    def _arm(self, session_id: str, st: _TriggerState, at: float) -> None:
+        if st.armed_at is not None and st.armed_at <= at:
+            return
+        st.armed_at = at
+        self._seq += 1
+        heapq.heappush(self._heap, (at, self._seq, session_id))
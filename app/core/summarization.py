@@ -2,11 +2,15 @@ from __future__ import annotations
 
 import json
 import re
+from collections.abc import AsyncIterator, Callable
 from dataclasses import dataclass
-from time import time
+from time import perf_counter, time
 from typing import Any
 
+from app.llm.admission import PRIORITY_COMMAND, PRIORITY_FINAL, PRIORITY_STAGE
 from app.llm.ark_client import ArkChatClient, ArkChatContentPart, ArkChatTurn
+from app.llm.prompt_builder import CharTokenEstimator, PromptBuilder, PromptReport, PromptStatsRecorder, TokenEstimator
+from app.llm.response_cache import LlmResponseCache
 
 
 @dataclass(frozen=True)
@@ -27,36 +31,167 @@ def _try_parse_json(text: str) -> dict[str, Any] | None:
         return None
 
 
+def _parse_final(raw: str) -> dict[str, Any]:
+    parsed = _try_parse_json(raw)
+    if parsed:
+        return parsed
+    return {
+        "summary": raw.strip(),
+        "knowledge_points": [],
+        "homework_suggestion": [],
+        "classroom_report": {"participation_overview": "", "focus_overview": "", "highlights": []},
+    }
+
+
+def _parse_stage(raw: str) -> StageSummary:
+    parsed = _try_parse_json(raw) or {}
+    summary = str(parsed.get("summary") or raw).strip()
+    knowledge_points = parsed.get("knowledge_points") if isinstance(parsed.get("knowledge_points"), list) else []
+    classroom_insights = parsed.get("classroom_insights") if isinstance(parsed.get("classroom_insights"), list) else []
+    return StageSummary(
+        timestamp=time(),
+        summary=summary,
+        knowledge_points=[str(x) for x in knowledge_points if str(x).strip()][:30],
+        classroom_insights=[str(x) for x in classroom_insights if str(x).strip()][:30],
+    )
+
+
+def format_utterance_line(u: dict[str, Any]) -> str:
+    return f"[{u.get('role')}][{u.get('user_name')}] {u.get('text')}"
+
+
+def _lines(text: str) -> list[str]:
+    return text.split("\n") if text else []
+
+
 class LlmSummarizer:
-    def __init__(self, client: ArkChatClient) -> None:
+    """
+    cache 不为空时，cache_kinds 中的调用类型（stage / final / command）按 prompt 内容缓存回复；
+    各方法的 use_cache=False 跳过读缓存（仍会用新结果刷新缓存）。
+
+    prompt_budgets 按调用类型给出 prompt token 预算（<= 0 不限）：超预算时按段落优先级裁剪，
+    未超预算时 prompt 与不设预算完全一致。每次调用的 prompt 估算体积与耗时记录在 prompt_stats。
+    """
+
+    def __init__(
+        self,
+        client: ArkChatClient,
+        *,
+        cache: LlmResponseCache | None = None,
+        cache_kinds: frozenset[str] = frozenset(),
+        prompt_budgets: dict[str, int] | None = None,
+        estimator: TokenEstimator | None = None,
+    ) -> None:
         self._client = client
+        self._cache = cache
+        self._cache_kinds = cache_kinds
+        self._prompt_budgets = prompt_budgets or {}
+        self._estimator = estimator or CharTokenEstimator()
+        self.prompt_stats = PromptStatsRecorder()
+
+    def estimate_tokens(self, text: str) -> int:
+        return self._estimator.count(text)
+
+    def prompt_budget(self, call: str) -> int:
+        return self._prompt_budgets.get(call, 0)
+
+    def _builder(self, call: str) -> PromptBuilder:
+        return PromptBuilder(self._prompt_budgets.get(call, 0), estimator=self._estimator)
+
+    def _cache_for(self, call: str) -> LlmResponseCache | None:
+        if self._cache is None or call not in self._cache_kinds:
+            return None
+        return self._cache
+
+    async def _chat(
+        self,
+        turns: list[ArkChatTurn],
+        *,
+        call: str,
+        report: PromptReport,
+        use_cache: bool = True,
+        priority: str | None = None,
+    ) -> str:
+        started = perf_counter()
+        try:
+            return await self._chat_cached(turns, call=call, use_cache=use_cache, priority=priority or call)
+        finally:
+            self.prompt_stats.record(call, report, perf_counter() - started)
+
+    async def _chat_cached(self, turns: list[ArkChatTurn], *, call: str, use_cache: bool, priority: str) -> str:
+        cache = self._cache_for(call)
+        if cache is None:
+            return await self._client.chat(turns, priority=priority)
+
+        digest = LlmResponseCache.fingerprint(self._client.model, turns)
+        if use_cache:
+            hit = await cache.get(call, digest)
+            if hit is not None:
+                return hit
+        else:
+            cache.note_bypass(call)
+        raw = await self._client.chat(turns, priority=priority)
+        await cache.set(call, digest, raw)
+        return raw
 
-    async def summarize_stage(self, *, utterances_text: str, course_meta_text: str | None = None) -> StageSummary:
-        prompt = (
+    async def summarize_stage(
+        self,
+        *,
+        utterances_text: str,
+        course_meta_text: str | None = None,
+        use_cache: bool = True,
+        priority: str | None = None,
+    ) -> StageSummary:
+        """
+        priority 只影响 LLM 准入排队（例如课后报告的 map 阶段按 final 排队），prompt 预算与缓存仍按 stage。
+        """
+        b = self._builder(PRIORITY_STAGE)
+        prompt = b.fixed(
             "你是课堂AI助教。请基于课堂发言记录，输出严格JSON："
             '{"summary": "...", "knowledge_points": ["..."], "classroom_insights": ["..."]}\n'
             "要求：knowledge_points 为精炼短语；classroom_insights 用于课堂节奏/互动观察。\n\n"
         )
         if course_meta_text:
-            prompt += f"课程信息：\n{course_meta_text}\n\n"
-        prompt += f"发言记录：\n{utterances_text}"
+            prompt += b.fixed(f"课程信息：\n{course_meta_text}\n\n")
+        label = b.fixed("发言记录：\n")
+        b.add("utterances", _lines(utterances_text), priority=0, keep="tail")
+        parts = b.fit()
+        prompt += label + parts["utterances"]
 
         turns = [
             ArkChatTurn(role="user", content=[ArkChatContentPart(type="input_text", text=prompt)]),
         ]
-        raw = await self._client.chat(turns)
-        parsed = _try_parse_json(raw) or {}
-        summary = str(parsed.get("summary") or raw).strip()
-        knowledge_points = parsed.get("knowledge_points") if isinstance(parsed.get("knowledge_points"), list) else []
-        classroom_insights = (
-            parsed.get("classroom_insights") if isinstance(parsed.get("classroom_insights"), list) else []
-        )
-        return StageSummary(
-            timestamp=time(),
-            summary=summary,
-            knowledge_points=[str(x) for x in knowledge_points if str(x).strip()][:30],
-            classroom_insights=[str(x) for x in classroom_insights if str(x).strip()][:30],
+        raw = await self._chat(turns, call=PRIORITY_STAGE, report=b.report, use_cache=use_cache, priority=priority)
+        return _parse_stage(raw)
+
+    async def merge_windows(
+        self,
+        *,
+        windows_text: str,
+        use_cache: bool = True,
+        priority: str | None = None,
+    ) -> StageSummary:
+        """
+        把连续若干个时间窗口的小结（每行一个窗口）合并为一个小结，结构同 summarize_stage。
+        课后报告的窗口小结放不进一次汇总时逐层合并用；prompt 预算与缓存按 stage。
+        """
+        b = self._builder(PRIORITY_STAGE)
+        prompt = b.fixed(
+            "你是课堂AI助教。下面是同一节课连续若干时间段的小结（按时间顺序，每行一段），"
+            "请合并为这一整段时间的小结，输出严格JSON："
+            '{"summary": "...", "knowledge_points": ["..."], "classroom_insights": ["..."]}\n'
+            "要求：保留各时间段的关键内容与先后顺序；knowledge_points 去重后保留精炼短语。\n\n"
         )
+        label = b.fixed("各时间段小结：\n")
+        b.add("windows", _lines(windows_text), priority=0, keep="spread")
+        parts = b.fit()
+        prompt += label + parts["windows"]
+
+        turns = [
+            ArkChatTurn(role="user", content=[ArkChatContentPart(type="input_text", text=prompt)]),
+        ]
+        raw = await self._chat(turns, call=PRIORITY_STAGE, report=b.report, use_cache=use_cache, priority=priority)
+        return _parse_stage(raw)
 
     async def summarize_final(
         self,
@@ -64,32 +199,147 @@ class LlmSummarizer:
         utterances_text: str,
         stage_summaries_text: str,
         course_meta_text: str | None = None,
+        participation_text: str | None = None,
+        use_cache: bool = True,
+        on_report: Callable[[PromptReport], None] | None = None,
     ) -> dict[str, Any]:
-        prompt = (
+        """
+        participation_text 为发言统计（map-reduce 汇总时代替逐条发言）；此时 utterances_text 为空则省略发言段落。
+        on_report 收到本次 prompt 的裁剪情况（PromptReport），用于在报告里记录是否有内容被裁掉。
+        """
+        b = self._builder(PRIORITY_FINAL)
+        prompt = b.fixed(
             "你是课堂AI助教。请基于整节课的课堂事实与阶段总结，输出严格JSON："
             '{"summary": "...", "knowledge_points": ["..."], "homework_suggestion": ["..."],'
             ' "classroom_report": {"participation_overview":"...","focus_overview":"...","highlights":["..."]}}\n'
             "要求：summary 为可读的课后总结；knowledge_points 为精炼短语；homework_suggestion 为可执行条目。\n\n"
         )
         if course_meta_text:
-            prompt += f"课程信息：\n{course_meta_text}\n\n"
-        if stage_summaries_text.strip():
-            prompt += f"阶段总结：\n{stage_summaries_text}\n\n"
-        prompt += f"课堂发言事实：\n{utterances_text}"
+            prompt += b.fixed(f"课程信息：\n{course_meta_text}\n\n")
+        has_stage = bool(stage_summaries_text.strip())
+        if has_stage:
+            # 阶段总结已覆盖全程，优先保留；发言超预算时全程均匀抽样
+            b.add(
+                "stage_summaries",
+                _lines(stage_summaries_text),
+                priority=0,
+                keep="tail",
+                prefix="阶段总结：\n",
+                suffix="\n\n",
+            )
+        if participation_text:
+            b.add(
+                "participation",
+                _lines(participation_text),
+                priority=1,
+                keep="head",
+                prefix="发言统计：\n",
+                suffix="\n\n",
+            )
+        if bool(utterances_text) or not participation_text:
+            b.add("utterances", _lines(utterances_text), priority=2, keep="spread", prefix="课堂发言事实：\n")
+        parts = b.fit()
+        prompt += "".join(parts.get(name, "") for name in ("stage_summaries", "participation", "utterances"))
+        if on_report is not None:
+            on_report(b.report)
 
         turns = [
             ArkChatTurn(role="user", content=[ArkChatContentPart(type="input_text", text=prompt)]),
         ]
-        raw = await self._client.chat(turns)
-        parsed = _try_parse_json(raw)
-        if parsed:
-            return parsed
-        return {
-            "summary": raw.strip(),
-            "knowledge_points": [],
-            "homework_suggestion": [],
-            "classroom_report": {"participation_overview": "", "focus_overview": "", "highlights": []},
-        }
+        raw = await self._chat(turns, call=PRIORITY_FINAL, report=b.report, use_cache=use_cache)
+        return _parse_final(raw)
+
+    async def fold_final(
+        self,
+        *,
+        draft: dict[str, Any] | None,
+        stage_summaries_text: str,
+        utterances_text: str = "",
+        participation_text: str | None = None,
+        use_cache: bool = True,
+        on_report: Callable[[PromptReport], None] | None = None,
+    ) -> dict[str, Any]:
+        """
+        把草稿之后新增的阶段总结 / 发言合并进课后报告草稿（summarize_final 的结构），prompt 只包含增量。
+        draft 为空时等同于 summarize_final。输出不是合法 JSON 时与 summarize_final 一样按原文兜底，
+        不退回旧草稿（否则新增内容会被静默丢掉，而调用方以为已经合并）。
+        """
+        if draft is None:
+            return await self.summarize_final(
+                utterances_text=utterances_text,
+                stage_summaries_text=stage_summaries_text,
+                participation_text=participation_text,
+                use_cache=use_cache,
+                on_report=on_report,
+            )
+        b = self._builder(PRIORITY_FINAL)
+        prompt = b.fixed(
+            "你是课堂AI助教。下面是本节课截至目前的课后报告草稿（JSON）以及草稿之后新增的课堂内容，"
+            "请把新增内容合并进草稿，输出相同结构的严格JSON："
+            '{"summary": "...", "knowledge_points": ["..."], "homework_suggestion": ["..."],'
+            ' "classroom_report": {"participation_overview":"...","focus_overview":"...","highlights":["..."]}}\n'
+            "要求：保留草稿中仍然成立的内容并补充新增内容；summary 为可读的课后总结；knowledge_points 为精炼短语；"
+            "homework_suggestion 为可执行条目。\n\n"
+            f"当前草稿：\n{json.dumps(draft, ensure_ascii=False)}\n\n"
+        )
+        has_stage = bool(stage_summaries_text.strip())
+        if has_stage:
+            b.add(
+                "stage_summaries",
+                _lines(stage_summaries_text),
+                priority=0,
+                keep="tail",
+                prefix="新增阶段总结：\n",
+                suffix="\n\n",
+            )
+        if participation_text:
+            b.add(
+                "participation",
+                _lines(participation_text),
+                priority=1,
+                keep="head",
+                prefix="发言统计：\n",
+                suffix="\n\n",
+            )
+        if utterances_text:
+            b.add("utterances", _lines(utterances_text), priority=2, keep="spread", prefix="新增课堂发言事实：\n")
+        parts = b.fit()
+        prompt += "".join(parts.get(name, "") for name in ("stage_summaries", "participation", "utterances"))
+        if on_report is not None:
+            on_report(b.report)
+
+        turns = [
+            ArkChatTurn(role="user", content=[ArkChatContentPart(type="input_text", text=prompt.rstrip("\n"))]),
+        ]
+        raw = await self._chat(turns, call=PRIORITY_FINAL, report=b.report, use_cache=use_cache)
+        return _parse_final(raw)
+
+    def _command_turns(
+        self,
+        *,
+        instruction: str,
+        image_url: str | None,
+        context_text: str,
+    ) -> tuple[list[ArkChatTurn], PromptReport]:
+        b = self._builder(PRIORITY_COMMAND)
+        text = b.fixed(
+            "你是课堂AI助教。请结合课堂上下文与教师指令给出可直接发送给教师的中文回复。\n\n"
+            f"教师指令：{instruction}\n\n"
+            "课堂上下文：\n"
+        )
+        # 上下文首行可能是最近一条阶段总结，优先保留；发言超预算时保留最近的
+        lines = _lines(context_text)
+        head = lines[:1] if lines and lines[0].startswith("[阶段总结]") else []
+        b.add("stage_summary", head, priority=0, keep="head")
+        b.add("utterances", lines[len(head) :], priority=1, keep="tail")
+        parts = b.fit()
+        text += "\n".join(x for x in (parts["stage_summary"], parts["utterances"]) if x)
+
+        content: list[ArkChatContentPart] = []
+        if image_url:
+            content.append(ArkChatContentPart(type="input_image", image_url=image_url))
+        content.append(ArkChatContentPart(type="input_text", text=text))
+        return [ArkChatTurn(role="user", content=content)], b.report
 
     async def command_reply(
         self,
@@ -97,41 +347,48 @@ class LlmSummarizer:
         instruction: str,
         image_url: str | None,
         context_text: str,
+        use_cache: bool = True,
     ) -> str:
-        turns: list[ArkChatTurn] = []
+        turns, report = self._command_turns(instruction=instruction, image_url=image_url, context_text=context_text)
+        return (await self._chat(turns, call=PRIORITY_COMMAND, report=report, use_cache=use_cache)).strip()
 
-        if image_url:
-            turns.append(
-                ArkChatTurn(
-                    role="user",
-                    content=[
-                        ArkChatContentPart(type="input_image", image_url=image_url),
-                        ArkChatContentPart(
-                            type="input_text",
-                            text=(
-                                "你是课堂AI助教。请结合课堂上下文与教师指令给出可直接发送给教师的中文回复。\n\n"
-                                f"教师指令：{instruction}\n\n"
-                                f"课堂上下文：\n{context_text}"
-                            ),
-                        ),
-                    ],
-                )
-            )
-        else:
-            turns.append(
-                ArkChatTurn(
-                    role="user",
-                    content=[
-                        ArkChatContentPart(
-                            type="input_text",
-                            text=(
-                                "你是课堂AI助教。请结合课堂上下文与教师指令给出可直接发送给教师的中文回复。\n\n"
-                                f"教师指令：{instruction}\n\n"
-                                f"课堂上下文：\n{context_text}"
-                            ),
-                        )
-                    ],
-                )
-            )
+    async def command_reply_stream(
+        self,
+        *,
+        instruction: str,
+        image_url: str | None,
+        context_text: str,
+        use_cache: bool = True,
+    ) -> AsyncIterator[str]:
+        """
+        与 command_reply 相同的 prompt，流式产出回复文本增量（未做 strip，由调用方拼接后处理）。
+        命中缓存时整段回复作为一个增量产出；完整收完的流才会写入缓存。
+        """
+        turns, report = self._command_turns(instruction=instruction, image_url=image_url, context_text=context_text)
+        started = perf_counter()
+        try:
+            async for delta in self._stream_cached(turns, use_cache=use_cache):
+                yield delta
+        finally:
+            self.prompt_stats.record(PRIORITY_COMMAND, report, perf_counter() - started)
 
-        return (await self._client.chat(turns)).strip()
+    async def _stream_cached(self, turns: list[ArkChatTurn], *, use_cache: bool) -> AsyncIterator[str]:
+        cache = self._cache_for(PRIORITY_COMMAND)
+        if cache is None:
+            async for delta in self._client.chat_stream(turns, priority=PRIORITY_COMMAND):
+                yield delta
+            return
+
+        digest = LlmResponseCache.fingerprint(self._client.model, turns)
+        if use_cache:
+            hit = await cache.get(PRIORITY_COMMAND, digest)
+            if hit is not None:
+                yield hit
+                return
+        else:
+            cache.note_bypass(PRIORITY_COMMAND)
+        parts: list[str] = []
+        async for delta in self._client.chat_stream(turns, priority=PRIORITY_COMMAND):
+            parts.append(delta)
+            yield delta
+        await cache.set(PRIORITY_COMMAND, digest, "".join(parts))
@@ -0,0 +1,198 @@
+"""
+事实记录编码格式：
+
+- 旧数据：纯 JSON 文本（以 "{" 开头），无头部，永远可读
+- 新数据：3 字节头 + body
+    byte0 = 0xC1（msgpack 中永不使用的字节，用来和 JSON / 裸 msgpack 区分）
+    byte1 = 格式：1 = JSON(utf-8)，2 = msgpack v1（字段字典）
+    byte2 = 标志位：bit0-1 压缩（0 无 / 1 zlib / 2 zstd），bit2 省略 session_id，
+            bit3 start_time 等于 timestamp，bit4 end_time 等于 timestamp
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Any
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 可选依赖
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+
+class CodecError(RuntimeError):
+    pass
+
+
+_MAGIC = 0xC1
+_FMT_JSON = 1
+_FMT_MSGPACK_V1 = 2
+
+_COMP_NONE = 0
+_COMP_ZLIB = 1
+_COMP_ZSTD = 2
+_COMP_MASK = 0b11
+
+_FLAG_NO_SESSION = 1 << 2
+_FLAG_START_EQ_TS = 1 << 3
+_FLAG_END_EQ_TS = 1 << 4
+
+# msgpack v1 字段字典：只允许在末尾追加，已有下标不可改动
+_KEYS_V1: tuple[str, ...] = (
+    "session_id",
+    "user_id",
+    "user_name",
+    "role",
+    "text",
+    "start_time",
+    "end_time",
+    "timestamp",
+    "confidence",
+    "summary",
+    "knowledge_points",
+    "classroom_insights",
+    "window",
+    "start_ts_exclusive",
+    "end_ts_inclusive",
+    "result",
+    "homework_suggestion",
+    "classroom_report",
+    "participation_overview",
+    "focus_overview",
+    "highlights",
+)
+_KEY_INDEX_V1 = {k: i for i, k in enumerate(_KEYS_V1)}
+
+# msgpack v1 高频取值字典（ExtType 1 编码），同样只允许追加
+_VALUES_V1: tuple[str, ...] = ("teacher", "student")
+_VALUE_INDEX_V1 = {v: i for i, v in enumerate(_VALUES_V1)}
+_EXT_VALUE = 1
+
+
+def _pack_v1(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {_KEY_INDEX_V1.get(k, k): _pack_v1(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_pack_v1(v) for v in obj]
+    if isinstance(obj, str):
+        idx = _VALUE_INDEX_V1.get(obj)
+        if idx is not None:
+            return msgpack.ExtType(_EXT_VALUE, bytes([idx]))
+    return obj
+
+
+def _unpack_v1(obj: Any) -> Any:
+    if isinstance(obj, dict):
+        return {(_KEYS_V1[k] if isinstance(k, int) else k): _unpack_v1(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_unpack_v1(v) for v in obj]
+    return obj
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_VALUE:
+        return _VALUES_V1[data[0]]
+    return msgpack.ExtType(code, data)
+
+
+class FactCodec:
+    """
+    可插拔的事实记录编解码器。
+
+    - 写入：按 fmt（json / msgpack）编码，超过 compress_min_bytes 的记录按 compress 压缩
+    - 读取：按头部自动识别格式，旧 JSON 数据与各版本新格式可以混读
+    - session_id 由调用方提供时，记录里相同的 session_id 会被省略，读取时再补回
+    """
+
+    def __init__(self, fmt: str = "json", *, compress: str = "none", compress_min_bytes: int = 2048) -> None:
+        if fmt not in ("json", "msgpack"):
+            raise CodecError(f"unknown codec format: {fmt}")
+        if fmt == "msgpack" and msgpack is None:
+            raise CodecError("FACT_CODEC=msgpack 需要安装 msgpack：pip install msgpack")
+        if compress not in ("none", "zlib", "zstd"):
+            raise CodecError(f"unknown codec compression: {compress}")
+        if compress == "zstd" and zstandard is None:
+            raise CodecError("FACT_CODEC_COMPRESS=zstd 需要安装 zstandard：pip install zstandard")
+        self.fmt = fmt
+        self.compress = compress
+        self._compress_min_bytes = compress_min_bytes
+        self._zstd_c = zstandard.ZstdCompressor(level=3) if compress == "zstd" else None
+
+    @property
+    def legacy(self) -> bool:
+        return self.fmt == "json" and self.compress == "none"
+
+    def encode(self, obj: dict[str, Any], *, session_id: str | None = None) -> str | bytes:
+        if self.legacy:
+            return json.dumps(obj, ensure_ascii=False)
+
+        flags = 0
+        if self.fmt == "msgpack":
+            record = obj
+            ts = obj.get("timestamp")
+            if (session_id is not None and obj.get("session_id") == session_id) or (
+                ts is not None and (obj.get("start_time") == ts or obj.get("end_time") == ts)
+            ):
+                record = dict(obj)
+                if session_id is not None and record.get("session_id") == session_id:
+                    del record["session_id"]
+                    flags |= _FLAG_NO_SESSION
+                if ts is not None and record.get("start_time") == ts:
+                    del record["start_time"]
+                    flags |= _FLAG_START_EQ_TS
+                if ts is not None and record.get("end_time") == ts:
+                    del record["end_time"]
+                    flags |= _FLAG_END_EQ_TS
+            fmt = _FMT_MSGPACK_V1
+            body = msgpack.packb(_pack_v1(record), use_bin_type=True)
+        else:
+            fmt = _FMT_JSON
+            body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        if self.compress != "none" and len(body) >= self._compress_min_bytes:
+            if self.compress == "zstd":
+                body = self._zstd_c.compress(body)
+                flags |= _COMP_ZSTD
+            else:
+                body = zlib.compress(body, 6)
+                flags |= _COMP_ZLIB
+        return bytes((_MAGIC, fmt, flags)) + body
+
+    def decode(self, raw: str | bytes | bytearray, *, session_id: str | None = None) -> dict[str, Any]:
+        if isinstance(raw, str):
+            return json.loads(raw)
+        if not raw or raw[0] != _MAGIC:
+            return json.loads(bytes(raw).decode("utf-8", errors="replace"))
+        if len(raw) < 3:
+            raise CodecError("truncated fact payload")
+
+        fmt, flags = raw[1], raw[2]
+        body = bytes(raw[3:])
+        comp = flags & _COMP_MASK
+        if comp == _COMP_ZLIB:
+            body = zlib.decompress(body)
+        elif comp == _COMP_ZSTD:
+            if zstandard is None:
+                raise CodecError("payload is zstd-compressed but zstandard is not installed")
+            body = zstandard.ZstdDecompressor().decompress(body)
+
+        if fmt == _FMT_JSON:
+            return json.loads(body.decode("utf-8"))
+        if fmt != _FMT_MSGPACK_V1:
+            raise CodecError(f"unknown fact payload format: {fmt}")
+        if msgpack is None:
+            raise CodecError("payload is msgpack but msgpack is not installed")
+        obj = _unpack_v1(msgpack.unpackb(body, raw=False, strict_map_key=False, ext_hook=_ext_hook))
+        if flags & _FLAG_NO_SESSION and session_id is not None:
+            obj["session_id"] = session_id
+        if flags & _FLAG_START_EQ_TS:
+            obj["start_time"] = obj.get("timestamp")
+        if flags & _FLAG_END_EQ_TS:
+            obj["end_time"] = obj.get("timestamp")
+        return obj
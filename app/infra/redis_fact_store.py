@@ -6,6 +6,9 @@ from typing import Any
 
 from redis.asyncio import Redis
 
+from app.infra.codec import FactCodec
+from app.infra.timeline import StreamTimeline, ZsetTimeline
+
 
 class FactStoreError(RuntimeError):
     pass
@@ -16,6 +19,7 @@ class SessionProgress:
     status: str
     last_stage_summary_ts: float
     last_utterance_ts: float
+    stage_cursor: str | None = None
 
 
 class RedisFactStore:
@@ -26,10 +30,33 @@ class RedisFactStore:
     - 只存“事实”与“中间智能结果”
     - 不做任何智能决策
     - 所有数据可追溯、可按时间有序读取
+
+    发言与阶段总结的时间线后端可选（timeline）：
+    - ZsetTimeline（默认）：class:{id}:utterances / class:{id}:stage_summaries
+    - StreamTimeline：同名 key 加 :stream 后缀，按 MAXLEN 近似裁剪（utterances_trimmed 判断是否裁掉了开头）；
+      提供 tail_utterances 阻塞追尾，目前应用内没有调用方，供外部消费者使用
+
+    发言、阶段总结、课后报告的序列化由 codec（FactCodec）负责，读取时新旧格式可以混读。
     """
 
-    def __init__(self, redis: Redis) -> None:
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        timeline: ZsetTimeline | StreamTimeline | None = None,
+        codec: FactCodec | None = None,
+    ) -> None:
         self._r = redis
+        self._timeline = timeline or ZsetTimeline()
+        self._codec = codec or FactCodec()
+
+    @property
+    def timeline_backend(self) -> str:
+        return self._timeline.name
+
+    @staticmethod
+    def _k_running() -> str:
+        return "class:index:running"
 
     @staticmethod
     def _k_meta(session_id: str) -> str:
@@ -39,18 +66,20 @@ class RedisFactStore:
     def _k_progress(session_id: str) -> str:
         return f"class:{session_id}:progress"
 
-    @staticmethod
-    def _k_utterances(session_id: str) -> str:
-        return f"class:{session_id}:utterances"
+    def _k_utterances(self, session_id: str) -> str:
+        return self._timeline.key(f"class:{session_id}:utterances")
 
-    @staticmethod
-    def _k_stage_summaries(session_id: str) -> str:
-        return f"class:{session_id}:stage_summaries"
+    def _k_stage_summaries(self, session_id: str) -> str:
+        return self._timeline.key(f"class:{session_id}:stage_summaries")
 
     @staticmethod
     def _k_final_report(session_id: str) -> str:
         return f"class:{session_id}:final_report"
 
+    @staticmethod
+    def _k_report_draft(session_id: str) -> str:
+        return f"class:{session_id}:report_draft"
+
     async def init_classroom(self, session_id: str, meta: dict[str, Any]) -> None:
         k_meta = self._k_meta(session_id)
         k_progress = self._k_progress(session_id)
@@ -69,10 +98,86 @@ class RedisFactStore:
                 "last_utterance_ts": "0",
             },
         )
+        pipe.sadd(self._k_running(), session_id)
         await pipe.execute()
 
     async def set_status(self, session_id: str, status: str) -> None:
-        await self._r.hset(self._k_progress(session_id), mapping={"status": status})
+        pipe = self._r.pipeline()
+        pipe.hset(self._k_progress(session_id), mapping={"status": status})
+        if status == "RUNNING":
+            pipe.sadd(self._k_running(), session_id)
+        else:
+            pipe.srem(self._k_running(), session_id)
+        await pipe.execute()
+
+    async def list_running_sessions(self) -> list[str]:
+        """
+        读取 RUNNING 课堂索引（SMEMBERS + 一次 pipeline 校验状态）。
+
+        开销只与在线课堂数相关，与历史课堂数量无关；
+        索引里残留的非 RUNNING 条目会顺手清理掉。
+        """
+        members = await self._r.smembers(self._k_running())
+        session_ids = sorted(
+            m.decode("utf-8", errors="replace") if isinstance(m, (bytes, bytearray)) else str(m) for m in members
+        )
+        if not session_ids:
+            return []
+
+        pipe = self._r.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hget(self._k_progress(session_id), "status")
+        statuses = await pipe.execute()
+
+        out: list[str] = []
+        stale: list[str] = []
+        for session_id, status in zip(session_ids, statuses):
+            if isinstance(status, (bytes, bytearray)):
+                status = status.decode("utf-8", errors="replace")
+            if status == "RUNNING":
+                out.append(session_id)
+            else:
+                stale.append(session_id)
+        if stale:
+            await self._r.srem(self._k_running(), *stale)
+        return out
+
+    async def rebuild_running_index(self, *, scan_count: int = 1000) -> int:
+        """
+        用 SCAN（非阻塞）从 progress 哈希重建 RUNNING 索引，用于兼容索引上线前的存量课堂。
+        只应在进程启动时调用一次，返回加入索引的课堂数。
+        """
+        added = 0
+        batch: list[str] = []
+
+        async def _flush() -> None:
+            nonlocal added
+            pipe = self._r.pipeline(transaction=False)
+            for session_id in batch:
+                pipe.hget(self._k_progress(session_id), "status")
+            statuses = await pipe.execute()
+            running = [
+                sid
+                for sid, st in zip(batch, statuses)
+                if (st.decode("utf-8", errors="replace") if isinstance(st, (bytes, bytearray)) else st) == "RUNNING"
+            ]
+            if running:
+                await self._r.sadd(self._k_running(), *running)
+                added += len(running)
+            batch.clear()
+
+        async for k in self._r.scan_iter(match="class:*:progress", count=scan_count):
+            if isinstance(k, (bytes, bytearray)):
+                k = k.decode("utf-8", errors="replace")
+            parts = str(k).split(":")
+            if len(parts) != 3:
+                continue
+            batch.append(parts[1])
+            if len(batch) >= scan_count:
+                await _flush()
+        if batch:
+            await _flush()
+        return added
 
     async def get_progress(self, session_id: str) -> SessionProgress:
         m = await self._r.hgetall(self._k_progress(session_id))
@@ -90,19 +195,42 @@ class RedisFactStore:
         status = _get_str("status", "UNKNOWN")
         last_stage_summary_ts = float(_get_str("last_stage_summary_ts", "0"))
         last_utterance_ts = float(_get_str("last_utterance_ts", "0"))
+        stage_cursor = _get_str("stage_cursor", "") or None
         return SessionProgress(
             status=status,
             last_stage_summary_ts=last_stage_summary_ts,
             last_utterance_ts=last_utterance_ts,
+            stage_cursor=stage_cursor,
         )
 
     async def append_utterance(self, session_id: str, timestamp: float, utterance: dict[str, Any]) -> None:
-        payload = json.dumps(utterance, ensure_ascii=False)
-        k = self._k_utterances(session_id)
+        await self.append_utterances(session_id, [(timestamp, utterance)])
+
+    async def append_utterances(self, session_id: str, items: list[tuple[float, dict[str, Any]]]) -> None:
+        """
+        批量写入同一课堂的多条发言（一次 pipeline）。items 为 (timestamp, utterance)。
+        """
+        await self.append_utterance_batches({session_id: items})
+
+    async def append_utterance_batches(self, batches: dict[str, list[tuple[float, dict[str, Any]]]]) -> None:
+        """
+        批量写入多个课堂的发言，所有课堂共用一次 pipeline（write-behind 刷盘使用）。
+        """
         pipe = self._r.pipeline()
-        pipe.zadd(k, {payload: timestamp})
-        pipe.hset(self._k_progress(session_id), mapping={"last_utterance_ts": str(timestamp)})
-        await pipe.execute()
+        queued = False
+        for session_id, items in batches.items():
+            if not items:
+                continue
+            self._timeline.queue_append(
+                pipe,
+                self._k_utterances(session_id),
+                [(timestamp, self._codec.encode(utterance, session_id=session_id)) for timestamp, utterance in items],
+            )
+            last_ts = max(timestamp for timestamp, _ in items)
+            pipe.hset(self._k_progress(session_id), mapping={"last_utterance_ts": str(last_ts)})
+            queued = True
+        if queued:
+            await pipe.execute()
 
     async def list_utterances(
         self,
@@ -112,55 +240,161 @@ class RedisFactStore:
         end_ts_inclusive: float = 1e18,
         limit: int = 2000,
     ) -> list[dict[str, Any]]:
-        k = self._k_utterances(session_id)
-        items = await self._r.zrangebyscore(
-            k,
-            min=f"({start_ts_exclusive}",
-            max=end_ts_inclusive,
-            start=0,
-            num=limit,
+        items = await self._timeline.range_by_ts(
+            self._r,
+            self._k_utterances(session_id),
+            start_ts_exclusive=start_ts_exclusive,
+            end_ts_inclusive=end_ts_inclusive,
+            limit=limit,
         )
+        return self._decode_items(items, session_id)
+
+    async def read_utterances(
+        self,
+        session_id: str,
+        *,
+        cursor: str | None = None,
+        start_ts_exclusive: float = 0.0,
+        limit: int = 500,
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        """
+        基于游标的增量读取，返回 (items, next_cursor)。
+
+        - cursor 为空时从 start_ts_exclusive 之后开始读
+        - 传入上次返回的 next_cursor 会从上次停下的位置精确续读（时间戳相同也不会重复或漏读）
+        - 没有新数据时 next_cursor 原样返回
+        """
+        items, next_cursor = await self._timeline.read_after(
+            self._r,
+            self._k_utterances(session_id),
+            cursor=cursor,
+            start_ts_exclusive=start_ts_exclusive,
+            limit=limit,
+        )
+        return self._decode_items(items, session_id), next_cursor
+
+    async def list_last_utterances(
+        self,
+        session_id: str,
+        n: int,
+        *,
+        start_ts_exclusive: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        读取最近 n 条发言（ZREVRANGEBYSCORE ... LIMIT / XREVRANGE COUNT），按时间正序返回。
+        """
+        items = await self._timeline.last_n(
+            self._r, self._k_utterances(session_id), n, start_ts_exclusive=start_ts_exclusive
+        )
+        return self._decode_items(items, session_id)
+
+    async def tail_utterances(
+        self,
+        session_id: str,
+        *,
+        after_id: str = "$",
+        count: int = 100,
+        block_ms: int | None = 5000,
+    ) -> tuple[list[dict[str, Any]], str]:
+        """
+        阻塞追尾读取新发言（仅 Stream 后端），返回 (items, next_id)；下次调用传入 next_id 继续读取。
+        """
+        if not isinstance(self._timeline, StreamTimeline):
+            raise FactStoreError(f"tail_utterances requires stream timeline, current={self._timeline.name}")
+        items, next_id = await self._timeline.tail(
+            self._r, self._k_utterances(session_id), after_id=after_id, count=count, block_ms=block_ms
+        )
+        return self._decode_items(items, session_id), next_id
+
+    async def utterances_trimmed(self, session_id: str) -> bool:
+        """
+        发言时间线是否因 MAXLEN 裁剪丢失了开课之后最早的发言（仅 Stream 后端会裁剪）。
+        """
+        if not isinstance(self._timeline, StreamTimeline):
+            return False
+        start_ts = 0.0
+        raw = await self._r.hget(self._k_meta(session_id), "meta")
+        if raw:
+            try:
+                start_ts = float(json.loads(raw).get("start_time") or 0.0)
+            except (ValueError, TypeError, AttributeError):
+                start_ts = 0.0
+        return await self._timeline.trimmed(self._r, self._k_utterances(session_id), since_ts=start_ts)
+
+    def _decode_items(self, items: list[Any], session_id: str) -> list[dict[str, Any]]:
         out: list[dict[str, Any]] = []
         for raw in items:
-            if isinstance(raw, (bytes, bytearray)):
-                raw = raw.decode("utf-8", errors="replace")
             try:
-                out.append(json.loads(raw))
+                out.append(self._codec.decode(raw, session_id=session_id))
             except Exception:
                 continue
         return out
 
-    async def append_stage_summary(self, session_id: str, timestamp: float, summary: dict[str, Any]) -> None:
-        payload = json.dumps(summary, ensure_ascii=False)
-        k = self._k_stage_summaries(session_id)
+    async def append_stage_summary(
+        self,
+        session_id: str,
+        timestamp: float,
+        summary: dict[str, Any],
+        *,
+        cursor: str | None = None,
+    ) -> None:
+        """
+        cursor 为本次总结窗口最后一条发言的游标（read_utterances 返回），下一个窗口从这里续读。
+        """
+        payload = self._codec.encode(summary, session_id=session_id)
+        progress: dict[str, str] = {"last_stage_summary_ts": str(timestamp)}
+        if cursor is not None:
+            progress["stage_cursor"] = cursor
         pipe = self._r.pipeline()
-        pipe.zadd(k, {payload: timestamp})
-        pipe.hset(self._k_progress(session_id), mapping={"last_stage_summary_ts": str(timestamp)})
+        self._timeline.queue_append(pipe, self._k_stage_summaries(session_id), [(timestamp, payload)])
+        pipe.hset(self._k_progress(session_id), mapping=progress)
         await pipe.execute()
 
     async def list_stage_summaries(self, session_id: str, limit: int = 2000) -> list[dict[str, Any]]:
-        k = self._k_stage_summaries(session_id)
-        items = await self._r.zrange(k, 0, limit - 1)
-        out: list[dict[str, Any]] = []
-        for raw in items:
-            if isinstance(raw, (bytes, bytearray)):
-                raw = raw.decode("utf-8", errors="replace")
-            try:
-                out.append(json.loads(raw))
-            except Exception:
-                continue
-        return out
+        items = await self._timeline.head(self._r, self._k_stage_summaries(session_id), limit)
+        return self._decode_items(items, session_id)
+
+    async def read_stage_summaries(
+        self,
+        session_id: str,
+        *,
+        cursor: str | None = None,
+        limit: int = 500,
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        """按时间顺序分页读取阶段总结，游标语义同 read_utterances。"""
+        items, next_cursor = await self._timeline.read_after(
+            self._r,
+            self._k_stage_summaries(session_id),
+            cursor=cursor,
+            start_ts_exclusive=0.0,
+            limit=limit,
+        )
+        return self._decode_items(items, session_id), next_cursor
+
+    async def list_last_stage_summaries(self, session_id: str, n: int = 1) -> list[dict[str, Any]]:
+        items = await self._timeline.last_n(self._r, self._k_stage_summaries(session_id), n)
+        return self._decode_items(items, session_id)
 
     async def set_final_report(self, session_id: str, report: dict[str, Any]) -> None:
-        await self._r.set(self._k_final_report(session_id), json.dumps(report, ensure_ascii=False))
+        await self._r.set(self._k_final_report(session_id), self._codec.encode(report, session_id=session_id))
 
     async def get_final_report(self, session_id: str) -> dict[str, Any] | None:
         raw = await self._r.get(self._k_final_report(session_id))
         if raw is None:
             return None
-        if isinstance(raw, (bytes, bytearray)):
-            raw = raw.decode("utf-8", errors="replace")
         try:
-            return json.loads(raw)
+            return self._codec.decode(raw, session_id=session_id)
+        except Exception:
+            return None
+
+    async def set_report_draft(self, session_id: str, draft: dict[str, Any]) -> None:
+        await self._r.set(self._k_report_draft(session_id), self._codec.encode(draft, session_id=session_id))
+
+    async def get_report_draft(self, session_id: str) -> dict[str, Any] | None:
+        raw = await self._r.get(self._k_report_draft(session_id))
+        if raw is None:
+            return None
+        try:
+            return self._codec.decode(raw, session_id=session_id)
         except Exception:
             return None
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from time import time
+from typing import Any
+
+from redis.asyncio import Redis
+
+
+# 任务状态：queued -> running -> done；失败后 retrying（等待退避）-> running ...；超过最大尝试次数 dead
+
+# KEYS: ready, job, dead；ARGV: id, now, payload
+_ENQUEUE_LUA = """
+local st = redis.call('HGET', KEYS[2], 'status')
+if st == 'queued' or st == 'running' or st == 'retrying' then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+redis.call('HSET', KEYS[2], 'status', 'queued', 'attempts', 0, 'enqueued_at', ARGV[2], 'payload', ARGV[3])
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+return 1
+"""
+
+# KEYS: ready, inflight；ARGV: now, visibility_s, worker, token, job_key_prefix
+_CLAIM_LUA = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 1)
+if #ids == 0 then
+    return false
+end
+local id = ids[1]
+local h = ARGV[5] .. id
+redis.call('ZREM', KEYS[1], id)
+redis.call('ZADD', KEYS[2], tonumber(ARGV[1]) + tonumber(ARGV[2]), id)
+local attempts = redis.call('HINCRBY', h, 'attempts', 1)
+redis.call('HSET', h, 'status', 'running', 'worker', ARGV[3], 'token', ARGV[4], 'started_at', ARGV[1])
+redis.call('HDEL', h, 'progress')
+return {id, attempts, redis.call('HGET', h, 'payload') or ''}
+"""
+
+# KEYS: inflight, ready, dead；ARGV: now, job_key_prefix, max_attempts, result_ttl_s
+_REAP_LUA = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+local out = {#ids}
+for _, id in ipairs(ids) do
+    local h = ARGV[2] .. id
+    redis.call('ZREM', KEYS[1], id)
+    local attempts = tonumber(redis.call('HGET', h, 'attempts') or '0')
+    redis.call('HSET', h, 'error', 'visibility timeout', 'token', '')
+    if attempts >= tonumber(ARGV[3]) then
+        redis.call('HSET', h, 'status', 'dead', 'finished_at', ARGV[1])
+        redis.call('ZADD', KEYS[3], ARGV[1], id)
+        redis.call('EXPIRE', h, ARGV[4])
+        table.insert(out, id)
+        table.insert(out, attempts)
+        table.insert(out, redis.call('HGET', h, 'payload') or '')
+    else
+        redis.call('HSET', h, 'status', 'retrying')
+        redis.call('ZADD', KEYS[2], ARGV[1], id)
+    end
+end
+return out
+"""
+
+_OWNED = (
+    "if redis.call('HGET', KEYS[2], 'token') ~= ARGV[2] or redis.call('ZSCORE', KEYS[1], ARGV[1]) == false then\n"
+    "    return 0\n"
+    "end\n"
+)
+
+# KEYS: inflight, job；ARGV: id, token, deadline, progress
+_EXTEND_LUA = (
+    _OWNED
+    + """
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+if ARGV[4] ~= '' then
+    redis.call('HSET', KEYS[2], 'progress', ARGV[4])
+end
+return 1
+"""
+)
+
+# KEYS: inflight, job；ARGV: id, token, now, result_ttl_s
+_ACK_LUA = (
+    _OWNED
+    + """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[2], 'status', 'done', 'finished_at', ARGV[3], 'token', '')
+redis.call('HDEL', KEYS[2], 'error')
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+)
+
+# KEYS: inflight, job, ready, dead；ARGV: id, token, now, retry_at, error, max_attempts, result_ttl_s
+_FAIL_LUA = (
+    _OWNED
+    + """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[2], 'error', ARGV[5], 'token', '')
+if tonumber(redis.call('HGET', KEYS[2], 'attempts') or '0') >= tonumber(ARGV[6]) then
+    redis.call('HSET', KEYS[2], 'status', 'dead', 'finished_at', ARGV[3])
+    redis.call('ZADD', KEYS[4], ARGV[3], ARGV[1])
+    redis.call('EXPIRE', KEYS[2], ARGV[7])
+    return 2
+end
+redis.call('HSET', KEYS[2], 'status', 'retrying')
+redis.call('ZADD', KEYS[3], ARGV[4], ARGV[1])
+return 1
+"""
+)
+
+# KEYS: inflight, job, ready；ARGV: id, token, now
+_RELEASE_LUA = (
+    _OWNED
+    + """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HINCRBY', KEYS[2], 'attempts', -1)
+redis.call('HSET', KEYS[2], 'status', 'queued', 'token', '')
+redis.call('ZADD', KEYS[3], ARGV[3], ARGV[1])
+return 1
+"""
+)
+
+
+def _decode(v: object) -> str:
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", errors="replace")
+    return str(v)
+
+
+@dataclass(frozen=True)
+class Job:
+    job_id: str
+    token: str
+    attempts: int
+    payload: dict[str, Any]
+
+
+class RedisJobQueue:
+    """
+    Redis 可靠任务队列（多 worker / 多节点共享）：
+
+    - jobs:{name}:ready（ZSET，score = 可执行时间）/ inflight（ZSET，score = 可见性超时）/ dead（ZSET，死信）
+    - jobs:{name}:job:{id}（HASH）记录状态、尝试次数、进度、最近错误；结束（done / dead）后保留 result_ttl_s
+    - job_id 去重：同一 job 在 queued / running / retrying 时重复入队会被忽略
+    - claim 原子地把到期任务移入 inflight 并发放 token；执行期间 extend 续期，超时未续期的任务由 reap_expired 放回重试
+    - ack / fail / extend 校验 token：超时后被其他 worker 重新领取的任务，原 worker 的结果会被拒绝
+    - 失败按指数退避重试，超过 max_attempts 进入死信；release 把任务原样放回（不计尝试次数），用于进程退出
+
+    Lua 脚本按 job_id 拼接 HASH key，只适用于单实例 / 主从 Redis（不支持 Cluster）。
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        name: str,
+        visibility_s: float = 120.0,
+        max_attempts: int = 3,
+        retry_base_s: float = 5.0,
+        retry_max_s: float = 300.0,
+        result_ttl_s: int = 7 * 86400,
+        worker_id: str | None = None,
+    ) -> None:
+        self._r = redis
+        self.name = name
+        self.visibility_s = visibility_s
+        self._max_attempts = max(1, max_attempts)
+        self._retry_base_s = retry_base_s
+        self._retry_max_s = retry_max_s
+        self._result_ttl_s = result_ttl_s
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def _k(self, part: str) -> str:
+        return f"jobs:{self.name}:{part}"
+
+    def _k_job(self, job_id: str) -> str:
+        return self._k(f"job:{job_id}")
+
+    async def enqueue(self, job_id: str, payload: dict[str, Any] | None = None) -> bool:
+        """
+        返回 False 表示该任务已在排队或执行中。已完成 / 死信的任务会被重新入队。
+        """
+        ok = await self._r.eval(
+            _ENQUEUE_LUA,
+            3,
+            self._k("ready"),
+            self._k_job(job_id),
+            self._k("dead"),
+            job_id,
+            time(),
+            json.dumps(payload or {}, ensure_ascii=False),
+        )
+        return bool(ok)
+
+    async def claim(self) -> Job | None:
+        token = uuid.uuid4().hex
+        res = await self._r.eval(
+            _CLAIM_LUA,
+            2,
+            self._k("ready"),
+            self._k("inflight"),
+            time(),
+            self.visibility_s,
+            self.worker_id,
+            token,
+            self._k("job:"),
+        )
+        if not res:
+            return None
+        job_id, attempts, payload = res
+        raw = _decode(payload)
+        return Job(job_id=_decode(job_id), token=token, attempts=int(attempts), payload=json.loads(raw) if raw else {})
+
+    async def reap_expired(self) -> tuple[int, list[Job]]:
+        """
+        返回 (回收的任务数, 其中因超过最大尝试次数进入死信的任务)；死信任务的 token 为空，只用于通知。
+        """
+        res = await self._r.eval(
+            _REAP_LUA,
+            3,
+            self._k("inflight"),
+            self._k("ready"),
+            self._k("dead"),
+            time(),
+            self._k("job:"),
+            self._max_attempts,
+            self._result_ttl_s,
+        )
+        if not res:
+            return 0, []
+        dead = [
+            Job(job_id=_decode(job_id), token="", attempts=int(attempts), payload=json.loads(_decode(payload) or "{}"))
+            for job_id, attempts, payload in zip(res[1::3], res[2::3], res[3::3])
+        ]
+        return int(res[0]), dead
+
+    async def extend(self, job: Job, *, progress: dict[str, Any] | None = None) -> bool:
+        ok = await self._r.eval(
+            _EXTEND_LUA,
+            2,
+            self._k("inflight"),
+            self._k_job(job.job_id),
+            job.job_id,
+            job.token,
+            time() + self.visibility_s,
+            json.dumps(progress, ensure_ascii=False) if progress is not None else "",
+        )
+        return bool(ok)
+
+    async def ack(self, job: Job) -> bool:
+        ok = await self._r.eval(
+            _ACK_LUA,
+            2,
+            self._k("inflight"),
+            self._k_job(job.job_id),
+            job.job_id,
+            job.token,
+            time(),
+            self._result_ttl_s,
+        )
+        return bool(ok)
+
+    async def fail(self, job: Job, error: str) -> str:
+        """
+        返回 "retrying" / "dead"；任务已不归本 worker 所有时返回 "lost"。
+        """
+        now = time()
+        delay = min(self._retry_max_s, self._retry_base_s * (2 ** (job.attempts - 1)))
+        res = await self._r.eval(
+            _FAIL_LUA,
+            4,
+            self._k("inflight"),
+            self._k_job(job.job_id),
+            self._k("ready"),
+            self._k("dead"),
+            job.job_id,
+            job.token,
+            now,
+            now + delay,
+            error[:2000],
+            self._max_attempts,
+            self._result_ttl_s,
+        )
+        return {1: "retrying", 2: "dead"}.get(int(res or 0), "lost")
+
+    async def release(self, job: Job) -> bool:
+        ok = await self._r.eval(
+            _RELEASE_LUA,
+            3,
+            self._k("inflight"),
+            self._k_job(job.job_id),
+            self._k("ready"),
+            job.job_id,
+            job.token,
+            time(),
+        )
+        return bool(ok)
+
+    async def status(self, job_id: str) -> dict[str, Any] | None:
+        raw = await self._r.hgetall(self._k_job(job_id))
+        if not raw:
+            return None
+        h = {_decode(k): _decode(v) for k, v in raw.items()}
+        out: dict[str, Any] = {
+            "job_id": job_id,
+            "status": h.get("status"),
+            "attempts": int(h.get("attempts") or 0),
+            "max_attempts": self._max_attempts,
+            "worker": h.get("worker"),
+            "error": h.get("error"),
+            "progress": json.loads(h["progress"]) if h.get("progress") else None,
+        }
+        for k in ("enqueued_at", "started_at", "finished_at"):
+            out[k] = float(h[k]) if h.get(k) else None
+        return out
+
+    async def depth(self) -> dict[str, int]:
+        pipe = self._r.pipeline(transaction=False)
+        pipe.zcard(self._k("ready"))
+        pipe.zcard(self._k("inflight"))
+        pipe.zcard(self._k("dead"))
+        ready, inflight, dead = await pipe.execute()
+        return {"ready": int(ready), "inflight": int(inflight), "dead": int(dead)}
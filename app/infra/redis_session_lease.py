@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import socket
+import uuid
+from time import time
+
+from redis.asyncio import Redis
+
+
+_RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _decode(v: object) -> str:
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", errors="replace")
+    return str(v)
+
+
+class RedisSessionLeaseManager:
+    """
+    课堂调度所有权（Redis 租约），用于多 worker / 多节点水平切分阶段总结。
+
+    - 每个 worker 在 workers ZSET 里心跳（score = 过期时间），过期即视为下线
+    - 课堂的“期望 owner”由 rendezvous hash 在存活 worker 中选出，分布均匀且成员变化时迁移最少
+    - 期望 owner 通过 SET NX PX 获取 class:{id}:lease，之后每轮续期；不再是期望 owner 时主动释放
+    - worker 挂掉后心跳与租约都会过期，课堂自动被新的期望 owner 接管
+    """
+
+    def __init__(self, redis: Redis, *, ttl_s: float = 15.0, worker_id: str | None = None, namespace: str = "stage") -> None:
+        self._r = redis
+        self._ttl_ms = int(ttl_s * 1000)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._namespace = namespace
+        self._owned: set[str] = set()
+        self._alive: list[str] = [self.worker_id]
+
+    def _k_workers(self) -> str:
+        return f"scheduler:{self._namespace}:workers"
+
+    def _k_lease(self, session_id: str) -> str:
+        return f"class:{session_id}:lease:{self._namespace}"
+
+    @property
+    def owned(self) -> frozenset[str]:
+        return frozenset(self._owned)
+
+    @property
+    def alive_workers(self) -> list[str]:
+        return list(self._alive)
+
+    def owns(self, session_id: str) -> bool:
+        return session_id in self._owned
+
+    def preferred_owner(self, session_id: str) -> str:
+        def _score(worker_id: str) -> int:
+            h = hashlib.blake2b(f"{worker_id}|{session_id}".encode("utf-8"), digest_size=8).digest()
+            return int.from_bytes(h, "big")
+
+        return max(self._alive, key=_score)
+
+    async def heartbeat(self) -> list[str]:
+        now = time()
+        pipe = self._r.pipeline(transaction=False)
+        pipe.zadd(self._k_workers(), {self.worker_id: now + self._ttl_ms / 1000})
+        pipe.zremrangebyscore(self._k_workers(), "-inf", now)
+        pipe.zrange(self._k_workers(), 0, -1)
+        _, _, members = await pipe.execute()
+        alive = sorted({_decode(m) for m in members} | {self.worker_id})
+        self._alive = alive
+        return alive
+
+    async def rebalance(
+        self,
+        running_session_ids: list[str],
+        *,
+        busy: set[str] | frozenset[str] = frozenset(),
+    ) -> tuple[set[str], set[str]]:
+        """
+        按当前存活 worker 重新计算本 worker 应持有的课堂，并续期/获取/释放租约。
+        busy 中的课堂（正在处理）即使不再属于本 worker 也先续期，处理完的下一轮再释放，避免交接时重复总结。
+        返回 (新获得的课堂, 失去的课堂)。
+        """
+        await self.heartbeat()
+        running = set(running_session_ids)
+        want = {sid for sid in running if self.preferred_owner(sid) == self.worker_id}
+        want |= self._owned & running & set(busy)
+        keep = self._owned & want
+        drop = self._owned - want
+        acquire = want - self._owned
+
+        pipe = self._r.pipeline(transaction=False)
+        keep_list = sorted(keep)
+        drop_list = sorted(drop)
+        acquire_list = sorted(acquire)
+        for sid in keep_list:
+            pipe.eval(_RENEW_LUA, 1, self._k_lease(sid), self.worker_id, self._ttl_ms)
+        for sid in drop_list:
+            pipe.eval(_RELEASE_LUA, 1, self._k_lease(sid), self.worker_id)
+        for sid in acquire_list:
+            pipe.set(self._k_lease(sid), self.worker_id, nx=True, px=self._ttl_ms)
+        results = await pipe.execute() if (keep_list or drop_list or acquire_list) else []
+
+        renewed = results[: len(keep_list)]
+        acquired = results[len(keep_list) + len(drop_list) :]
+        lost = {sid for sid, ok in zip(keep_list, renewed) if not ok} | drop
+        gained = {sid for sid, ok in zip(acquire_list, acquired) if ok}
+        self._owned = (self._owned - lost) | gained
+        return gained, lost
+
+    async def release_all(self) -> None:
+        if self._owned:
+            pipe = self._r.pipeline(transaction=False)
+            for sid in sorted(self._owned):
+                pipe.eval(_RELEASE_LUA, 1, self._k_lease(sid), self.worker_id)
+            await pipe.execute()
+        self._owned.clear()
+        await self._r.zrem(self._k_workers(), self.worker_id)
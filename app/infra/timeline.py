@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import base64
+from typing import Any
+
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ResponseError
+
+
+def _decode(v: Any) -> str:
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", errors="replace")
+    return str(v)
+
+
+class ZsetTimeline:
+    """
+    ZSET 时间线：member 为序列化后的记录，score 为时间戳。
+    注意：内容完全相同的两条记录会合并为一条（后写入的覆盖 score）。
+    """
+
+    name = "zset"
+
+    def key(self, base_key: str) -> str:
+        return base_key
+
+    def queue_append(self, pipe: Pipeline, key: str, items: list[tuple[float, str | bytes]]) -> None:
+        pipe.zadd(key, {payload: timestamp for timestamp, payload in items})
+
+    async def range_by_ts(
+        self,
+        r: Redis,
+        key: str,
+        *,
+        start_ts_exclusive: float,
+        end_ts_inclusive: float,
+        limit: int,
+    ) -> list[bytes]:
+        return await r.zrangebyscore(key, min=f"({start_ts_exclusive}", max=end_ts_inclusive, start=0, num=limit)
+
+    async def head(self, r: Redis, key: str, limit: int) -> list[bytes]:
+        return await r.zrange(key, 0, limit - 1)
+
+    async def trimmed(self, r: Redis, key: str, *, since_ts: float) -> bool:
+        return False
+
+    async def last_n(self, r: Redis, key: str, n: int, *, start_ts_exclusive: float | None = None) -> list[bytes]:
+        if start_ts_exclusive is None:
+            items = await r.zrevrange(key, 0, n - 1)
+        else:
+            items = await r.zrevrangebyscore(key, max="+inf", min=f"({start_ts_exclusive}", start=0, num=n)
+        items.reverse()
+        return items
+
+    async def read_after(
+        self,
+        r: Redis,
+        key: str,
+        *,
+        cursor: str | None,
+        start_ts_exclusive: float,
+        limit: int,
+    ) -> tuple[list[bytes], str | None]:
+        """
+        游标为 (score, member)：ZSET 同分时按 member 字节序排序，所以同一时间戳的多条记录也能精确续读。
+        """
+        if cursor is None:
+            rows = await r.zrangebyscore(
+                key, min=f"({start_ts_exclusive}", max="+inf", start=0, num=limit, withscores=True
+            )
+        else:
+            score, member = self._parse_cursor(cursor)
+            rows = []
+            offset = 0
+            batch_size = limit + 64
+            while len(rows) < limit:
+                batch = await r.zrangebyscore(key, min=score, max="+inf", start=offset, num=batch_size, withscores=True)
+                for m, s in batch:
+                    if s == score and m <= member:
+                        continue
+                    rows.append((m, s))
+                    if len(rows) >= limit:
+                        break
+                if len(batch) < batch_size:
+                    break
+                offset += len(batch)
+        if not rows:
+            return [], cursor
+        last_member, last_score = rows[-1]
+        return [m for m, _ in rows], self._make_cursor(last_score, last_member)
+
+    @staticmethod
+    def _make_cursor(score: float, member: bytes | str) -> str:
+        if isinstance(member, str):
+            member = member.encode("utf-8")
+        return f"z:{score!r}:{base64.urlsafe_b64encode(member).decode('ascii')}"
+
+    @staticmethod
+    def _parse_cursor(cursor: str) -> tuple[float, bytes]:
+        kind, score, member = cursor.split(":", 2)
+        if kind != "z":
+            raise ValueError(f"not a zset timeline cursor: {cursor[:32]}")
+        return float(score), base64.urlsafe_b64decode(member.encode("ascii"))
+
+
+class StreamTimeline:
+    """
+    Redis Streams 时间线：XADD 自动生成单调递增 ID，字段 ts 为业务时间戳、d 为序列化记录。
+
+    - 相同内容的记录不会互相覆盖
+    - 支持 XREAD BLOCK 阻塞追尾读取（tail）
+    - 通过 MAXLEN ~ 近似裁剪控制单个课堂的内存上限（maxlen 为 None 时不裁剪），trimmed 判断是否已裁掉开头的记录
+    - 按时间戳查询时，以 ID（服务器写入时间）± skew_s 定位范围后再按 ts 精确过滤，
+      要求客户端时间戳与服务器时间偏差不超过 skew_s
+    """
+
+    name = "stream"
+
+    def __init__(self, *, maxlen: int | None, skew_s: float = 30.0, scan_batch: int = 512) -> None:
+        self._maxlen = maxlen
+        self._skew_s = skew_s
+        self._scan_batch = scan_batch
+
+    def key(self, base_key: str) -> str:
+        return f"{base_key}:stream"
+
+    def queue_append(self, pipe: Pipeline, key: str, items: list[tuple[float, str | bytes]]) -> None:
+        for timestamp, payload in items:
+            pipe.xadd(key, {"ts": repr(float(timestamp)), "d": payload}, maxlen=self._maxlen, approximate=True)
+
+    async def range_by_ts(
+        self,
+        r: Redis,
+        key: str,
+        *,
+        start_ts_exclusive: float,
+        end_ts_inclusive: float,
+        limit: int,
+    ) -> list[bytes]:
+        lo = "-" if start_ts_exclusive <= self._skew_s else f"{int((start_ts_exclusive - self._skew_s) * 1000)}-0"
+        hi = "+" if end_ts_inclusive >= 1e15 else f"{int((end_ts_inclusive + self._skew_s) * 1000)}"
+        matched: list[tuple[float, bytes]] = []
+        while len(matched) < limit:
+            entries = await r.xrange(key, min=lo, max=hi, count=self._scan_batch)
+            if not entries:
+                break
+            for _, fields in entries:
+                ts = float(fields.get(b"ts") or fields.get("ts") or 0.0)
+                if start_ts_exclusive < ts <= end_ts_inclusive:
+                    matched.append((ts, fields.get(b"d") or fields.get("d")))
+                    if len(matched) >= limit:
+                        break
+            if len(entries) < self._scan_batch:
+                break
+            lo = f"({_decode(entries[-1][0])}"
+        matched.sort(key=lambda x: x[0])
+        return [payload for _, payload in matched]
+
+    async def head(self, r: Redis, key: str, limit: int) -> list[bytes]:
+        entries = await r.xrange(key, min="-", max="+", count=limit)
+        return [fields.get(b"d") or fields.get("d") for _, fields in entries]
+
+    async def trimmed(self, r: Redis, key: str, *, since_ts: float) -> bool:
+        """
+        是否被 MAXLEN 裁剪过：Redis 7+ 比较 entries-added 与 length（本模块不做 XDEL，差值只来自裁剪）；
+        更早的版本没有 entries-added，只能在长度已达到 maxlen 时看首条 ID（服务器写入时间）是否晚于 since_ts。
+        """
+        if self._maxlen is None:
+            return False
+        try:
+            info = await r.xinfo_stream(key)
+        except ResponseError:
+            return False
+        length = int(info.get("length") or 0)
+        added = info.get("entries-added")
+        if added is not None:
+            return int(added) > length
+        first = info.get("first-entry")
+        if length < self._maxlen or not first:
+            return False
+        return int(_decode(first[0]).split("-", 1)[0]) > (since_ts + self._skew_s) * 1000
+
+    async def last_n(self, r: Redis, key: str, n: int, *, start_ts_exclusive: float | None = None) -> list[bytes]:
+        entries = await r.xrevrange(key, max="+", min="-", count=n)
+        out: list[bytes] = []
+        for _, fields in reversed(entries):
+            if start_ts_exclusive is not None and float(fields.get(b"ts") or fields.get("ts") or 0.0) <= start_ts_exclusive:
+                continue
+            out.append(fields.get(b"d") or fields.get("d"))
+        return out
+
+    async def read_after(
+        self,
+        r: Redis,
+        key: str,
+        *,
+        cursor: str | None,
+        start_ts_exclusive: float,
+        limit: int,
+    ) -> tuple[list[bytes], str | None]:
+        """
+        游标即 Stream 条目 ID（s:<id>），天然单调；没有游标时从 start_ts_exclusive（按 skew_s 放宽）开始。
+        """
+        if cursor is not None:
+            if not cursor.startswith("s:"):
+                raise ValueError(f"not a stream timeline cursor: {cursor[:32]}")
+            lo = f"({cursor[2:]}"
+        elif start_ts_exclusive <= self._skew_s:
+            lo = "-"
+        else:
+            lo = f"{int((start_ts_exclusive - self._skew_s) * 1000)}-0"
+
+        out: list[bytes] = []
+        last_id: str | None = None
+        while len(out) < limit:
+            entries = await r.xrange(key, min=lo, max="+", count=self._scan_batch)
+            if not entries:
+                break
+            for entry_id, fields in entries:
+                last_id = _decode(entry_id)
+                if cursor is None and float(fields.get(b"ts") or fields.get("ts") or 0.0) <= start_ts_exclusive:
+                    continue
+                out.append(fields.get(b"d") or fields.get("d"))
+                if len(out) >= limit:
+                    break
+            if len(entries) < self._scan_batch:
+                break
+            lo = f"({last_id}"
+        if last_id is None:
+            return [], cursor
+        return out, f"s:{last_id}"
+
+    async def tail(
+        self,
+        r: Redis,
+        key: str,
+        *,
+        after_id: str = "$",
+        count: int = 100,
+        block_ms: int | None = 5000,
+    ) -> tuple[list[bytes], str]:
+        """
+        阻塞读取 after_id 之后的新记录，返回 (payloads, 最后一条的 ID)。
+        after_id="$" 表示只读调用之后写入的记录；无新数据时原样返回 after_id。
+        """
+        resp = await r.xread({key: after_id}, count=count, block=block_ms)
+        if not resp:
+            return [], after_id
+        _, entries = resp[0]
+        if not entries:
+            return [], after_id
+        payloads = [fields.get(b"d") or fields.get("d") for _, fields in entries]
+        return payloads, _decode(entries[-1][0])
+
+
+def build_timeline(
+    backend: str,
+    *,
+    stream_maxlen: int | None,
+    stream_skew_s: float = 30.0,
+) -> ZsetTimeline | StreamTimeline:
+    """
+    stream_maxlen 为单个 stream 保留的近似条数上限（MAXLEN ~），None 或 0 不裁剪；zset 后端忽略。
+    """
+    if backend == "stream":
+        return StreamTimeline(maxlen=stream_maxlen or None, skew_s=stream_skew_s)
+    if backend == "zset":
+        return ZsetTimeline()
+    raise ValueError(f"unknown timeline backend: {backend}")
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from typing import Any
+
+from app.infra.redis_fact_store import RedisFactStore
+
+
+class UtteranceWriteBehind:
+    """
+    发言写入的 write-behind 缓冲（进程内）。
+
+    - append 只入队，不等待 Redis 往返；实时 WS 可以立即 ack
+    - 任一课堂缓冲达到 batch_size，或最早一条等待超过 flush_ms，就把所有课堂的缓冲合并成一次 pipeline 刷入
+    - flush(session_id) / close() 为持久化刷盘：end_classroom 与进程退出前调用
+    - 总积压超过 max_pending 时 append 会等待刷盘，作为背压
+    """
+
+    def __init__(
+        self,
+        store: RedisFactStore,
+        *,
+        flush_ms: int = 20,
+        batch_size: int = 256,
+        max_pending: int = 20000,
+    ) -> None:
+        self._store = store
+        self._flush_s = max(0.0, flush_ms / 1000)
+        self._batch_size = max(1, batch_size)
+        self._max_pending = max(self._batch_size, max_pending)
+        self._buffers: dict[str, list[tuple[float, dict[str, Any]]]] = defaultdict(list)
+        self._pending = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._closed = False
+
+        self._flushes = 0
+        self._flushed_items = 0
+        self._flush_errors = 0
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="utterance-write-behind")
+
+    async def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+        if self._task is not None:
+            await asyncio.wait([self._task], timeout=3.0)
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._pending,
+            "pending_sessions": len(self._buffers),
+            "flushes": self._flushes,
+            "flushed_items": self._flushed_items,
+            "avg_batch": round(self._flushed_items / self._flushes, 2) if self._flushes else 0.0,
+            "flush_errors": self._flush_errors,
+        }
+
+    async def append(self, session_id: str, timestamp: float, utterance: dict[str, Any]) -> None:
+        if self._task is None or self._closed:
+            await self._store.append_utterance(session_id, timestamp, utterance)
+            return
+        buf = self._buffers[session_id]
+        buf.append((timestamp, utterance))
+        self._pending += 1
+        if len(buf) == 1 or len(buf) >= self._batch_size:
+            self._wakeup.set()
+        if self._pending >= self._max_pending:
+            await self.flush()
+
+    async def flush(self, session_id: str | None = None) -> None:
+        """
+        立即把缓冲写入 Redis。session_id 为空时刷所有课堂；失败时数据放回缓冲并抛出异常。
+        """
+        async with self._flush_lock:
+            if session_id is None:
+                batches = dict(self._buffers)
+                self._buffers.clear()
+            else:
+                items = self._buffers.pop(session_id, None)
+                batches = {session_id: items} if items else {}
+            if not batches:
+                return
+            count = sum(len(v) for v in batches.values())
+            self._pending -= count
+            try:
+                await self._store.append_utterance_batches(batches)
+            except Exception:
+                self._flush_errors += 1
+                for sid, items in batches.items():
+                    self._buffers[sid][:0] = items
+                self._pending += count
+                raise
+            self._flushes += 1
+            self._flushed_items += count
+
+    async def _run(self) -> None:
+        while not self._closed:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._closed:
+                return
+            if self._pending < self._batch_size and not any(len(b) >= self._batch_size for b in self._buffers.values()):
+                try:
+                    await asyncio.wait_for(self._full_or_closed(), timeout=self._flush_s)
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self.flush()
+            except Exception:
+                await asyncio.sleep(self._flush_s or 0.05)
+                self._wakeup.set()
+
+    async def _full_or_closed(self) -> None:
+        while not self._closed and not any(len(b) >= self._batch_size for b in self._buffers.values()):
+            self._wakeup.clear()
+            await self._wakeup.wait()
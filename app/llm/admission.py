@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import AsyncIterator
+
+
+PRIORITY_COMMAND = "command"
+PRIORITY_STAGE = "stage"
+PRIORITY_FINAL = "final"
+
+# 数值越小越优先：教师交互指令 > 阶段总结 > 课后报告
+_PRIORITY_ORDER = {PRIORITY_COMMAND: 0, PRIORITY_STAGE: 1, PRIORITY_FINAL: 2}
+
+
+class TokenBucket:
+    """
+    令牌桶：rate_per_s 速率补充，容量 capacity；rate_per_s <= 0 表示不限速。
+    """
+
+    def __init__(self, *, rate_per_s: float, capacity: float) -> None:
+        self.rate_per_s = rate_per_s
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate_per_s <= 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def wait_s(self, n: float, now: float) -> float:
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        n = min(n, self.capacity)
+        if self._tokens >= n:
+            return 0.0
+        return (n - self._tokens) / self.rate_per_s
+
+    def take(self, n: float, now: float) -> None:
+        if self.unlimited:
+            return
+        self._refill(now)
+        self._tokens -= min(n, self.capacity)
+
+    def available(self) -> float | None:
+        if self.unlimited:
+            return None
+        self._refill(monotonic())
+        return self._tokens
+
+
+@dataclass(order=True)
+class _Waiter:
+    order: int
+    seq: int
+    priority: str = field(compare=False)
+    tokens: int = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+@dataclass
+class _ClassStats:
+    admitted: int = 0
+    waiting: int = 0
+    wait_total_s: float = 0.0
+    wait_last_s: float = 0.0
+    wait_max_s: float = 0.0
+
+
+class LlmAdmissionController:
+    """
+    LLM 调用准入控制（进程内，所有方舟请求共享）：
+
+    - 并发上限 max_concurrency（<= 0 不限）
+    - 请求数令牌桶 requests_per_s 与 token 令牌桶 tokens_per_min（<= 0 不限），
+      token 数由调用方按 prompt 估算（含预估输出）
+    - 按优先级排队：command > stage > final，同级先到先得；队首放行不了时整体等待，
+      避免低优先级请求抢走刚补充的额度
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 16,
+        requests_per_s: float = 0.0,
+        tokens_per_min: float = 0.0,
+    ) -> None:
+        self._max_concurrency = max_concurrency
+        self._requests = TokenBucket(rate_per_s=requests_per_s, capacity=max(1.0, requests_per_s))
+        self._tokens = TokenBucket(rate_per_s=tokens_per_min / 60, capacity=tokens_per_min / 6)
+        self._in_flight = 0
+        self._heap: list[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._stats = {p: _ClassStats() for p in _PRIORITY_ORDER}
+
+    def stats(self) -> dict:
+        classes = {}
+        for p, s in self._stats.items():
+            classes[p] = {
+                "admitted": s.admitted,
+                "waiting": s.waiting,
+                "queue_wait_last_s": round(s.wait_last_s, 4),
+                "queue_wait_max_s": round(s.wait_max_s, 4),
+                "queue_wait_avg_s": round(s.wait_total_s / s.admitted, 4) if s.admitted else 0.0,
+            }
+        tokens = self._tokens.available()
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self._max_concurrency,
+            "request_tokens_available": self._requests.available(),
+            "llm_tokens_available": round(tokens) if tokens is not None else None,
+            "classes": classes,
+        }
+
+    @asynccontextmanager
+    async def slot(self, priority: str, tokens: int = 0) -> AsyncIterator[None]:
+        await self.acquire(priority, tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: str, tokens: int = 0) -> None:
+        if priority not in _PRIORITY_ORDER:
+            raise ValueError(f"unknown LLM priority: {priority}")
+        loop = asyncio.get_running_loop()
+        w = _Waiter(
+            order=_PRIORITY_ORDER[priority],
+            seq=next(self._seq),
+            priority=priority,
+            tokens=tokens,
+            enqueued_at=monotonic(),
+            future=loop.create_future(),
+        )
+        heapq.heappush(self._heap, w)
+        self._stats[priority].waiting += 1
+        self._dispatch()
+        try:
+            await w.future
+        except asyncio.CancelledError:
+            if w.future.done() and not w.future.cancelled():
+                self.release()
+            else:
+                self._stats[priority].waiting -= 1
+                self._dispatch()
+            raise
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        now = monotonic()
+        while self._heap:
+            head = self._heap[0]
+            if head.future.done():
+                heapq.heappop(self._heap)
+                continue
+            if self._max_concurrency > 0 and self._in_flight >= self._max_concurrency:
+                return
+            wait_s = max(self._requests.wait_s(1, now), self._tokens.wait_s(head.tokens, now))
+            if wait_s > 0:
+                self._schedule(wait_s)
+                return
+            heapq.heappop(self._heap)
+            self._requests.take(1, now)
+            self._tokens.take(head.tokens, now)
+            self._in_flight += 1
+
+            s = self._stats[head.priority]
+            waited = now - head.enqueued_at
+            s.waiting -= 1
+            s.admitted += 1
+            s.wait_total_s += waited
+            s.wait_last_s = waited
+            s.wait_max_s = max(s.wait_max_s, waited)
+            head.future.set_result(None)
+
+    def _schedule(self, delay_s: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay_s, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
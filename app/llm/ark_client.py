@@ -1,16 +1,58 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
+from collections.abc import AsyncGenerator, AsyncIterator
 from dataclasses import dataclass
-from typing import Any
+from time import perf_counter
+from typing import Any, Awaitable, Callable, TypeVar
 
 import httpx
 
+from app.llm.admission import PRIORITY_STAGE, LlmAdmissionController
+from app.llm.resilience import CircuitBreaker, LatencyWindow, RetryPolicy
+from app.llm.single_flight import SingleFlight
+
+
+T = TypeVar("T")
+
 
 class ArkClientError(RuntimeError):
+    def __init__(self, message: str, *, status_code: int | None = None, retry_after_s: float | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after_s = retry_after_s
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code is not None and (self.status_code == 429 or self.status_code >= 500)
+
+
+class ArkCircuitOpenError(ArkClientError):
     pass
 
 
+def _retry_after_s(resp: httpx.Response) -> float | None:
+    try:
+        return float(resp.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+def turns_fingerprint(model: str, turns: list[ArkChatTurn]) -> str:
+    """
+    请求指纹：sha256(model + 完整 turns 的规范化 JSON)，用于单飞合并与回复缓存。
+    """
+    payload = json.dumps(
+        {"model": model, "input": [t.to_dict() for t in turns]},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 @dataclass(frozen=True)
 class ArkChatContentPart:
     type: str
@@ -40,36 +82,308 @@ class ArkChatClient:
     火山方舟 Chat API 轻量封装，面向“智能体运行时”使用。
     - 只负责可靠发起请求/解析响应
     - 不负责业务 prompt、状态、工具调用与结果落库
+
+    可靠性（均可选）：
+    - retry：429 / 5xx / 网络错误按指数退避 + 抖动重试
+    - hedge_quantile：单次请求超过最近耗时的该分位数（且不少于 hedge_min_delay_s）仍未返回时，
+      再发一个相同请求，取先成功的一个并取消另一个
+    - breaker：连续失败后熔断，打开期间直接抛 ArkCircuitOpenError
+    流式调用只在收到首个增量之前重试，不做对冲。
+
+    admission 不为空时，每次实际发出的 HTTP 请求（含重试与对冲）都先按 priority 申请准入，
+    token 估算为 prompt 字符数 + expected_output_tokens。
+
+    single_flight 不为空时，指纹相同的并发请求（含流式）只发起一次，结果由所有调用方共享。
     """
 
-    def __init__(self, *, base_url: str, api_key: str, model: str, timeout_s: float = 60.0) -> None:
+    def __init__(
+        self,
+        *,
+        base_url: str,
+        api_key: str,
+        model: str,
+        timeout_s: float = 60.0,
+        retry: RetryPolicy | None = None,
+        hedge_quantile: float | None = None,
+        hedge_min_delay_s: float = 1.0,
+        hedge_min_samples: int = 20,
+        breaker: CircuitBreaker | None = None,
+        admission: LlmAdmissionController | None = None,
+        expected_output_tokens: int = 800,
+        single_flight: SingleFlight | None = None,
+    ) -> None:
         self._base_url = base_url.rstrip("/")
         self._api_key = api_key
         self._model = model
         self._client = httpx.AsyncClient(timeout=httpx.Timeout(timeout_s))
+        self._retry = retry or RetryPolicy(max_attempts=1)
+        self._hedge_quantile = hedge_quantile
+        self._hedge_min_delay_s = hedge_min_delay_s
+        self._hedge_min_samples = hedge_min_samples
+        self._breaker = breaker
+        self._admission = admission
+        self._expected_output_tokens = expected_output_tokens
+        self._single_flight = single_flight
+        self._latency = LatencyWindow()
+        self._calls = 0
+        self._attempts = 0
+        self._retries = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._failures = 0
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    def stats(self) -> dict:
+        p50 = self._latency.quantile(0.5)
+        p95 = self._latency.quantile(0.95)
+        return {
+            "calls": self._calls,
+            "attempts": self._attempts,
+            "retries": self._retries,
+            "hedges": self._hedges,
+            "hedge_wins": self._hedge_wins,
+            "failures": self._failures,
+            "latency_p50_s": round(p50, 4) if p50 is not None else None,
+            "latency_p95_s": round(p95, 4) if p95 is not None else None,
+            "single_flight": self._single_flight.stats() if self._single_flight is not None else None,
+            "breaker": (
+                {"state": self._breaker.state, "opens": self._breaker.opens, "rejected": self._breaker.rejected}
+                if self._breaker is not None
+                else None
+            ),
+        }
 
     async def aclose(self) -> None:
         await self._client.aclose()
 
-    async def chat(self, turns: list[ArkChatTurn]) -> str:
+    def _headers(self) -> dict[str, str]:
+        return {
+            "Authorization": f"Bearer {self._api_key}",
+            "Content-Type": "application/json",
+        }
+
+    async def chat(self, turns: list[ArkChatTurn], *, priority: str = PRIORITY_STAGE) -> str:
+        self._calls += 1
+        if self._single_flight is None:
+            return await self._with_retry(lambda: self._hedged(turns, priority))
+        return await self._single_flight.do(
+            turns_fingerprint(self._model, turns),
+            lambda: self._with_retry(lambda: self._hedged(turns, priority)),
+        )
+
+    async def _with_retry(self, attempt_fn: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            if self._breaker is not None and not self._breaker.allow():
+                self._failures += 1
+                raise ArkCircuitOpenError(f"Ark circuit open, retry in {self._breaker.retry_in_s():.1f}s")
+            try:
+                result = await attempt_fn()
+            except ArkClientError as e:
+                if not e.retryable:
+                    # 4xx / 解析失败与服务健康无关：既不计失败也不算成功（不清零连续失败计数），只归还探测名额
+                    if self._breaker is not None:
+                        self._breaker.release()
+                    self._failures += 1
+                    raise
+                self._record_outcome(ok=False)
+                err: Exception = e
+                retry_after_s = e.retry_after_s
+            except httpx.TransportError as e:
+                self._record_outcome(ok=False)
+                err = e
+                retry_after_s = None
+            except BaseException:
+                if self._breaker is not None:
+                    self._breaker.release()
+                raise
+            else:
+                self._record_outcome(ok=True)
+                return result
+
+            attempt += 1
+            if attempt >= self._retry.max_attempts:
+                self._failures += 1
+                raise err
+            self._retries += 1
+            await asyncio.sleep(self._retry.backoff_s(attempt - 1, retry_after_s))
+
+    def _record_outcome(self, *, ok: bool) -> None:
+        if self._breaker is None:
+            return
+        if ok:
+            self._breaker.on_success()
+        else:
+            self._breaker.on_failure()
+
+    def _hedge_delay_s(self) -> float | None:
+        if self._hedge_quantile is None or len(self._latency) < self._hedge_min_samples:
+            return None
+        q = self._latency.quantile(self._hedge_quantile) or 0.0
+        return max(self._hedge_min_delay_s, q)
+
+    def _estimate_tokens(self, turns: list[ArkChatTurn]) -> int:
+        chars = sum(len(p.text or "") for t in turns for p in t.content)
+        return chars + self._expected_output_tokens
+
+    async def _hedged(self, turns: list[ArkChatTurn], priority: str) -> str:
+        delay = self._hedge_delay_s()
+        if delay is None:
+            return await self._chat_once(turns, priority)
+
+        primary = asyncio.create_task(self._chat_once(turns, priority))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+            self._hedges += 1
+            tasks.add(asyncio.create_task(self._chat_once(turns, priority)))
+            pending = set(tasks)
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        if t is not primary:
+                            self._hedge_wins += 1
+                        return t.result()
+                    error = t.exception()
+            raise error
+        finally:
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+
+    async def _chat_once(self, turns: list[ArkChatTurn], priority: str) -> str:
+        if self._admission is None:
+            return await self._post_chat(turns)
+        async with self._admission.slot(priority, self._estimate_tokens(turns)):
+            return await self._post_chat(turns)
+
+    async def _post_chat(self, turns: list[ArkChatTurn]) -> str:
+        self._attempts += 1
         url = f"{self._base_url}/chat/completions"
         req_payload = {
             "model": self._model,
             "input": [t.to_dict() for t in turns],
         }
-        headers = {
-            "Authorization": f"Bearer {self._api_key}",
-            "Content-Type": "application/json",
-        }
-        resp = await self._client.post(url, headers=headers, json=req_payload)
+        started = perf_counter()
+        resp = await self._client.post(url, headers=self._headers(), json=req_payload)
         if resp.status_code >= 400:
-            raise ArkClientError(f"Ark chat failed: {resp.status_code} {resp.text}")
+            raise ArkClientError(
+                f"Ark chat failed: {resp.status_code} {resp.text}",
+                status_code=resp.status_code,
+                retry_after_s=_retry_after_s(resp),
+            )
         data = resp.json()
         text = self._extract_text(data)
         if text is None:
             raise ArkClientError(f"Ark chat response parse failed: {json.dumps(data, ensure_ascii=False)[:2000]}")
+        self._latency.observe(perf_counter() - started)
         return text
 
+    async def chat_stream(self, turns: list[ArkChatTurn], *, priority: str = PRIORITY_STAGE) -> AsyncIterator[str]:
+        """
+        流式调用（SSE）：逐个产出文本增量，收到 `data: [DONE]` 或连接结束时停止。
+        """
+        self._calls += 1
+        if self._single_flight is None:
+            source = self._chat_stream(turns, priority)
+        else:
+            source = self._single_flight.stream(
+                turns_fingerprint(self._model, turns),
+                lambda: self._chat_stream(turns, priority),
+            )
+        try:
+            async for delta in source:
+                yield delta
+        finally:
+            await source.aclose()
+
+    async def _chat_stream(self, turns: list[ArkChatTurn], priority: str) -> AsyncGenerator[str, None]:
+        stream = await self._with_retry(lambda: self._open_stream(turns, priority))
+        try:
+            async for delta in stream:
+                yield delta
+        finally:
+            await stream.aclose()
+
+    async def _open_stream(self, turns: list[ArkChatTurn], priority: str) -> AsyncGenerator[str, None]:
+        """
+        打开流并预读到首个增量为止（期间的错误可以安全重试），返回从首个增量开始的迭代器。
+        """
+        stream = self._stream_once(turns, priority)
+        try:
+            first = await anext(stream)
+        except StopAsyncIteration:
+            await stream.aclose()
+            return _aiter_of()
+        except BaseException:
+            await stream.aclose()
+            raise
+        return _prepend(first, stream)
+
+    async def _stream_once(self, turns: list[ArkChatTurn], priority: str) -> AsyncGenerator[str, None]:
+        if self._admission is None:
+            async for delta in self._post_stream(turns):
+                yield delta
+            return
+        async with self._admission.slot(priority, self._estimate_tokens(turns)):
+            async for delta in self._post_stream(turns):
+                yield delta
+
+    async def _post_stream(self, turns: list[ArkChatTurn]) -> AsyncGenerator[str, None]:
+        self._attempts += 1
+        url = f"{self._base_url}/chat/completions"
+        req_payload = {
+            "model": self._model,
+            "input": [t.to_dict() for t in turns],
+            "stream": True,
+        }
+        headers = {**self._headers(), "Accept": "text/event-stream"}
+        async with self._client.stream("POST", url, headers=headers, json=req_payload) as resp:
+            if resp.status_code >= 400:
+                body = (await resp.aread()).decode("utf-8", errors="replace")
+                raise ArkClientError(
+                    f"Ark chat stream failed: {resp.status_code} {body}",
+                    status_code=resp.status_code,
+                    retry_after_s=_retry_after_s(resp),
+                )
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if not data:
+                    continue
+                if data == "[DONE]":
+                    return
+                try:
+                    chunk = json.loads(data)
+                except Exception:
+                    raise ArkClientError(f"Ark chat stream chunk parse failed: {data[:2000]}")
+                if isinstance(chunk, dict) and chunk.get("error"):
+                    raise ArkClientError(f"Ark chat stream error: {json.dumps(chunk, ensure_ascii=False)[:2000]}")
+                delta = self._extract_delta(chunk)
+                if delta:
+                    yield delta
+
+    def _extract_delta(self, chunk: dict[str, Any]) -> str | None:
+        if isinstance(chunk.get("delta"), str):
+            return chunk["delta"]
+        choices = chunk.get("choices") or chunk.get("output") or []
+        if isinstance(choices, list) and choices:
+            first = choices[0]
+            delta = first.get("delta") if isinstance(first, dict) else None
+            if isinstance(delta, dict) and isinstance(delta.get("content"), str):
+                return delta["content"]
+            if isinstance(delta, str):
+                return delta
+        return None
+
     def _extract_text(self, data: dict[str, Any]) -> str | None:
         candidates = data.get("output") or data.get("choices") or []
         if isinstance(candidates, list) and candidates:
@@ -92,3 +406,16 @@ class ArkChatClient:
             return data["text"]
         return None
 
+
+async def _aiter_of(*items: str) -> AsyncGenerator[str, None]:
+    for item in items:
+        yield item
+
+
+async def _prepend(first: str, rest: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+    try:
+        yield first
+        async for item in rest:
+            yield item
+    finally:
+        await rest.aclose()
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Protocol
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - 可选依赖
+    tiktoken = None
+
+
+# 中日韩统一表意文字、扩展 A、兼容表意文字、全角标点与符号
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+class TokenEstimator(Protocol):
+    name: str
+
+    def count(self, text: str) -> int: ...
+
+
+class CharTokenEstimator:
+    """
+    本地估算：中日韩字符按 cjk_tokens_per_char 计，其余字符约 4 个一个 token。
+    默认偏保守（中文按 1 字 1 token），宁可少塞一点也不要超出模型上下文。
+    """
+
+    name = "chars"
+
+    def __init__(self, *, cjk_tokens_per_char: float = 1.0, other_chars_per_token: float = 4.0) -> None:
+        self._cjk = cjk_tokens_per_char
+        self._other = other_chars_per_token
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        cjk = len(_CJK_RE.findall(text))
+        return math.ceil(cjk * self._cjk + (len(text) - cjk) / self._other)
+
+
+class TiktokenEstimator:
+    name = "tiktoken"
+
+    def __init__(self, encoding: str = "cl100k_base") -> None:
+        self._enc = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        return len(self._enc.encode(text, disallowed_special=())) if text else 0
+
+
+def build_estimator(name: str) -> TokenEstimator:
+    if name == "chars":
+        return CharTokenEstimator()
+    if name == "tiktoken":
+        if tiktoken is None:
+            raise RuntimeError("LLM_TOKENIZER=tiktoken 需要安装 tiktoken：pip install tiktoken")
+        return TiktokenEstimator()
+    raise ValueError(f"unknown LLM tokenizer: {name}")
+
+
+@dataclass
+class SectionReport:
+    lines_total: int
+    lines_kept: int
+    tokens: int
+
+
+@dataclass
+class PromptReport:
+    budget_tokens: int
+    fixed_tokens: int = 0
+    sections: dict[str, SectionReport] = field(default_factory=dict)
+
+    @property
+    def tokens(self) -> int:
+        return self.fixed_tokens + sum(s.tokens for s in self.sections.values())
+
+    @property
+    def truncated(self) -> bool:
+        return any(s.lines_kept < s.lines_total for s in self.sections.values())
+
+
+@dataclass
+class _Section:
+    name: str
+    lines: list[str]
+    priority: int
+    keep: str
+    prefix: str = ""
+    suffix: str = ""
+
+
+class PromptBuilder:
+    """
+    按 token 预算组装 prompt：
+
+    - fixed：模板 / 指令等必须保留的文本，先从预算中扣除
+    - add：按行组成的可裁剪段落，priority 越小越先分配预算；
+      keep 决定超预算时保留哪些行：head（最早）、tail（最近）、spread（全程均匀抽样）；
+      prefix / suffix 为段落的标题与结尾（如 "阶段总结：\n"），与 fixed 一样先从预算中扣除，原样拼在段落文本前后
+    - budget_tokens <= 0 表示不限，所有行原样保留
+
+    fit() 返回各段落裁剪后的文本（行以换行连接，保持原顺序，带 prefix / suffix），report 记录实际估算的 token 数。
+    """
+
+    def __init__(self, budget_tokens: int, *, estimator: TokenEstimator) -> None:
+        self._budget = budget_tokens
+        self._estimator = estimator
+        self._sections: list[_Section] = []
+        self.report = PromptReport(budget_tokens=budget_tokens)
+
+    def fixed(self, text: str) -> str:
+        self.report.fixed_tokens += self._estimator.count(text)
+        return text
+
+    def add(
+        self,
+        name: str,
+        lines: list[str],
+        *,
+        priority: int,
+        keep: str = "tail",
+        prefix: str = "",
+        suffix: str = "",
+    ) -> None:
+        if keep not in ("head", "tail", "spread"):
+            raise ValueError(f"unknown keep strategy: {keep}")
+        self.fixed(prefix)
+        self.fixed(suffix)
+        self._sections.append(
+            _Section(name=name, lines=lines, priority=priority, keep=keep, prefix=prefix, suffix=suffix)
+        )
+
+    def fit(self) -> dict[str, str]:
+        remaining = self._budget - self.report.fixed_tokens if self._budget > 0 else None
+        out: dict[str, str] = {}
+        for sec in sorted(self._sections, key=lambda s: s.priority):
+            costs = [self._estimator.count(line) for line in sec.lines]
+            if remaining is None or sum(costs) <= remaining:
+                idx = list(range(len(sec.lines)))
+            else:
+                idx = self._select(costs, max(0, remaining), sec.keep)
+            used = sum(costs[i] for i in idx)
+            if remaining is not None:
+                remaining -= used
+            out[sec.name] = sec.prefix + "\n".join(sec.lines[i] for i in idx) + sec.suffix
+            self.report.sections[sec.name] = SectionReport(
+                lines_total=len(sec.lines),
+                lines_kept=len(idx),
+                tokens=used,
+            )
+        return out
+
+    @staticmethod
+    def _select(costs: list[int], budget: int, keep: str) -> list[int]:
+        n = len(costs)
+        if keep == "head":
+            idx: list[int] = []
+            for i in range(n):
+                if budget - costs[i] < 0:
+                    break
+                budget -= costs[i]
+                idx.append(i)
+            return idx
+        if keep == "tail":
+            idx = []
+            for i in range(n - 1, -1, -1):
+                if budget - costs[i] < 0:
+                    break
+                budget -= costs[i]
+                idx.append(i)
+            return idx[::-1]
+
+        # spread：二分最大的 k，使均匀抽样的 k 行放得下
+        def sample(k: int) -> list[int]:
+            if k <= 0:
+                return []
+            if k == 1:
+                return [n - 1]
+            return sorted({round(j * (n - 1) / (k - 1)) for j in range(k)})
+
+        lo, hi = 0, n
+        best: list[int] = []
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            picked = sample(mid)
+            if sum(costs[i] for i in picked) <= budget:
+                best, lo = picked, mid + 1
+            else:
+                hi = mid - 1
+        return best
+
+
+@dataclass
+class _KindStats:
+    calls: int = 0
+    truncated_calls: int = 0
+    tokens_total: int = 0
+    tokens_last: int = 0
+    tokens_max: int = 0
+    latency_total_s: float = 0.0
+    latency_last_s: float = 0.0
+
+
+class PromptStatsRecorder:
+    """
+    按调用类型记录 prompt 估算 token 数与对应 LLM 调用耗时，用于判断延迟来自 prompt 体积还是排队 / 服务端。
+    """
+
+    def __init__(self) -> None:
+        self._kinds: dict[str, _KindStats] = {}
+
+    def record(self, kind: str, report: PromptReport, latency_s: float) -> None:
+        s = self._kinds.get(kind)
+        if s is None:
+            s = self._kinds[kind] = _KindStats()
+        tokens = report.tokens
+        s.calls += 1
+        s.truncated_calls += int(report.truncated)
+        s.tokens_total += tokens
+        s.tokens_last = tokens
+        s.tokens_max = max(s.tokens_max, tokens)
+        s.latency_total_s += latency_s
+        s.latency_last_s = latency_s
+
+    def stats(self) -> dict:
+        out: dict[str, dict] = {}
+        for kind, s in self._kinds.items():
+            out[kind] = {
+                "calls": s.calls,
+                "truncated_calls": s.truncated_calls,
+                "prompt_tokens_last": s.tokens_last,
+                "prompt_tokens_avg": round(s.tokens_total / s.calls) if s.calls else 0,
+                "prompt_tokens_max": s.tokens_max,
+                "latency_last_s": round(s.latency_last_s, 4),
+                "latency_avg_s": round(s.latency_total_s / s.calls, 4) if s.calls else 0.0,
+            }
+        return out
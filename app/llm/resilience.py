@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import random
+from collections import deque
+from dataclasses import dataclass
+from time import monotonic
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    指数退避 + 全抖动（full jitter）：第 n 次重试前等待 uniform(0, min(max_s, base_s * 2**n))。
+    429 带 Retry-After 时取两者较大值（不超过 max_s）。
+    """
+
+    max_attempts: int = 3
+    base_s: float = 0.2
+    max_s: float = 5.0
+
+    def backoff_s(self, attempt: int, retry_after_s: float | None = None) -> float:
+        delay = random.uniform(0.0, min(self.max_s, self.base_s * (2**attempt)))
+        if retry_after_s is not None:
+            delay = max(delay, min(self.max_s, retry_after_s))
+        return delay
+
+
+class LatencyWindow:
+    """
+    最近 N 次成功请求的耗时，用于计算对冲请求的触发延迟（例如 p95）。
+    """
+
+    def __init__(self, size: int = 200) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    连续失败熔断：
+    - closed：正常放行，连续失败达到 failure_threshold 后打开
+    - open：reset_s 内直接拒绝（快速失败）
+    - half_open：reset_s 过后放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, *, failure_threshold: int = 5, reset_s: float = 30.0) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_s = reset_s
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self.opens = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if monotonic() - self._opened_at >= self._reset_s:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def on_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def on_failure(self) -> None:
+        self._failures += 1
+        if self._probing or (self._opened_at is None and self._failures >= self._failure_threshold):
+            self._opened_at = monotonic()
+            self.opens += 1
+        self._probing = False
+
+    def release(self) -> None:
+        """
+        调用既未成功也未失败（例如被取消）时归还半开探测名额。
+        """
+        self._probing = False
+
+    def retry_in_s(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self._reset_s - (monotonic() - self._opened_at))
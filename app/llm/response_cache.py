@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+
+from app.llm.ark_client import ArkChatTurn, turns_fingerprint
+
+
+@dataclass
+class _KindStats:
+    lru_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+    stores: int = 0
+
+
+class LlmResponseCache:
+    """
+    LLM 回复缓存（按内容寻址）：key = sha256(model + 完整 turns)，prompt 任何变化都会得到新 key。
+
+    - 第一层：进程内 LRU（最多 lru_size 条）
+    - 第二层：Redis `llm:cache:{kind}:{digest}`，TTL 为 ttl_s；redis 为空时只用进程内缓存
+    - Redis 读写失败不影响主流程，按未命中处理
+    """
+
+    def __init__(
+        self,
+        redis: Redis | None,
+        *,
+        lru_size: int = 256,
+        ttl_s: int = 86400,
+        prefix: str = "llm:cache",
+    ) -> None:
+        self._redis = redis
+        self._lru_size = lru_size
+        self._ttl_s = ttl_s
+        self._prefix = prefix
+        self._lru: OrderedDict[str, str] = OrderedDict()
+        self._stats: dict[str, _KindStats] = {}
+
+    @staticmethod
+    def fingerprint(model: str, turns: list[ArkChatTurn]) -> str:
+        return turns_fingerprint(model, turns)
+
+    def stats(self) -> dict:
+        out: dict[str, dict] = {}
+        for kind, s in self._stats.items():
+            lookups = s.lru_hits + s.redis_hits + s.misses
+            out[kind] = {
+                "lru_hits": s.lru_hits,
+                "redis_hits": s.redis_hits,
+                "misses": s.misses,
+                "bypassed": s.bypassed,
+                "stores": s.stores,
+                "hit_rate": round((s.lru_hits + s.redis_hits) / lookups, 4) if lookups else 0.0,
+            }
+        return {"lru_entries": len(self._lru), "kinds": out}
+
+    def _kind(self, kind: str) -> _KindStats:
+        s = self._stats.get(kind)
+        if s is None:
+            s = self._stats[kind] = _KindStats()
+        return s
+
+    def _k(self, kind: str, digest: str) -> str:
+        return f"{self._prefix}:{kind}:{digest}"
+
+    def note_bypass(self, kind: str) -> None:
+        self._kind(kind).bypassed += 1
+
+    async def get(self, kind: str, digest: str) -> str | None:
+        stats = self._kind(kind)
+        key = self._k(kind, digest)
+        text = self._lru.get(key)
+        if text is not None:
+            self._lru.move_to_end(key)
+            stats.lru_hits += 1
+            return text
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(key)
+            except Exception:
+                raw = None
+            if raw is not None:
+                text = raw.decode("utf-8") if isinstance(raw, (bytes, bytearray)) else str(raw)
+                self._remember(key, text)
+                stats.redis_hits += 1
+                return text
+
+        stats.misses += 1
+        return None
+
+    async def set(self, kind: str, digest: str, text: str) -> None:
+        key = self._k(kind, digest)
+        self._remember(key, text)
+        self._kind(kind).stores += 1
+        if self._redis is not None:
+            try:
+                await self._redis.set(key, text.encode("utf-8"), ex=self._ttl_s)
+            except Exception:
+                pass
+
+    def _remember(self, key: str, text: str) -> None:
+        self._lru[key] = text
+        self._lru.move_to_end(key)
+        while len(self._lru) > self._lru_size:
+            self._lru.popitem(last=False)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterator
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Generic, TypeVar
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Call(Generic[T]):
+    task: asyncio.Task[T]
+    waiters: int = 0
+
+
+@dataclass
+class _SharedStream:
+    items: list[str] = field(default_factory=list)
+    done: bool = False
+    error: BaseException | None = None
+    consumers: int = 0
+    task: asyncio.Task | None = None
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def notify(self) -> None:
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def consume(self) -> AsyncIterator[str]:
+        i = 0
+        while True:
+            if i < len(self.items):
+                yield self.items[i]
+                i += 1
+                continue
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self.changed.wait()
+
+
+class SingleFlight:
+    """
+    相同 key 的并发请求合并为一次实际调用（进程内）：
+
+    - do：第一个调用方发起的请求在独立任务中执行，后到的调用方等待同一结果（包括异常）
+    - stream：流式版本，后到的调用方先补发已收到的增量，再与其他调用方一起接收后续增量
+    - 某个调用方取消 / 断开只影响它自己；所有调用方都离开后才取消底层请求
+    - 请求结束后立即移除 key，之后的相同请求会重新发起（结果复用交给 LlmResponseCache）
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, _Call] = {}
+        self._streams: dict[str, _SharedStream] = {}
+        self._coalesced = 0
+        self._abandoned = 0
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "coalesced": self._coalesced,
+            "abandoned": self._abandoned,
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(task=asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _t, c=call: self._forget_call(key, c))
+        else:
+            self._coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._abandoned += 1
+                self._forget_call(key, call)
+                call.task.cancel()
+
+    def _forget_call(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def stream(self, key: str, fn: Callable[[], AsyncIterator[str]]) -> AsyncGenerator[str, None]:
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            shared.task = asyncio.create_task(self._produce(key, shared, fn))
+        else:
+            self._coalesced += 1
+
+        shared.consumers += 1
+        try:
+            async for item in shared.consume():
+                yield item
+        finally:
+            shared.consumers -= 1
+            if shared.consumers == 0 and not shared.done:
+                self._abandoned += 1
+                self._forget_stream(key, shared)
+                shared.task.cancel()
+
+    async def _produce(self, key: str, shared: _SharedStream, fn: Callable[[], AsyncIterator[str]]) -> None:
+        source = fn()
+        try:
+            async for item in source:
+                shared.items.append(item)
+                shared.notify()
+        except asyncio.CancelledError:
+            shared.error = asyncio.CancelledError()
+        except Exception as e:
+            shared.error = e
+        finally:
+            shared.done = True
+            self._forget_stream(key, shared)
+            shared.notify()
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def _forget_stream(self, key: str, shared: _SharedStream) -> None:
+        if self._streams.get(key) is shared:
+            del self._streams[key]
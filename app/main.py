@@ -6,6 +6,7 @@ from fastapi import FastAPI
 
 from app.api.agent import router as agent_router
 from app.api.classroom import router as classroom_router
+from app.api.metrics import router as metrics_router
 from app.api.ws import router as ws_router
 from app.core.app_context import AppContext
 
@@ -23,6 +24,7 @@ def create_app() -> FastAPI:
     app.include_router(classroom_router, prefix="/api/v1")
     app.include_router(agent_router, prefix="/api/v1")
     app.include_router(ws_router, prefix="/api/v1")
+    app.include_router(metrics_router, prefix="/api/v1")
     return app
 
 
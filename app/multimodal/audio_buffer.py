@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass, field
 
 
@@ -14,3 +15,191 @@ class AudioBuffer:
     def tail_asr(self, n: int = 200) -> list[str]:
         return self.asr_items[-n:]
 
+
+# 填补时间空洞时使用的零块（只读，按需切片）
+_ZEROS = bytes(64 * 1024)
+
+
+class PcmRingBuffer:
+    """
+    单路 PCM 音频的环形缓冲：一次性预分配 bytearray，写入只做一次拷贝，读取按时间范围返回 memoryview（不拷贝）。
+
+    时间轴按采样时钟线性换算：第一次写入的 timestamp 为原点，之后第 n 个字节对应 origin + n / byte_rate 秒。
+    - 帧的 timestamp 超前当前写入位置超过 gap_tolerance_s（客户端没有发送静音 / 被 VAD 丢弃）时补零，保持时间对齐
+    - 超前超过整个容量时直接重置原点，不做无意义的补零
+    - 落后（时钟抖动）时按连续音频追加
+
+    view() 返回的 memoryview 与缓冲共享内存：写入方绕回后内容会被覆盖，调用方应在下一次 await 之前用完或自行拷贝。
+    """
+
+    def __init__(
+        self,
+        *,
+        seconds: float,
+        sample_rate: int = 16000,
+        sample_width: int = 2,
+        channels: int = 1,
+        gap_tolerance_s: float = 0.2,
+    ) -> None:
+        self.frame_bytes = sample_width * channels
+        self.byte_rate = sample_rate * self.frame_bytes
+        capacity = int(seconds * self.byte_rate)
+        self.capacity = max(self.frame_bytes, capacity - capacity % self.frame_bytes)
+        self._buf = bytearray(self.capacity)
+        self._mv = memoryview(self._buf)
+        self._gap_tolerance_bytes = int(gap_tolerance_s * self.byte_rate)
+        self.reset()
+
+    def reset(self) -> None:
+        """清空内容（不释放内存），下一次写入重新确定时间原点。"""
+        self._origin: float | None = None
+        self._end = 0  # 从原点起累计写入的字节数（绝对位置）
+        self.gaps_filled = 0
+
+    @property
+    def start_ts(self) -> float | None:
+        """缓冲中最早一个字节对应的时间。"""
+        if self._origin is None:
+            return None
+        return self._origin + max(0, self._end - self.capacity) / self.byte_rate
+
+    @property
+    def end_ts(self) -> float | None:
+        if self._origin is None:
+            return None
+        return self._origin + self._end / self.byte_rate
+
+    def write(self, timestamp: float, audio: bytes | bytearray | memoryview) -> None:
+        n = len(audio) - len(audio) % self.frame_bytes
+        if n <= 0:
+            return
+        if self._origin is None:
+            self._origin = timestamp
+        else:
+            expected = round((timestamp - self._origin) * self.byte_rate)
+            gap = expected - self._end
+            if gap > self.capacity:
+                self._origin, self._end = timestamp, 0
+            elif gap > self._gap_tolerance_bytes:
+                gap -= gap % self.frame_bytes
+                self.gaps_filled += 1
+                while gap > 0:
+                    step = min(gap, len(_ZEROS))
+                    self._put(memoryview(_ZEROS)[:step])
+                    gap -= step
+        src = audio if isinstance(audio, memoryview) else memoryview(audio)
+        if n > self.capacity:
+            # 单次写入超过容量：只保留最后 capacity 字节
+            self._end += n - self.capacity
+            src = src[n - self.capacity : n]
+            n = self.capacity
+        self._put(src[:n])
+
+    def _put(self, src: memoryview) -> None:
+        n = len(src)
+        pos = self._end % self.capacity
+        first = min(n, self.capacity - pos)
+        self._mv[pos : pos + first] = src[:first]
+        if first < n:
+            self._mv[: n - first] = src[first:]
+        self._end += n
+
+    def view(self, start_ts: float, end_ts: float) -> tuple[float, list[memoryview]]:
+        """
+        返回 [start_ts, end_ts) 内仍在缓冲中的音频：(实际起点时间, 1~2 段 memoryview)。
+        起点早于缓冲中最早的数据时截到最早的数据，没有数据时返回空列表。
+        """
+        if self._origin is None or end_ts <= start_ts:
+            return start_ts, []
+        oldest = max(0, self._end - self.capacity)
+        a = round((start_ts - self._origin) * self.byte_rate)
+        b = round((end_ts - self._origin) * self.byte_rate)
+        a = max(oldest, min(a - a % self.frame_bytes, self._end))
+        b = max(a, min(b - b % self.frame_bytes, self._end))
+        actual_start = self._origin + a / self.byte_rate
+        if a == b:
+            return actual_start, []
+        pa, n = a % self.capacity, b - a
+        if pa + n <= self.capacity:
+            return actual_start, [self._mv[pa : pa + n]]
+        return actual_start, [self._mv[pa:], self._mv[: pa + n - self.capacity]]
+
+    def latest(self, seconds: float) -> tuple[float, list[memoryview]]:
+        end = self.end_ts
+        if end is None:
+            return 0.0, []
+        return self.view(end - seconds, end)
+
+    def copy(self, start_ts: float, end_ts: float) -> bytes:
+        """需要连续 bytes 时（写文件、跨 await 保留）显式拷贝一次。"""
+        return b"".join(self.view(start_ts, end_ts)[1])
+
+
+class SessionAudioBuffer:
+    """
+    单个课堂的音频缓冲：每个发言人一路 PcmRingBuffer，总内存不超过 max_bytes。
+
+    每路固定 track_seconds 秒，最多 max_bytes // 每路字节数 路；新发言人超出上限时
+    复用最久没有写入的那一路（reset 后重用同一块内存），内存不会随课堂时长或人数增长。
+
+    只有最久未写入的那一路已空闲 evict_idle_s 秒以上才会被复用；同时发言的人数超过路数时，
+    新发言人的音频不缓冲（计入 overflow_frames），而不是每来一帧就清空一路正在使用的缓冲。
+    应只写入送给 ASR 的音频（VAD 放行的语音帧），静音不占路数。
+    """
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int,
+        track_seconds: float = 20.0,
+        sample_rate: int = 16000,
+        evict_idle_s: float = 5.0,
+    ) -> None:
+        self.track_seconds = track_seconds
+        self.sample_rate = sample_rate
+        self.evict_idle_s = evict_idle_s
+        track_bytes = int(track_seconds * sample_rate * 2)
+        self.max_tracks = max(1, max_bytes // max(1, track_bytes))
+        self._tracks: OrderedDict[str, PcmRingBuffer] = OrderedDict()
+        self.evictions = 0
+        self.overflow_frames = 0
+
+    @property
+    def allocated_bytes(self) -> int:
+        return sum(t.capacity for t in self._tracks.values())
+
+    def track(self, user_id: str) -> PcmRingBuffer | None:
+        return self._tracks.get(user_id)
+
+    def write(self, user_id: str, timestamp: float, audio: bytes | bytearray | memoryview) -> None:
+        ring = self._tracks.get(user_id)
+        if ring is None:
+            if len(self._tracks) >= self.max_tracks:
+                oldest = next(iter(self._tracks.values()))
+                if oldest.end_ts is not None and timestamp - oldest.end_ts < self.evict_idle_s:
+                    self.overflow_frames += 1
+                    return
+                _, ring = self._tracks.popitem(last=False)
+                ring.reset()
+                self.evictions += 1
+            else:
+                ring = PcmRingBuffer(seconds=self.track_seconds, sample_rate=self.sample_rate)
+            self._tracks[user_id] = ring
+        else:
+            self._tracks.move_to_end(user_id)
+        ring.write(timestamp, audio)
+
+    def view(self, user_id: str, start_ts: float, end_ts: float) -> tuple[float, list[memoryview]]:
+        ring = self._tracks.get(user_id)
+        if ring is None:
+            return start_ts, []
+        return ring.view(start_ts, end_ts)
+
+    def stats(self) -> dict:
+        return {
+            "tracks": len(self._tracks),
+            "max_tracks": self.max_tracks,
+            "allocated_bytes": self.allocated_bytes,
+            "evictions": self.evictions,
+            "overflow_frames": self.overflow_frames,
+        }
@@ -0,0 +1,301 @@
+"""
+实时音频的语音活动检测（VAD）：按能量 + 过零率判定语音，静音帧在送 ASR 之前丢弃。
+
+- 特征按 window_ms 的分析窗计算：能量（dBFS）与过零率。一批帧（多个课堂、多个发言人）的特征一次算完：
+  安装了 numpy 时整批拼成一个数组向量化计算，否则用标准库（array + math.hypot + 按位计数）逐窗计算，
+  两者的窗口划分与公式一致
+- 每路（课堂 × 发言人）独立的自适应阈值：噪声底随能量下降立即跟随、上升按 noise_rise_db_per_s 缓慢跟随，
+  阈值 = max(min_energy_db, 噪声底 + snr_db)；能量过阈值但过零率过高（白噪声、纸张摩擦）的窗不算语音，
+  除非比阈值再高 strong_db
+- 平滑：连续 onset_windows 个语音窗才开始一段（滤掉点击声），最后一个语音窗之后保持 hangover_ms 才结束；
+  一段开始时补上前一帧（预滚，避免吞掉首字）
+- is_last 只透传客户端自己的结束标记：段落结束不关闭 ASR 连接，按段定稿由服务端对拖尾静音判停完成；
+  客户端的最后一帧被判为静音时，若该路之后送出过音频，补一个空的结束帧
+
+判定以实时帧为单位：一帧内只要有窗处于语音段中就整帧放行，否则整帧丢弃。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import sys
+from array import array
+from collections.abc import Callable
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 可选依赖
+    np = None
+
+
+Audio = bytes | bytearray | memoryview
+# (session_id, user_id, timestamp, audio, is_last)
+VadItem = tuple[str, str, float, Audio, bool]
+# 放行的帧：(timestamp, audio, is_last)
+VadOutput = tuple[float, Audio, bool]
+
+_FULL_SCALE_POWER = 32768.0 * 32768.0
+_POWER_EPS = 1e-10  # 数字静音对应 -100 dBFS
+# PCM s16le 高字节的符号位 -> 0/1
+_SIGN_TABLE = bytes(1 if i >= 128 else 0 for i in range(256))
+
+
+@dataclass(frozen=True)
+class VadConfig:
+    sample_rate: int = 16000
+    window_ms: int = 20
+    min_energy_db: float = -50.0
+    snr_db: float = 10.0
+    strong_db: float = 10.0
+    zcr_max: float = 0.35
+    onset_windows: int = 2
+    hangover_ms: int = 400
+    noise_init_db: float = -60.0
+    noise_rise_db_per_s: float = 5.0
+    preroll: bool = True
+
+
+def _features_python(chunks: list[memoryview], window: int) -> tuple[list[int], list[float], list[float]]:
+    counts: list[int] = []
+    energy: list[float] = []
+    zcr: list[float] = []
+    for mv in chunks:
+        samples = array("h")
+        samples.frombytes(mv)
+        if sys.byteorder == "big":
+            samples.byteswap()
+        signs = mv[1::2].tobytes().translate(_SIGN_TABLE)
+        n = len(samples)
+        k = max(1, n // window) if n else 0
+        bounds = [i * window for i in range(k)] + [n]
+        for a, b in zip(bounds, bounds[1:]):
+            # hypot 在 C 里累加平方和，比 3.12 的 math.sumprod 逐个取 int 快一倍
+            norm = math.hypot(*samples[a:b])
+            energy.append(10 * math.log10(norm * norm / (b - a) / _FULL_SCALE_POWER + _POWER_EPS))
+            s = signs[a:b]
+            # 相邻两个符号字节异或后为 1 的个数即过零次数
+            crossings = (int.from_bytes(s[:-1]) ^ int.from_bytes(s[1:])).bit_count()
+            zcr.append(crossings / max(1, b - a - 1))
+        counts.append(k)
+    return counts, energy, zcr
+
+
+def _features_numpy(chunks: list[memoryview], window: int) -> tuple[list[int], list[float], list[float]]:
+    counts: list[int] = []
+    starts: list[int] = []
+    total = 0
+    for mv in chunks:
+        n = len(mv) // 2
+        k = max(1, n // window) if n else 0
+        starts.extend(range(total, total + k * window, window))
+        counts.append(k)
+        total += n
+    if not starts:
+        return counts, [], []
+    x = np.frombuffer(b"".join(chunks), dtype="<i2").astype(np.float64)
+    idx = np.asarray(starts)
+    lengths = np.diff(np.append(idx, total))
+    power = np.add.reduceat(x * x, idx) / lengths
+    energy = 10 * np.log10(power / _FULL_SCALE_POWER + _POWER_EPS)
+    neg = np.signbit(x)
+    crossing = np.zeros(total, dtype=np.int32)
+    crossing[:-1] = neg[1:] != neg[:-1]
+    # 只统计窗内的过零，跨窗边界的不算（与标准库实现一致）
+    crossing[idx[1:] - 1] = 0
+    zcr = np.add.reduceat(crossing, idx) / np.maximum(lengths - 1, 1)
+    return counts, energy.tolist(), zcr.tolist()
+
+
+@dataclass
+class _VadStream:
+    noise_db: float
+    speaking: bool = False
+    run: int = 0
+    hang: int = 0
+    prev: tuple[float, Audio] | None = None
+    # 上一个结束帧之后是否放行过音频（客户端的结束帧被丢弃时据此补发空结束帧）
+    open: bool = False
+
+
+class VoiceActivityDetector:
+    """
+    按批处理实时帧：process() 输入一批 (session_id, user_id, timestamp, audio, is_last)，
+    返回与输入对齐的放行结果（每帧 0~2 个：预滚帧 + 本帧）。同一路的帧按输入顺序处理。
+
+    纯同步、无 I/O，可以直接在事件循环里调用；调度与分发见 VadBatcher。
+    """
+
+    def __init__(self, config: VadConfig | None = None, *, backend: str = "auto") -> None:
+        if backend == "auto":
+            backend = "numpy" if np is not None else "python"
+        if backend == "numpy":
+            if np is None:
+                raise RuntimeError("VAD_BACKEND=numpy 需要安装 numpy：pip install numpy")
+            self._features = _features_numpy
+        elif backend == "python":
+            self._features = _features_python
+        else:
+            raise ValueError(f"unknown VAD backend: {backend}")
+        self.backend = backend
+        self.config = config or VadConfig()
+        cfg = self.config
+        self._window = max(1, cfg.sample_rate * cfg.window_ms // 1000)
+        self._hang_windows = max(1, math.ceil(cfg.hangover_ms / cfg.window_ms))
+        self._noise_rise = cfg.noise_rise_db_per_s * cfg.window_ms / 1000
+        self._bytes_per_s = cfg.sample_rate * 2
+        self._streams: dict[str, dict[str, _VadStream]] = {}
+
+        self.batches = 0
+        self.frames_in = 0
+        self.frames_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.segments = 0
+        self.busy_s = 0.0
+
+    def forget(self, session_id: str) -> None:
+        self._streams.pop(session_id, None)
+
+    def process(self, items: list[VadItem]) -> list[list[VadOutput]]:
+        started = perf_counter()
+        chunks = [a if isinstance(a, memoryview) else memoryview(a) for _, _, _, a, _ in items]
+        counts, energy, zcr = self._features(chunks, self._window)
+        cfg = self.config
+        out: list[list[VadOutput]] = []
+        pos = 0
+        for (session_id, user_id, ts, audio, client_last), k in zip(items, counts):
+            streams = self._streams.get(session_id)
+            if streams is None:
+                streams = self._streams[session_id] = {}
+            st = streams.get(user_id)
+            if st is None:
+                st = streams[user_id] = _VadStream(noise_db=cfg.noise_init_db)
+
+            was = st.speaking
+            active = was
+            for e, z in zip(energy[pos : pos + k], zcr[pos : pos + k]):
+                threshold = max(cfg.min_energy_db, st.noise_db + cfg.snr_db)
+                voiced = e > threshold and (z <= cfg.zcr_max or e > threshold + cfg.strong_db)
+                st.noise_db = e if e < st.noise_db else min(e, st.noise_db + self._noise_rise)
+                st.run = st.run + 1 if voiced else 0
+                if voiced and (st.speaking or st.run >= cfg.onset_windows):
+                    st.speaking = True
+                    st.hang = self._hang_windows
+                elif st.speaking:
+                    st.hang -= 1
+                    if st.hang <= 0:
+                        st.speaking = False
+                active = active or st.speaking
+            pos += k
+
+            self.frames_in += 1
+            self.bytes_in += len(audio)
+            if not active:
+                st.prev = (ts, audio) if cfg.preroll else None
+                if client_last and st.open:
+                    st.open = False
+                    st.prev = None
+                    out.append([(ts, audio[:0], True)])
+                else:
+                    out.append([])
+                continue
+            frames: list[VadOutput] = []
+            if not was:
+                self.segments += 1
+                if st.prev is not None:
+                    frames.append((st.prev[0], st.prev[1], False))
+            if client_last:
+                st.speaking = False
+                st.run = 0
+            elif not st.speaking:
+                st.run = 0
+            frames.append((ts, audio, client_last))
+            st.open = not client_last
+            st.prev = None
+            self.frames_out += len(frames)
+            self.bytes_out += sum(len(a) for _, a, _ in frames)
+            out.append(frames)
+        self.batches += 1
+        self.busy_s += perf_counter() - started
+        return out
+
+    def stats(self) -> dict:
+        audio_in_s = self.bytes_in / self._bytes_per_s
+        return {
+            "backend": self.backend,
+            "streams": sum(len(s) for s in self._streams.values()),
+            "batches": self.batches,
+            "frames_in": self.frames_in,
+            "frames_out": self.frames_out,
+            "segments": self.segments,
+            "audio_in_s": round(audio_in_s, 3),
+            "audio_out_s": round(self.bytes_out / self._bytes_per_s, 3),
+            "drop_ratio": round(1 - self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+            "busy_s": round(self.busy_s, 6),
+            # 每秒音频消耗的 CPU 秒数，即每路常驻占用的单核比例
+            "cpu_per_stream": round(self.busy_s / audio_in_s, 6) if audio_in_s else 0.0,
+        }
+
+
+class VadBatcher:
+    """
+    把各路实时帧攒成一批交给 VoiceActivityDetector：第一帧到达后 batch_ms 或攒满 max_batch 时处理，
+    放行的帧逐个交给 forward(target, audio, timestamp, is_last)。batch_ms <= 0 时每帧立即处理。
+
+    submit 只追加到列表，不等待，ack 路径上最多增加一次定时器注册；判定与转发在定时回调里同步完成。
+    """
+
+    def __init__(
+        self,
+        detector: VoiceActivityDetector,
+        forward: Callable[[Any, Audio, float, bool], None],
+        *,
+        batch_ms: float = 20.0,
+        max_batch: int = 512,
+    ) -> None:
+        self.detector = detector
+        self._forward = forward
+        self.batch_ms = batch_ms
+        self.max_batch = max(1, max_batch)
+        self._items: list[VadItem] = []
+        self._targets: list[Any] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self.forward_errors = 0
+
+    def submit(self, session_id: str, user_id: str, timestamp: float, audio: Audio, is_last: bool, target: Any) -> None:
+        if len(audio) % 2:
+            # 与 ASR 客户端的校验一致，在 ack 路径上就报错，不让奇数长度的帧进入整批计算
+            raise ValueError(f"pcm_s16le audio must have even length, got {len(audio)}")
+        self._items.append((session_id, user_id, timestamp, audio, is_last))
+        self._targets.append(target)
+        if self.batch_ms <= 0 or len(self._items) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.batch_ms / 1000, self.flush)
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._items:
+            return
+        items, targets = self._items, self._targets
+        self._items, self._targets = [], []
+        for target, frames in zip(targets, self.detector.process(items)):
+            for ts, audio, is_last in frames:
+                try:
+                    self._forward(target, audio, ts, is_last)
+                except Exception:
+                    self.forward_errors += 1
+
+    def forget(self, session_id: str) -> None:
+        """课堂结束：先处理掉积压的帧，再丢弃该课堂各路的状态。"""
+        self.flush()
+        self.detector.forget(session_id)
+
+    def stats(self) -> dict:
+        return {**self.detector.stats(), "pending": len(self._items), "forward_errors": self.forward_errors}
@@ -9,6 +9,7 @@ class AgentCommandRequest(BaseModel):
     instruction: str = Field(..., min_length=1)
 
     image_url: str | None = None
+    bypass_cache: bool = False
 
 
 class AgentCommandResponse(BaseModel):
@@ -41,6 +41,8 @@ class RealtimeAudioFrame(BaseModel):
     timestamp: float
     audio_chunk: str = Field(..., min_length=1)
     is_last: bool = False
+    # 客户端帧序号：流水线模式（?pipeline=1）下必填且严格递增，普通模式忽略
+    seq: int | None = None
 
     mock_text: str | None = None
 
@@ -13,4 +13,10 @@ class FinalReportResponse(BaseModel):
     ok: bool
     session_id: str
     report: dict | None = None
+    job: dict | None = None
 
+
+class ReportDraftResponse(BaseModel):
+    ok: bool
+    session_id: str
+    draft: dict | None = None
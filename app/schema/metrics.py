@@ -0,0 +1,8 @@
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+
+
+class RuntimeMetricsResponse(BaseModel):
+    ok: bool
+    metrics: dict = Field(default_factory=dict)
@@ -0,0 +1,139 @@
+"""
+方舟客户端可靠性基准：在进程内启动带故障注入的假方舟服务（tests/fake_ark_server.py），
+对比不同重试 / 对冲 / 熔断配置下的成功率、延迟分位与实际打到服务端的请求数。不需要网络与 Redis：
+    python tests/bench_ark_resilience.py --calls 200 --concurrency 10 --error-rate 0.15 --slow-rate 0.05
+
+第二阶段模拟方舟整段故障，对比有无熔断时失败请求的耗时与服务端压力。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import uvicorn
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.llm.ark_client import ArkChatClient, ArkChatContentPart, ArkChatTurn  # noqa: E402
+from app.llm.resilience import CircuitBreaker, RetryPolicy  # noqa: E402
+from fake_ark_server import FakeArkConfig, build_app  # noqa: E402
+
+
+_TURNS = [ArkChatTurn(role="user", content=[ArkChatContentPart(type="input_text", text="ping")])]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _run(client: ArkChatClient, calls: int, concurrency: int) -> tuple[int, list[float], list[float]]:
+    sem = asyncio.Semaphore(concurrency)
+    ok_lat: list[float] = []
+    fail_lat: list[float] = []
+
+    async def one() -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await client.chat(_TURNS)
+                ok_lat.append(time.perf_counter() - t0)
+            except Exception:
+                fail_lat.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return len(ok_lat), ok_lat, fail_lat
+
+
+async def _main(args: argparse.Namespace) -> int:
+    port = _free_port()
+    cfg = FakeArkConfig(first_token_ms=args.base_ms, token_ms=0.0, chars_per_token=10_000, seed=7)
+    server = uvicorn.Server(uvicorn.Config(build_app(cfg), host="127.0.0.1", port=port, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    base_url = f"http://127.0.0.1:{port}"
+
+    configs = {
+        "no-retry": {},
+        "retry": {"retry": RetryPolicy(max_attempts=args.attempts, base_s=0.05, max_s=1.0)},
+        "retry+hedge": {
+            "retry": RetryPolicy(max_attempts=args.attempts, base_s=0.05, max_s=1.0),
+            "hedge_quantile": 0.95,
+            "hedge_min_delay_s": args.base_ms * 2 / 1000,
+        },
+    }
+    try:
+        print(
+            f"faults: error_rate={args.error_rate} rate_limit_rate={args.rate_limit_rate} "
+            f"slow_rate={args.slow_rate} slow_ms={args.slow_ms} base_ms={args.base_ms}"
+        )
+        print(f"{'config':>12} {'success':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'server_reqs':>11} {'hedges':>7}")
+        for name, kwargs in configs.items():
+            cfg.error_rate, cfg.rate_limit_rate = args.error_rate, args.rate_limit_rate
+            cfg.slow_rate, cfg.slow_ms = args.slow_rate, args.slow_ms
+            cfg.counters["requests"] = 0
+            client = ArkChatClient(base_url=base_url, api_key="fake", model="fake", **kwargs)
+            try:
+                ok, lat, _ = await _run(client, args.calls, args.concurrency)
+            finally:
+                await client.aclose()
+            print(
+                f"{name:>12} {ok / args.calls:>8.1%} {_pct(lat, 0.5) * 1000:>8.1f} {_pct(lat, 0.95) * 1000:>8.1f} "
+                f"{_pct(lat, 0.99) * 1000:>8.1f} {cfg.counters['requests']:>11} {client.stats()['hedges']:>7}"
+            )
+
+        print(f"\noutage: {args.calls} calls while every request returns 503")
+        print(f"{'config':>12} {'fail_mean_ms':>12} {'server_reqs':>11} {'rejected':>8}")
+        cfg.outage = True
+        for name, breaker in (("no-breaker", None), ("breaker", CircuitBreaker(failure_threshold=5, reset_s=30.0))):
+            cfg.counters["requests"] = 0
+            client = ArkChatClient(
+                base_url=base_url,
+                api_key="fake",
+                model="fake",
+                retry=RetryPolicy(max_attempts=args.attempts, base_s=0.05, max_s=1.0),
+                breaker=breaker,
+            )
+            try:
+                _, _, fail = await _run(client, args.calls, args.concurrency)
+            finally:
+                await client.aclose()
+            rejected = breaker.rejected if breaker is not None else 0
+            print(f"{name:>12} {statistics.mean(fail) * 1000:>12.1f} {cfg.counters['requests']:>11} {rejected:>8}")
+    finally:
+        server.should_exit = True
+        await serve
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--attempts", type=int, default=3)
+    parser.add_argument("--base-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.15)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-ms", type=float, default=3000.0)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,239 @@
+"""
+流式 ASR 接入基准：多个课堂、每课堂多个发言人按实时节奏推 PCM，经 VolcengineAsrWsClient 送到本地假 ASR 服务，
+统计“一句话说完 -> 定稿分句交给发言写入回调”的延迟分位，以及 feed_audio 在实时帧 ack 路径上的耗时。
+
+假 ASR 服务（tests/fake_asr_server.py）在本进程内启动，不需要网络与 Redis（需要 pip install websockets）：
+    python tests/bench_asr_ingest.py
+    python tests/bench_asr_ingest.py --sessions 20 --speakers 5 --duration-s 15 --latency-ms 300
+    python tests/bench_asr_ingest.py --drop-after-s 4   # 连接周期性断开，验证自动重连
+    python tests/bench_asr_ingest.py --drop-after-s 3 --replay   # 断线后从 PCM 环形缓冲补发未定稿的音频
+    python tests/bench_asr_ingest.py --vad --silence-s 3   # 说 speech-s 秒停 silence-s 秒，经 VAD 丢弃静音后再送 ASR
+
+发言帧为谐波信号，停顿为低电平噪声；--silence-s 0（默认）为一直在说。开启 --vad 时关注 connects（段落之间
+连接应保持）与延迟：假服务对每段末尾的拖尾静音按 end_window_size 判停。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import random
+import socket
+import struct
+import sys
+import time
+from pathlib import Path
+
+import uvicorn
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.asr_client import AsrConfig, AsrResult, AsrSpeaker, VolcengineAsrWsClient  # noqa: E402
+from app.multimodal.audio_buffer import SessionAudioBuffer  # noqa: E402
+from app.multimodal.vad import VadBatcher, VadConfig, VoiceActivityDetector  # noqa: E402
+from tests.fake_asr_server import FakeAsrConfig, build_app  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+def _frames(args: argparse.Namespace, rnd: random.Random) -> tuple[list[bytes], list[bytes]]:
+    """预先合成若干发言帧（谐波，约 -18 dBFS）与停顿帧（约 -70 dBFS 的噪声）。"""
+    n = args.sample_rate * args.frame_ms // 1000
+    pitch = rnd.uniform(120.0, 260.0)
+    speech, silence = [], []
+    for k in range(8):
+        samples = []
+        for i in range(n):
+            phase = 2 * math.pi * pitch * (k * n + i) / args.sample_rate
+            samples.append(int(4000 * sum(math.sin(h * phase) / h for h in range(1, 5))))
+        speech.append(struct.pack(f"<{n}h", *samples))
+        silence.append(struct.pack(f"<{n}h", *(int(rnd.gauss(0, 8)) for _ in range(n))))
+    return speech, silence
+
+
+async def _speaker(
+    client: VolcengineAsrWsClient,
+    audio: SessionAudioBuffer | None,
+    vad: VadBatcher | None,
+    session_id: str,
+    speaker: AsrSpeaker,
+    args: argparse.Namespace,
+    start_at: float,
+    feed_costs: list[float],
+) -> None:
+    rnd = random.Random(f"{session_id}/{speaker.user_id}")
+    speech, silence = _frames(args, rnd)
+    interval = args.frame_ms / 1000
+    frames = int(args.duration_s / interval)
+    cycle = args.speech_s + args.silence_s
+    # 各发言人的停顿错开
+    phase = rnd.uniform(0, cycle) if args.silence_s > 0 else 0.0
+    for i in range(frames):
+        delay = start_at + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        t0 = time.perf_counter()
+        # 帧在采集满 frame_ms 后发出，timestamp 为这段音频的起点
+        ts = time.time() - interval
+        talking = args.silence_s <= 0 or (i * interval + phase) % cycle < args.speech_s
+        frame = (speech if talking else silence)[i % 8]
+        if vad is not None:
+            vad.submit(session_id, speaker.user_id, ts, frame, False, (client, speaker, audio))
+        else:
+            if audio is not None:
+                audio.write(speaker.user_id, ts, frame)
+            client.feed_audio(memoryview(frame), speaker=speaker, timestamp=ts, is_last=False)
+        feed_costs.append(time.perf_counter() - t0)
+
+
+def _forward_speech(target, audio, timestamp: float, is_last: bool) -> None:
+    # 与 AppContext._forward_speech 一致：先写缓冲再送 ASR
+    client, speaker, buffer = target
+    if buffer is not None:
+        buffer.write(speaker.user_id, timestamp, audio)
+    client.feed_audio(audio, speaker=speaker, timestamp=timestamp, is_last=is_last)
+
+
+async def _main(args: argparse.Namespace) -> int:
+    port = _free_port()
+    server_cfg = FakeAsrConfig(
+        utterance_ms=args.utterance_ms,
+        latency_ms=args.latency_ms,
+        drop_after_s=args.drop_after_s,
+    )
+    server = uvicorn.Server(
+        uvicorn.Config(build_app(server_cfg), host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+    )
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    config = AsrConfig(
+        url=f"ws://127.0.0.1:{port}/api/v3/sauc/bigmodel",
+        sample_rate=args.sample_rate,
+        reconnect_base_s=0.1,
+        reconnect_max_s=1.0,
+        end_window_ms=max(200, args.hangover_ms - 100) if args.vad else 0,
+    )
+    latencies: list[float] = []
+
+    async def on_result(session_id: str, speaker: AsrSpeaker, result: AsrResult) -> None:
+        # 端到端：这句话最后一帧音频的时间戳 -> 定稿分句到达发言写入回调
+        latencies.append(time.time() - result.end_time)
+
+    buffers = [
+        SessionAudioBuffer(max_bytes=args.speakers * 20 * args.sample_rate * 2, sample_rate=args.sample_rate)
+        if args.replay
+        else None
+        for _ in range(args.sessions)
+    ]
+    clients = [
+        VolcengineAsrWsClient(
+            session_id=f"bench-asr-{i}",
+            config=config,
+            on_result=on_result,
+            audio_source=buf.view if buf is not None else None,
+        )
+        for i, buf in enumerate(buffers)
+    ]
+    for c in clients:
+        await c.connect()
+
+    vad = (
+        VadBatcher(
+            VoiceActivityDetector(VadConfig(sample_rate=args.sample_rate, hangover_ms=args.hangover_ms)),
+            _forward_speech,
+            batch_ms=20.0,
+        )
+        if args.vad
+        else None
+    )
+    feed_costs: list[float] = []
+    start_at = time.perf_counter() + 0.2
+    tasks = [
+        _speaker(
+            c,
+            buffers[i],
+            vad,
+            c.session_id,
+            AsrSpeaker(user_id=f"stu-{j}", user_name=f"学生{j}", role="student"),
+            args,
+            start_at + (i * args.speakers + j) / (args.sessions * args.speakers) * args.frame_ms / 1000,
+            feed_costs,
+        )
+        for i, c in enumerate(clients)
+        for j in range(args.speakers)
+    ]
+    cpu_started = time.process_time()
+    await asyncio.gather(*tasks)
+    if vad is not None:
+        vad.flush()
+    close_started = time.perf_counter()
+    await asyncio.gather(*(c.close() for c in clients))
+    close_s = time.perf_counter() - close_started
+    cpu = time.process_time() - cpu_started
+
+    server.should_exit = True
+    await server_task
+
+    stats: dict[str, int] = {}
+    for c in clients:
+        for k, v in c.stats().items():
+            if isinstance(v, int):
+                stats[k] = stats.get(k, 0) + v
+    latencies.sort()
+    feed_costs.sort()
+    streams = args.sessions * args.speakers
+    print(
+        f"sessions={args.sessions} speakers/session={args.speakers} frame_ms={args.frame_ms} "
+        f"duration_s={args.duration_s} utterance_ms={args.utterance_ms} server_latency_ms={args.latency_ms} "
+        f"drop_after_s={args.drop_after_s} replay={args.replay} vad={args.vad} "
+        f"speech_s={args.speech_s} silence_s={args.silence_s}"
+    )
+    print(
+        f"utterances={len(latencies)} p50={_percentile(latencies, 50) * 1000:.1f}ms "
+        f"p99={_percentile(latencies, 99) * 1000:.1f}ms max={(latencies[-1] if latencies else 0) * 1000:.1f}ms "
+        f"close_s={close_s:.2f}"
+    )
+    print(
+        f"feed_audio p50={_percentile(feed_costs, 50) * 1e6:.1f}us p99={_percentile(feed_costs, 99) * 1e6:.1f}us "
+        f"cpu_per_stream={cpu / streams / args.duration_s * 100:.2f}% of a core"
+    )
+    if vad is not None:
+        vs = vad.stats()
+        print(f"vad drop={vs['drop_ratio'] * 100:.1f}% segments={vs['segments']}")
+    print(f"client={stats} server={server_cfg.counters}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--speakers", type=int, default=4)
+    parser.add_argument("--duration-s", type=float, default=10.0)
+    parser.add_argument("--frame-ms", type=int, default=100)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--utterance-ms", type=float, default=2000.0)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--drop-after-s", type=float, default=0.0)
+    parser.add_argument("--replay", action="store_true", help="每课堂配 SessionAudioBuffer，断线重连时补发")
+    parser.add_argument("--vad", action="store_true", help="PCM 先经 VAD（与应用相同的攒批与转发），静音不送 ASR")
+    parser.add_argument("--hangover-ms", type=int, default=400)
+    parser.add_argument("--speech-s", type=float, default=2.5, help="每次连续发言的时长")
+    parser.add_argument("--silence-s", type=float, default=0.0, help="两次发言之间的停顿，0 为一直在说")
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
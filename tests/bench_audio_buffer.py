@@ -0,0 +1,141 @@
+"""
+音频缓冲内存基准：大量课堂同时推 PCM 时，每课堂的常驻内存、写入耗时与按时间截取片段的耗时（不需要 Redis）。
+
+对比两种保留“最近 N 秒音频”的做法（保留时长与内存上限相同）：
+- deque：每路一个 deque(maxlen)，逐帧保存 bytes 对象；截取片段需要 join 拷贝
+- ring：SessionAudioBuffer（每路预分配 bytearray 环形缓冲，超出路数复用最久未发言的一路）；截取片段返回 memoryview
+
+课堂时长按时间戳快进模拟，内存用 tracemalloc 统计：
+    python tests/bench_audio_buffer.py
+    python tests/bench_audio_buffer.py --classrooms 500 --active 3 --seconds 60 --frame-ms 20 --max-mb 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from collections import deque
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.multimodal.audio_buffer import SessionAudioBuffer  # noqa: E402
+
+
+class _DequeBuffer:
+    def __init__(self, *, max_bytes: int, track_seconds: float, frame_ms: int, sample_rate: int) -> None:
+        self._maxlen = int(track_seconds * 1000 / frame_ms)
+        self._max_tracks = max(1, max_bytes // int(track_seconds * sample_rate * 2))
+        self._tracks: dict[str, deque] = {}
+
+    def write(self, user_id: str, timestamp: float, audio: bytes) -> None:
+        track = self._tracks.get(user_id)
+        if track is None:
+            if len(self._tracks) >= self._max_tracks:
+                self._tracks.pop(next(iter(self._tracks)))
+            track = self._tracks[user_id] = deque(maxlen=self._maxlen)
+        else:
+            # 保持最近写入的在末尾，与 ring 的淘汰顺序一致
+            self._tracks[user_id] = self._tracks.pop(user_id)
+        track.append((timestamp, bytes(audio)))
+
+    def clip(self, user_id: str, start_ts: float, end_ts: float) -> bytes:
+        return b"".join(a for ts, a in self._tracks.get(user_id, ()) if start_ts <= ts < end_ts)
+
+
+def _run(args: argparse.Namespace, mode: str) -> dict:
+    max_bytes = int(args.max_mb * 1024 * 1024)
+    frame = memoryview(bytes(args.sample_rate * 2 * args.frame_ms // 1000))
+    if mode == "ring":
+        buffers = [
+            SessionAudioBuffer(max_bytes=max_bytes, track_seconds=args.track_seconds, sample_rate=args.sample_rate)
+            for _ in range(args.classrooms)
+        ]
+    else:
+        buffers = [
+            _DequeBuffer(
+                max_bytes=max_bytes,
+                track_seconds=args.track_seconds,
+                frame_ms=args.frame_ms,
+                sample_rate=args.sample_rate,
+            )
+            for _ in range(args.classrooms)
+        ]
+
+    frames = int(args.seconds * 1000 / args.frame_ms)
+    step = args.frame_ms / 1000
+    writes = 0
+    write_s = 0.0
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    for i in range(frames):
+        ts = 1_700_000_000.0 + i * step
+        # 每个时刻只有 active 个发言人在说话，每 turn_s 秒换一人（模拟课堂上的轮流发言）
+        turn = int(i * step / args.turn_s)
+        speakers = [f"stu-{(turn + k) % args.speakers}" for k in range(args.active)]
+        started = time.perf_counter()
+        for buf in buffers:
+            for uid in speakers:
+                buf.write(uid, ts, frame)
+        write_s += time.perf_counter() - started
+        writes += len(buffers) * len(speakers)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    end_ts = 1_700_000_000.0 + frames * step
+    uid = f"stu-{int((frames - 1) * step / args.turn_s) % args.speakers}"
+    clips = min(len(buffers), 500)
+    started = time.perf_counter()
+    clip_bytes = 0
+    for buf in buffers[:clips]:
+        if mode == "ring":
+            _, views = buf.view(uid, end_ts - args.clip_s, end_ts)
+            clip_bytes += sum(len(v) for v in views)
+        else:
+            clip_bytes += len(buf.clip(uid, end_ts - args.clip_s, end_ts))
+    clip_s = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "mem_mb": (current - base) / 1024 / 1024,
+        "peak_mb": (peak - base) / 1024 / 1024,
+        "per_class_mb": (current - base) / 1024 / 1024 / args.classrooms,
+        "write_us": write_s / writes * 1e6,
+        "clip_us": clip_s / clips * 1e6,
+        "clip_kb": clip_bytes / clips / 1024,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--classrooms", type=int, default=500)
+    parser.add_argument("--speakers", type=int, default=40)
+    parser.add_argument("--active", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--turn-s", type=float, default=30.0, help="每隔多少秒换一个发言人")
+    parser.add_argument("--frame-ms", type=int, default=100)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--track-seconds", type=float, default=20.0)
+    parser.add_argument("--max-mb", type=float, default=2.0)
+    parser.add_argument("--clip-s", type=float, default=5.0)
+    parser.add_argument("--modes", nargs="+", choices=["deque", "ring"], default=["deque", "ring"])
+    args = parser.parse_args()
+
+    print(
+        f"classrooms={args.classrooms} speakers={args.speakers} active={args.active} seconds={args.seconds} "
+        f"frame_ms={args.frame_ms} track_seconds={args.track_seconds} max_mb/class={args.max_mb}"
+    )
+    for mode in args.modes:
+        res = _run(args, mode)
+        print(
+            f"{res['mode']:<6} mem={res['mem_mb']:>8.1f}MB peak={res['peak_mb']:>8.1f}MB "
+            f"per_class={res['per_class_mb']:.2f}MB write={res['write_us']:.2f}us/frame "
+            f"clip({args.clip_s:g}s)={res['clip_us']:.2f}us ({res['clip_kb']:.0f}KB)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,80 @@
+"""
+指令回复流式基准：在进程内启动 tests/fake_ark_server.py 的假方舟服务，
+对比非流式 command_reply 与流式 command_reply_stream 的首字延迟（TTFT）与总耗时。不需要网络与 Redis：
+    python tests/bench_command_stream.py --first-token-ms 800 --token-ms 30 --rounds 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import uvicorn
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.core.summarization import LlmSummarizer  # noqa: E402
+from app.llm.ark_client import ArkChatClient  # noqa: E402
+from fake_ark_server import FakeArkConfig, build_app  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _main(args: argparse.Namespace) -> int:
+    port = _free_port()
+    cfg = FakeArkConfig(first_token_ms=args.first_token_ms, token_ms=args.token_ms)
+    server = uvicorn.Server(uvicorn.Config(build_app(cfg), host="127.0.0.1", port=port, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    client = ArkChatClient(base_url=f"http://127.0.0.1:{port}", api_key="fake", model="fake")
+    summarizer = LlmSummarizer(client)
+    kwargs = {"instruction": "请给我一段课中提醒话术", "image_url": None, "context_text": "[teacher][张老师] 今天学习一般现在时"}
+    try:
+        blocking: list[float] = []
+        ttft: list[float] = []
+        total: list[float] = []
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            await summarizer.command_reply(**kwargs)
+            blocking.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            first = None
+            async for _delta in summarizer.command_reply_stream(**kwargs):
+                if first is None:
+                    first = time.perf_counter() - t0
+            total.append(time.perf_counter() - t0)
+            ttft.append(first or 0.0)
+
+        print(f"rounds={args.rounds} first_token_ms={args.first_token_ms} token_ms={args.token_ms}")
+        print(f"non-stream   first_text_ms={statistics.median(blocking) * 1000:>8.1f} total_ms={statistics.median(blocking) * 1000:>8.1f}")
+        print(f"stream       first_text_ms={statistics.median(ttft) * 1000:>8.1f} total_ms={statistics.median(total) * 1000:>8.1f}")
+    finally:
+        await client.aclose()
+        server.should_exit = True
+        await serve
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--first-token-ms", type=float, default=800.0)
+    parser.add_argument("--token-ms", type=float, default=30.0)
+    parser.add_argument("--rounds", type=int, default=5)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+"""
+事实编码基准：用一节 45 分钟课堂的模拟数据（发言 + 阶段总结 + 课后报告），
+对比各 FactCodec 配置的存储体积与编解码吞吐。纯进程内运行，不需要 Redis：
+    python tests/bench_fact_codec.py --minutes 45 --students 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.infra.codec import CodecError, FactCodec  # noqa: E402
+
+
+_SENTENCES = [
+    "今天我们学习一般现在时，主语是第三人称单数时动词要加 s。",
+    "老师我不太懂第三人称单数要不要加s？",
+    "He plays football every Sunday.",
+    "请大家翻到第三十二页，看第二题。",
+    "好的",
+    "明白了",
+    "我觉得这里应该用 does 而不是 do。",
+    "大家注意，否定句要借助助动词 doesn't，后面的动词用原形。",
+]
+
+
+def _classroom(session_id: str, minutes: int, students: int, seed: int = 7) -> tuple[list[dict], list[dict], dict]:
+    rnd = random.Random(seed)
+    t0 = 1730000000.0
+    utterances: list[dict] = []
+    ts = t0
+    end = t0 + minutes * 60
+    while ts < end:
+        ts += rnd.uniform(1.0, 4.0)
+        if rnd.random() < 0.55:
+            user_id, user_name, role = "t_1", "张老师", "teacher"
+        else:
+            k = rnd.randrange(students)
+            user_id, user_name, role = f"stu_{k}", f"学生{k}", "student"
+        utterances.append(
+            {
+                "session_id": session_id,
+                "user_id": user_id,
+                "user_name": user_name,
+                "role": role,
+                "text": rnd.choice(_SENTENCES),
+                "start_time": ts,
+                "end_time": ts,
+                "timestamp": ts,
+                "confidence": 1.0,
+            }
+        )
+
+    stage_summaries: list[dict] = []
+    for i in range(minutes // 2):
+        stage_summaries.append(
+            {
+                "timestamp": t0 + (i + 1) * 120,
+                "summary": "本阶段老师讲解了一般现在时第三人称单数的变化规则，并通过例句练习巩固。" * 3,
+                "knowledge_points": ["一般现在时", "第三人称单数", "助动词 does"],
+                "classroom_insights": ["学生提问积极", "部分学生对否定句结构仍有疑问"],
+                "window": {"start_ts_exclusive": t0 + i * 120, "end_ts_inclusive": t0 + (i + 1) * 120},
+            }
+        )
+
+    report = {
+        "session_id": session_id,
+        "timestamp": end,
+        "result": {
+            "summary": "本节课围绕一般现在时展开，重点讲解了第三人称单数动词变化与否定句、疑问句结构。" * 12,
+            "knowledge_points": [f"知识点{i}：一般现在时相关用法" for i in range(20)],
+            "homework_suggestion": [f"作业{i}：完成练习册第{i}页" for i in range(10)],
+            "classroom_report": {
+                "participation_overview": "全班共有 30 名学生，其中 24 名学生至少发言一次。" * 5,
+                "focus_overview": "课堂前半段专注度较高，后半段有所下降。" * 5,
+                "highlights": [f"亮点{i}：学生主动举例说明" for i in range(8)],
+            },
+        },
+    }
+    return utterances, stage_summaries, report
+
+
+def _bench(codec: FactCodec, session_id: str, records: list[dict], rounds: int) -> tuple[int, float, float]:
+    encoded = [codec.encode(r, session_id=session_id) for r in records]
+    size = sum(len(e.encode("utf-8") if isinstance(e, str) else e) for e in encoded)
+
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for r in records:
+            codec.encode(r, session_id=session_id)
+    enc_us = (time.perf_counter() - t0) / (rounds * len(records)) * 1e6
+
+    raw = [e.encode("utf-8") if isinstance(e, str) else e for e in encoded]
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for e in raw:
+            codec.decode(e, session_id=session_id)
+    dec_us = (time.perf_counter() - t0) / (rounds * len(records)) * 1e6
+
+    for r, e in zip(records, raw):
+        if codec.decode(e, session_id=session_id) != r:
+            raise CodecError("round-trip mismatch")
+    return size, enc_us, dec_us
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutes", type=int, default=45)
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    session_id = "sess_bench_0001"
+    utterances, stage_summaries, report = _classroom(session_id, args.minutes, args.students)
+    print(f"classroom: {args.minutes}min utterances={len(utterances)} stage_summaries={len(stage_summaries)} report=1")
+
+    configs = [("json", "none"), ("json", "zlib"), ("msgpack", "none"), ("msgpack", "zlib"), ("msgpack", "zstd")]
+    baseline: int | None = None
+    print(f"{'codec':>14} {'utter_bytes':>12} {'stage_bytes':>12} {'report_bytes':>12} {'total':>10} {'ratio':>6} {'enc_us':>8} {'dec_us':>8}")
+    for fmt, compress in configs:
+        try:
+            codec = FactCodec(fmt, compress=compress)
+        except CodecError as e:
+            print(f"{fmt + '+' + compress:>14} skipped: {e}")
+            continue
+        u_size, enc_us, dec_us = _bench(codec, session_id, utterances, args.rounds)
+        s_size, _, _ = _bench(codec, session_id, stage_summaries, 1)
+        r_size, _, _ = _bench(codec, session_id, [report], 1)
+        total = u_size + s_size + r_size
+        baseline = baseline or total
+        print(
+            f"{fmt + '+' + compress:>14} {u_size:>12,} {s_size:>12,} {r_size:>12,} {total:>10,} "
+            f"{total / baseline:>6.2f} {enc_us:>8.2f} {dec_us:>8.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
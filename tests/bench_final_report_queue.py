@@ -0,0 +1,158 @@
+"""
+课后报告任务队列基准：模拟整点大量课堂同时下课，验证多进程 worker 下的吞吐、无重复执行、失败重试与崩溃接管。
+
+每个 worker 是独立进程，运行 JobWorkerPool + RedisJobQueue，报告生成用固定延迟的假 handler 代替
+（--error-rate 按比例抛异常以触发重试 / 死信）。请使用独立的 Redis DB：
+    python tests/bench_final_report_queue.py --redis-url redis://localhost:6379/15 --workers 1 2 4
+    python tests/bench_final_report_queue.py --workers 3 --kill-after 2 --visibility-s 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+from redis.asyncio import Redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.job_workers import JobWorkerPool  # noqa: E402
+from app.infra.redis_job_queue import Job, RedisJobQueue  # noqa: E402
+
+
+def _queue(r: Redis, args: argparse.Namespace, name: str) -> RedisJobQueue:
+    return RedisJobQueue(
+        r,
+        name=name,
+        visibility_s=args.visibility_s,
+        max_attempts=args.max_attempts,
+        retry_base_s=args.retry_base_s,
+        result_ttl_s=600,
+    )
+
+
+async def _worker_main(args: argparse.Namespace, name: str) -> None:
+    r = Redis.from_url(args.redis_url, decode_responses=False)
+    queue = _queue(r, args, name)
+    done_key = f"bench:{name}:done"
+
+    async def handler(job: Job, progress) -> None:
+        await progress({"phase": "mapping"})
+        await asyncio.sleep(args.latency_s * random.uniform(0.5, 1.5))
+        if random.random() < args.error_rate:
+            raise RuntimeError("injected failure")
+        await r.hincrby(done_key, job.job_id, 1)
+
+    pool = JobWorkerPool(queue=queue, handler=handler, concurrency=args.concurrency, poll_interval_s=0.2)
+    pool.start()
+    try:
+        while not await r.exists(f"bench:{name}:stop"):
+            await asyncio.sleep(0.2)
+    finally:
+        await pool.stop()
+        await r.aclose()
+
+
+def _worker_entry(args: argparse.Namespace, name: str) -> None:
+    asyncio.run(_worker_main(args, name))
+
+
+async def _run_once(args: argparse.Namespace, workers: int) -> dict:
+    r = Redis.from_url(args.redis_url, decode_responses=False)
+    name = f"bench{int(time.time() * 1000)}"
+    queue = _queue(r, args, name)
+    job_ids = [f"s{i}" for i in range(args.jobs)]
+
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=_worker_entry, args=(args, name)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    await asyncio.sleep(1.0)
+    started = time.perf_counter()
+    try:
+        for jid in job_ids:
+            await queue.enqueue(jid)
+        # 模拟同一课堂被重复 end：不应产生重复任务
+        for jid in job_ids[:10]:
+            await queue.enqueue(jid)
+
+        killed = False
+        while True:
+            elapsed = time.perf_counter() - started
+            if args.kill_after is not None and not killed and elapsed >= args.kill_after:
+                procs[0].kill()
+                killed = True
+                print(f"  killed worker pid={procs[0].pid} at t={elapsed:.1f}s")
+            statuses = [await queue.status(jid) for jid in job_ids]
+            finished = [s for s in statuses if s and s["status"] in ("done", "dead")]
+            if len(finished) == len(job_ids) or elapsed > args.timeout_s:
+                break
+            await asyncio.sleep(0.2)
+        elapsed = time.perf_counter() - started
+
+        executed = {k.decode(): int(v) for k, v in (await r.hgetall(f"bench:{name}:done")).items()}
+        status_count: dict[str, int] = {}
+        for s in statuses:
+            key = s["status"] if s else "missing"
+            status_count[key] = status_count.get(key, 0) + 1
+        retried = sum(1 for s in statuses if s and s["attempts"] > 1)
+    finally:
+        await r.set(f"bench:{name}:stop", 1)
+        for p in procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.kill()
+        keys = [k async for k in r.scan_iter(match=f"jobs:{name}:*", count=1000)]
+        keys += [k async for k in r.scan_iter(match=f"bench:{name}:*", count=1000)]
+        if keys:
+            await r.delete(*keys)
+        await r.aclose()
+
+    return {
+        "workers": workers,
+        "elapsed_s": elapsed,
+        "per_s": len(job_ids) / elapsed,
+        "statuses": status_count,
+        "retried_jobs": retried,
+        "duplicates": sum(c - 1 for c in executed.values() if c > 1),
+    }
+
+
+async def _main(args: argparse.Namespace) -> int:
+    print(
+        f"jobs={args.jobs} latency_s={args.latency_s} concurrency/worker={args.concurrency} "
+        f"error_rate={args.error_rate} max_attempts={args.max_attempts} visibility_s={args.visibility_s}"
+    )
+    for n in args.workers:
+        res = await _run_once(args, n)
+        print(
+            f"workers={res['workers']:>2} elapsed_s={res['elapsed_s']:>7.2f} jobs_per_s={res['per_s']:>7.1f} "
+            f"statuses={res['statuses']} retried_jobs={res['retried_jobs']} duplicates={res['duplicates']}"
+        )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--jobs", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-s", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--retry-base-s", type=float, default=0.2)
+    parser.add_argument("--visibility-s", type=float, default=5.0)
+    parser.add_argument("--kill-after", type=float, default=None)
+    parser.add_argument("--timeout-s", type=float, default=120.0)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
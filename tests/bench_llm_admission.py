@@ -0,0 +1,129 @@
+"""
+LLM 准入控制基准：模拟整点下课高峰——大量课后报告、阶段总结与少量教师指令同时打到方舟。
+假方舟服务（tests/fake_ark_server.py）并发超过 --provider-concurrency 时返回 429。
+对比无准入控制（只靠重试）与开启准入控制时的 429 数、失败数与各类端到端耗时。不需要网络与 Redis：
+    python tests/bench_llm_admission.py --finals 200 --stages 100 --commands 20 --provider-concurrency 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import socket
+import sys
+import time
+from pathlib import Path
+
+import uvicorn
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.llm.admission import PRIORITY_COMMAND, PRIORITY_FINAL, PRIORITY_STAGE, LlmAdmissionController  # noqa: E402
+from app.llm.ark_client import ArkChatClient, ArkChatContentPart, ArkChatTurn  # noqa: E402
+from app.llm.resilience import RetryPolicy  # noqa: E402
+from fake_ark_server import FakeArkConfig, build_app  # noqa: E402
+
+
+_TURNS = [ArkChatTurn(role="user", content=[ArkChatContentPart(type="input_text", text="课堂发言记录" * 50)])]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _burst(client: ArkChatClient, args: argparse.Namespace) -> dict[str, tuple[list[float], int]]:
+    results: dict[str, tuple[list[float], int]] = {p: ([], 0) for p in (PRIORITY_COMMAND, PRIORITY_STAGE, PRIORITY_FINAL)}
+
+    async def one(priority: str, delay_s: float) -> None:
+        await asyncio.sleep(delay_s)
+        t0 = time.perf_counter()
+        try:
+            await client.chat(_TURNS, priority=priority)
+            results[priority][0].append(time.perf_counter() - t0)
+        except Exception:
+            lat, failed = results[priority]
+            results[priority] = (lat, failed + 1)
+
+    jobs = [one(PRIORITY_FINAL, 0.0) for _ in range(args.finals)]
+    jobs += [one(PRIORITY_STAGE, 0.0) for _ in range(args.stages)]
+    # 教师指令在高峰开始后陆续到达
+    jobs += [one(PRIORITY_COMMAND, 0.05 + i * 0.05) for i in range(args.commands)]
+    await asyncio.gather(*jobs)
+    return results
+
+
+async def _main(args: argparse.Namespace) -> int:
+    port = _free_port()
+    cfg = FakeArkConfig(
+        first_token_ms=args.base_ms,
+        token_ms=0.0,
+        chars_per_token=10_000,
+        max_concurrency=args.provider_concurrency,
+        retry_after_s=0.5,
+    )
+    server = uvicorn.Server(uvicorn.Config(build_app(cfg), host="127.0.0.1", port=port, log_level="warning"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    print(
+        f"burst: finals={args.finals} stages={args.stages} commands={args.commands} "
+        f"provider_concurrency={args.provider_concurrency} base_ms={args.base_ms}"
+    )
+    try:
+        for name, admission in (
+            ("no-admission", None),
+            ("admission", LlmAdmissionController(max_concurrency=args.provider_concurrency)),
+        ):
+            cfg.counters["requests"] = cfg.counters["rate_limited"] = 0
+            client = ArkChatClient(
+                base_url=f"http://127.0.0.1:{port}",
+                api_key="fake",
+                model="fake",
+                retry=RetryPolicy(max_attempts=3, base_s=0.2, max_s=2.0),
+                admission=admission,
+            )
+            t0 = time.perf_counter()
+            try:
+                results = await _burst(client, args)
+            finally:
+                await client.aclose()
+            wall = time.perf_counter() - t0
+            print(f"\n[{name}] wall_s={wall:.2f} server_reqs={cfg.counters['requests']} 429s={cfg.counters['rate_limited']}")
+            print(f"{'class':>8} {'ok':>5} {'failed':>6} {'p50_ms':>8} {'p95_ms':>8} {'max_ms':>8}")
+            for priority, (lat, failed) in results.items():
+                print(
+                    f"{priority:>8} {len(lat):>5} {failed:>6} {_pct(lat, 0.5) * 1000:>8.0f} "
+                    f"{_pct(lat, 0.95) * 1000:>8.0f} {max(lat, default=0.0) * 1000:>8.0f}"
+                )
+            if admission is not None:
+                for priority, s in admission.stats()["classes"].items():
+                    print(f"{priority:>8} queue_wait_avg_s={s['queue_wait_avg_s']} queue_wait_max_s={s['queue_wait_max_s']}")
+    finally:
+        server.should_exit = True
+        await serve
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--finals", type=int, default=200)
+    parser.add_argument("--stages", type=int, default=100)
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--provider-concurrency", type=int, default=16)
+    parser.add_argument("--base-ms", type=float, default=200.0)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
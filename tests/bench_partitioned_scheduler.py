@@ -0,0 +1,152 @@
+"""
+多进程阶段总结调度基准：验证租约切分下无重复总结、吞吐随 worker 数线性增长、worker 挂掉后被接管。
+
+每个 worker 是独立进程，运行带 RedisSessionLeaseManager 的 StageSummaryScheduler，
+LLM 用固定延迟的假 summarizer 代替。请使用独立的 Redis DB：
+    python tests/bench_partitioned_scheduler.py --redis-url redis://localhost:6379/15 --workers 1 2 4
+    python tests/bench_partitioned_scheduler.py --workers 3 --kill-after 5 --duration 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from redis.asyncio import Redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.schedulers import StageSummaryScheduler  # noqa: E402
+from app.core.settings import Settings  # noqa: E402
+from app.core.summarization import StageSummary  # noqa: E402
+from app.infra.redis_fact_store import RedisFactStore  # noqa: E402
+from app.infra.redis_session_lease import RedisSessionLeaseManager  # noqa: E402
+
+
+class _FakeSummarizer:
+    def __init__(self, r: Redis, counter_key: str, worker_id: str, latency_s: float) -> None:
+        self._r = r
+        self._counter_key = counter_key
+        self._worker_id = worker_id
+        self._latency_s = latency_s
+
+    async def summarize_stage(self, *, utterances_text: str, course_meta_text: str | None = None) -> StageSummary:
+        await asyncio.sleep(self._latency_s)
+        await self._r.hincrby(self._counter_key, self._worker_id, 1)
+        return StageSummary(timestamp=time.time(), summary="bench", knowledge_points=[], classroom_insights=[])
+
+
+async def _worker_main(args: argparse.Namespace, counter_key: str, trigger: str) -> None:
+    r = Redis.from_url(args.redis_url, decode_responses=False)
+    cfg = Settings(
+        ark_api_key="bench",
+        stage_summary_min_interval_s=1,
+        stage_summary_min_chars=10,
+        stage_summary_tick_interval_s=args.tick_s,
+        stage_summary_concurrency=args.concurrency,
+        stage_summary_trigger=trigger,
+    )
+    leases = RedisSessionLeaseManager(r, ttl_s=args.lease_ttl_s, namespace=f"bench{os.getppid()}")
+    summarizer = _FakeSummarizer(r, counter_key, leases.worker_id, args.llm_latency_s)
+    scheduler = StageSummaryScheduler(store=RedisFactStore(r), summarizer=summarizer, settings=cfg, leases=leases)  # type: ignore[arg-type]
+    scheduler.start()
+    try:
+        await asyncio.sleep(args.duration + 5)
+    finally:
+        await scheduler.stop()
+        await r.aclose()
+
+
+def _worker_entry(args: argparse.Namespace, counter_key: str, trigger: str) -> None:
+    asyncio.run(_worker_main(args, counter_key, trigger))
+
+
+async def _feed(store: RedisFactStore, session_ids: list[str], seconds: float) -> None:
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        ts = time.time()
+        for sid in session_ids:
+            await store.append_utterance(
+                sid, ts, {"role": "teacher", "user_name": "bench", "text": f"utterance {ts}", "timestamp": ts}
+            )
+        await asyncio.sleep(0.5)
+
+
+async def _run_once(args: argparse.Namespace, workers: int) -> dict:
+    r = Redis.from_url(args.redis_url, decode_responses=False)
+    store = RedisFactStore(r)
+    prefix = f"benchp_{int(time.time() * 1000)}_"
+    counter_key = f"bench:{prefix}:summaries"
+    session_ids = [f"{prefix}{i}" for i in range(args.sessions)]
+    for sid in session_ids:
+        await store.init_classroom(sid, {"session_id": sid})
+
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=_worker_entry, args=(args, counter_key, args.trigger)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    try:
+        feed = asyncio.create_task(_feed(store, session_ids, args.duration))
+        if args.kill_after is not None:
+            await asyncio.sleep(args.kill_after)
+            procs[0].kill()
+            print(f"  killed worker pid={procs[0].pid} at t={args.kill_after}s")
+        await feed
+
+        per_worker = {k.decode(): int(v) for k, v in (await r.hgetall(counter_key)).items()}
+        duplicates = 0
+        for sid in session_ids:
+            windows = Counter(s["window"]["start_ts_exclusive"] for s in await store.list_stage_summaries(sid))
+            duplicates += sum(c - 1 for c in windows.values() if c > 1)
+    finally:
+        for sid in session_ids:
+            await store.set_status(sid, "ENDED")
+        for p in procs:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.kill()
+        keys = [k async for k in r.scan_iter(match=f"class:{prefix}*", count=1000)]
+        if keys:
+            await r.delete(*keys)
+        await r.delete(counter_key)
+        await r.aclose()
+
+    total = sum(per_worker.values())
+    return {"workers": workers, "total": total, "per_s": total / args.duration, "per_worker": per_worker, "duplicates": duplicates}
+
+
+async def _main(args: argparse.Namespace) -> int:
+    print(f"sessions={args.sessions} llm_latency_s={args.llm_latency_s} concurrency/worker={args.concurrency} trigger={args.trigger}")
+    for n in args.workers:
+        res = await _run_once(args, n)
+        spread = sorted(res["per_worker"].values())
+        print(
+            f"workers={res['workers']:>2} summaries={res['total']:>6} per_s={res['per_s']:>8.1f} "
+            f"duplicates={res['duplicates']} per_worker={spread}"
+        )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--llm-latency-s", type=float, default=0.5)
+    parser.add_argument("--tick-s", type=float, default=0.5)
+    parser.add_argument("--lease-ttl-s", type=float, default=3.0)
+    parser.add_argument("--trigger", choices=["poll", "event"], default="poll")
+    parser.add_argument("--kill-after", type=float, default=None)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,156 @@
+"""
+/classroom/realtime 帧处理基准：每帧服务端 CPU 耗时、单核帧率与线上字节数（不需要 Redis 与网络）。
+
+服务端路径（--mock-text-ratio 比例的帧带 mock_text，会构造发言记录并按 FactCodec 编码一次）：
+- json_legacy：json.loads -> model_validate -> base64 解码 -> UtteranceFact -> model_dump -> 编码 -> ack json.dumps
+- json：model_validate_json -> base64 解码 -> utterance_from_frame -> 编码 -> 预编码 ack
+- binary：decode_audio_frame（音频为 memoryview）-> feed_audio -> utterance_from_frame -> 编码 -> 预编码 ack
+
+    python tests/bench_realtime_frames.py
+    python tests/bench_realtime_frames.py --frame-ms 20 40 100 --frames 20000 --mock-text-ratio 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.asr_client import VolcengineAsrWsClient  # noqa: E402
+from app.core.realtime_frames import (  # noqa: E402
+    decode_audio_frame,
+    encode_ack,
+    encode_audio_frame,
+    utterance_from_frame,
+)
+from app.infra.codec import FactCodec  # noqa: E402
+from app.schema.classroom import RealtimeAudioFrame, UtteranceFact  # noqa: E402
+
+
+def _mock_text(i: int, ratio: float) -> str | None:
+    return f"第{i}句发言内容" if ratio > 0 and i % max(1, round(1 / ratio)) == 0 else None
+
+
+def _json_frames(n: int, audio: bytes, ratio: float) -> list[str]:
+    chunk = base64.b64encode(audio).decode("ascii")
+    frames = []
+    for i in range(n):
+        data = {
+            "session_id": "bench-session-0001",
+            "user_id": f"stu-{i % 40}",
+            "user_name": f"学生{i % 40}",
+            "role": "student",
+            "timestamp": 1_700_000_000.0 + i * 0.02,
+            "audio_chunk": chunk,
+        }
+        text = _mock_text(i, ratio)
+        if text:
+            data["mock_text"] = text
+        frames.append(json.dumps(data, ensure_ascii=False))
+    return frames
+
+
+def _binary_frames(n: int, audio: bytes, ratio: float) -> list[bytes]:
+    return [
+        encode_audio_frame(
+            session_id="bench-session-0001",
+            user_id=f"stu-{i % 40}",
+            user_name=f"学生{i % 40}",
+            role="student",
+            timestamp=1_700_000_000.0 + i * 0.02,
+            seq=i,
+            audio=audio,
+            mock_text=_mock_text(i, ratio),
+        )
+        for i in range(n)
+    ]
+
+
+def _run_json_legacy(frames: list[str], asr: VolcengineAsrWsClient, codec: FactCodec) -> float:
+    started = time.process_time()
+    for raw in frames:
+        frame = RealtimeAudioFrame.model_validate(json.loads(raw))
+        _ = asr.validate_audio_chunk(frame.audio_chunk)
+        if frame.mock_text:
+            fact = UtteranceFact(
+                session_id=frame.session_id,
+                user_id=frame.user_id,
+                user_name=frame.user_name,
+                role=frame.role,
+                text=frame.mock_text,
+                start_time=frame.timestamp,
+                end_time=frame.timestamp,
+                timestamp=frame.timestamp,
+                confidence=1.0,
+            )
+            codec.encode(fact.model_dump(), session_id=frame.session_id)
+        json.dumps({"ok": True, "timestamp": time.time()}, ensure_ascii=False)
+    return time.process_time() - started
+
+
+def _run_json(frames: list[str], asr: VolcengineAsrWsClient, codec: FactCodec) -> float:
+    started = time.process_time()
+    for raw in frames:
+        frame = RealtimeAudioFrame.model_validate_json(raw)
+        _ = asr.validate_audio_chunk(frame.audio_chunk)
+        if frame.mock_text:
+            codec.encode(utterance_from_frame(frame), session_id=frame.session_id)
+        encode_ack(time.time())
+    return time.process_time() - started
+
+
+def _run_binary(frames: list[bytes], asr: VolcengineAsrWsClient, codec: FactCodec) -> float:
+    started = time.process_time()
+    for raw in frames:
+        frame = decode_audio_frame(raw)
+        asr.feed_audio(frame.audio, codec=frame.codec)
+        if frame.mock_text:
+            codec.encode(utterance_from_frame(frame), session_id=frame.session_id)
+        encode_ack(time.time(), frame.seq)
+    return time.process_time() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frame-ms", type=int, nargs="+", default=[20, 40, 100])
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--mock-text-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    asr = VolcengineAsrWsClient(session_id="bench")
+    codec = FactCodec()
+    print(
+        f"pcm_s16le mono {args.sample_rate}Hz, frames={args.frames}, "
+        f"mock_text_ratio={args.mock_text_ratio}, best of {args.repeat}"
+    )
+    for ms in args.frame_ms:
+        audio = os.urandom(args.sample_rate * 2 * ms // 1000)
+        json_frames = _json_frames(args.frames, audio, args.mock_text_ratio)
+        bin_frames = _binary_frames(args.frames, audio, args.mock_text_ratio)
+        runs = [
+            ("json_legacy", _run_json_legacy, json_frames, len(json_frames[0].encode("utf-8"))),
+            ("json", _run_json, json_frames, len(json_frames[0].encode("utf-8"))),
+            ("binary", _run_binary, bin_frames, len(bin_frames[0])),
+        ]
+        print(f"frame={ms}ms audio={len(audio)}B")
+        baseline = None
+        for name, fn, frames, wire in runs:
+            t = min(fn(frames, asr, codec) for _ in range(args.repeat))
+            baseline = baseline or t
+            print(
+                f"  {name:<12} {t / args.frames * 1e6:>7.2f}us/frame {args.frames / t:>9.0f} frames/s/core "
+                f"{wire:>5}B/frame  x{baseline / t:.2f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,169 @@
+"""
+realtime 流水线模式基准：高 RTT 链路上单个客户端能达到的帧率，对比逐帧应答（stop-and-wait）与累计 ack + 在途窗口。
+
+链路用两条带固定单向延迟（RTT / 2）的进程内队列模拟，服务端处理每帧耗时 --handle-us（不需要 Redis 与网络）。
+流水线模式使用 app.core.realtime_pipeline.PipelinedIngest，客户端保证未 ack 帧数不超过 window。
+
+    python tests/bench_realtime_pipeline.py
+    python tests/bench_realtime_pipeline.py --rtt-ms 20 100 300 --window 64 256 --ack-every 20 --ack-ms 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.realtime_frames import encode_ack  # noqa: E402
+from app.core.realtime_pipeline import PipelinedIngest  # noqa: E402
+
+
+class _Link:
+    """单向链路：send 之后 delay_s 才能被对端 recv 到，保持发送顺序。"""
+
+    def __init__(self, delay_s: float) -> None:
+        self._delay_s = delay_s
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self.messages = 0
+
+    async def send(self, item) -> None:
+        self.messages += 1
+        asyncio.get_running_loop().call_later(self._delay_s, self._queue.put_nowait, item)
+
+    async def recv(self):
+        return await self._queue.get()
+
+
+def _handler(handle_us: int):
+    counter = [0]
+
+    async def handle(frame) -> int:
+        if handle_us:
+            end = time.perf_counter() + handle_us / 1e6
+            while time.perf_counter() < end:
+                pass
+        await asyncio.sleep(0)
+        counter[0] += 1
+        return counter[0]
+
+    return handle
+
+
+async def _stop_and_wait(args: argparse.Namespace, rtt_ms: int) -> dict:
+    up, down = _Link(rtt_ms / 2000), _Link(rtt_ms / 2000)
+    handle = _handler(args.handle_us)
+
+    async def server() -> None:
+        while True:
+            frame = await up.recv()
+            if frame is None:
+                return
+            await handle(frame)
+            await down.send(encode_ack(time.time(), frame.seq))
+
+    task = asyncio.create_task(server())
+    started = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - started < args.duration_s:
+        await up.send(SimpleNamespace(seq=sent))
+        sent += 1
+        await down.recv()
+    elapsed = time.perf_counter() - started
+    await up.send(None)
+    await task
+    return {"frames": sent, "fps": sent / elapsed, "acks": down.messages}
+
+
+async def _pipelined(args: argparse.Namespace, rtt_ms: int, window: int) -> dict:
+    up, down = _Link(rtt_ms / 2000), _Link(rtt_ms / 2000)
+    pipeline = PipelinedIngest(
+        handle=_handler(args.handle_us),
+        send=down.send,
+        window=window,
+        ack_every=args.ack_every,
+        ack_ms=args.ack_ms,
+    )
+
+    async def server() -> None:
+        pipeline.start()
+        while True:
+            frame = await up.recv()
+            if frame is None:
+                await pipeline.close()
+                return
+            await pipeline.submit(frame)
+
+    acked = -1
+    sent = 0
+    slot = asyncio.Event()
+
+    async def client_rx() -> None:
+        nonlocal acked
+        while True:
+            msg = json.loads(await down.recv())
+            if not msg.get("ok"):
+                raise RuntimeError(msg)
+            acked = msg["ack"]
+            slot.set()
+
+    task = asyncio.create_task(server())
+    rx = asyncio.create_task(client_rx())
+    started = time.perf_counter()
+    while time.perf_counter() - started < args.duration_s:
+        if sent - 1 - acked >= window:
+            slot.clear()
+            await slot.wait()
+            continue
+        await up.send(SimpleNamespace(seq=sent))
+        sent += 1
+        if sent % 64 == 0:
+            await asyncio.sleep(0)
+    while acked < sent - 1:
+        slot.clear()
+        await slot.wait()
+    elapsed = time.perf_counter() - started
+    await up.send(None)
+    await task
+    rx.cancel()
+    return {"frames": sent, "fps": sent / elapsed, "acks": down.messages}
+
+
+async def _main(args: argparse.Namespace) -> int:
+    print(
+        f"handle_us={args.handle_us} duration_s={args.duration_s} "
+        f"ack_every={args.ack_every} ack_ms={args.ack_ms}"
+    )
+    for rtt in args.rtt_ms:
+        base = await _stop_and_wait(args, rtt)
+        print(
+            f"rtt={rtt:>4}ms stop_and_wait        frames={base['frames']:>7} fps={base['fps']:>9.1f} "
+            f"acks/frame={base['acks'] / max(1, base['frames']):.3f}"
+        )
+        for window in args.window:
+            res = await _pipelined(args, rtt, window)
+            print(
+                f"rtt={rtt:>4}ms pipelined window={window:<4} frames={res['frames']:>7} fps={res['fps']:>9.1f} "
+                f"acks/frame={res['acks'] / max(1, res['frames']):.3f} x{res['fps'] / base['fps']:.1f}"
+            )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtt-ms", type=int, nargs="+", default=[20, 100, 300])
+    parser.add_argument("--window", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--ack-every", type=int, default=20)
+    parser.add_argument("--ack-ms", type=int, default=100)
+    parser.add_argument("--handle-us", type=int, default=30)
+    parser.add_argument("--duration-s", type=float, default=3.0)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,235 @@
+"""
+实时接入并发基准：大量学生流同时推帧时的 ack 延迟分布（p50 / p99 / max），对比会话注册表与帧处理的新旧实现。
+
+- legacy：每帧经全局 asyncio.Lock 查找会话，并在 session.lock 内完成状态检查与发言写入（跨 Redis I/O 持锁）
+- current：ClassroomSessionManager.lookup 无锁读 + AppContext.handle_realtime_audio_frame（不持锁，enter/leave 计数）
+
+每条流按 --interval-ms 匀速推二进制帧，延迟按“计划到达时间 -> ack”计算（包含事件循环排队）。
+--writer direct 时发言逐条直写 Redis（放大持锁跨 I/O 的影响），write_behind 时走 UtteranceWriteBehind。
+请使用独立的 Redis DB：
+    python tests/bench_realtime_sessions.py --redis-url redis://localhost:6379/15
+    python tests/bench_realtime_sessions.py --streams 5000 --streams-per-class 50 --duration-s 10 --writer direct
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+
+from redis.asyncio import BlockingConnectionPool, Redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.app_context import AppContext  # noqa: E402
+from app.core.asr_client import VolcengineAsrWsClient  # noqa: E402
+from app.core.classroom_session_manager import ClassroomSessionManager  # noqa: E402
+from app.core.realtime_frames import decode_audio_frame, encode_ack, encode_audio_frame, utterance_from_frame  # noqa: E402
+from app.infra.redis_fact_store import RedisFactStore  # noqa: E402
+from app.infra.utterance_write_behind import UtteranceWriteBehind  # noqa: E402
+
+
+@dataclass
+class _LegacySession:
+    session_id: str
+    status: str = "RUNNING"
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    asr: VolcengineAsrWsClient | None = None
+
+
+class _LegacySessionManager:
+    """改造前的注册表：所有课堂共享一把全局锁。"""
+
+    def __init__(self) -> None:
+        self._sessions: dict[str, _LegacySession] = {}
+        self._lock = asyncio.Lock()
+
+    async def create(self, session_id: str) -> _LegacySession:
+        async with self._lock:
+            s = _LegacySession(session_id=session_id)
+            self._sessions[session_id] = s
+            return s
+
+    async def get(self, session_id: str) -> _LegacySession:
+        async with self._lock:
+            s = self._sessions.get(session_id)
+            if s is None:
+                raise ValueError(f"session not found: {session_id}")
+            return s
+
+
+class _NoopScheduler:
+    def on_utterance(self, session_id: str, utterance: dict) -> None:
+        return None
+
+
+async def _legacy_handle(ctx: SimpleNamespace, frame) -> None:
+    session = await ctx.session_manager.get(frame.session_id)
+    async with session.lock:
+        if session.status != "RUNNING":
+            raise RuntimeError(f"classroom not running: {frame.session_id}")
+        if session.asr is None:
+            session.asr = VolcengineAsrWsClient(session_id=frame.session_id)
+            await session.asr.connect()
+        session.asr.feed_audio(frame.audio, codec=frame.codec)
+        if frame.mock_text:
+            utterance = utterance_from_frame(frame)
+            await ctx.utterance_writer.append(frame.session_id, frame.timestamp, utterance)
+            ctx.stage_scheduler.on_utterance(frame.session_id, utterance)
+
+
+async def _current_handle(ctx: SimpleNamespace, frame) -> None:
+    await AppContext.handle_realtime_audio_frame(ctx, frame)
+
+
+def _percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+async def _stream(
+    ctx: SimpleNamespace,
+    handle,
+    *,
+    session_id: str,
+    user_id: str,
+    audio: bytes,
+    args: argparse.Namespace,
+    start_at: float,
+    latencies: list[float],
+    errors: list[int],
+) -> None:
+    interval = args.interval_ms / 1000
+    every = max(1, round(1 / args.mock_text_ratio)) if args.mock_text_ratio > 0 else 0
+    frames = int(args.duration_s / interval)
+    for i in range(frames):
+        planned = start_at + i * interval
+        delay = planned - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        raw = encode_audio_frame(
+            session_id=session_id,
+            user_id=user_id,
+            user_name=user_id,
+            role="student",
+            timestamp=time.time(),
+            seq=i,
+            audio=audio,
+            mock_text=f"{user_id} 第{i}句" if every and i % every == 0 else None,
+        )
+        try:
+            frame = decode_audio_frame(raw)
+            await handle(ctx, frame)
+            encode_ack(time.time(), frame.seq)
+        except Exception:
+            errors[0] += 1
+        latencies.append(time.perf_counter() - planned)
+
+
+async def _run_once(args: argparse.Namespace, r: Redis, impl: str, writer_mode: str) -> dict:
+    store = RedisFactStore(r)
+    writer = UtteranceWriteBehind(store, flush_ms=args.flush_ms)
+    if writer_mode == "write_behind":
+        writer.start()
+    manager = _LegacySessionManager() if impl == "legacy" else ClassroomSessionManager()
+    ctx = SimpleNamespace(
+        session_manager=manager,
+        utterance_writer=writer,
+        stage_scheduler=_NoopScheduler(),
+        context_cache=None,
+    )
+    handle = _legacy_handle if impl == "legacy" else _current_handle
+
+    prefix = f"bench{int(time.time() * 1000)}"
+    classes = max(1, args.streams // args.streams_per_class)
+    session_ids = [f"{prefix}-c{c}" for c in range(classes)]
+    for sid in session_ids:
+        session = await manager.create(sid)
+        session.asr = VolcengineAsrWsClient(session_id=sid)
+
+    audio = os.urandom(args.sample_rate * 2 * args.interval_ms // 1000)
+    latencies: list[float] = []
+    errors = [0]
+    start_at = time.perf_counter() + 0.5
+    tasks = [
+        asyncio.create_task(
+            _stream(
+                ctx,
+                handle,
+                session_id=session_ids[i % classes],
+                user_id=f"stu-{i}",
+                audio=audio,
+                args=args,
+                # 各流的起始相位均匀错开，模拟真实到达
+                start_at=start_at + (i / args.streams) * args.interval_ms / 1000,
+                latencies=latencies,
+                errors=errors,
+            )
+        )
+        for i in range(args.streams)
+    ]
+    cpu_started = time.process_time()
+    await asyncio.gather(*tasks)
+    cpu = time.process_time() - cpu_started
+    await writer.close()
+
+    for sid in session_ids:
+        await r.delete(f"class:{sid}:utterances", f"class:{sid}:utterances:stream")
+
+    latencies.sort()
+    return {
+        "frames": len(latencies),
+        "errors": errors[0],
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        "cpu_s": cpu,
+    }
+
+
+async def _main(args: argparse.Namespace) -> int:
+    # 直写模式下新实现不再按课堂串行，并发写入数由连接池上限约束（两种实现使用同一上限）
+    r = Redis(connection_pool=BlockingConnectionPool.from_url(args.redis_url, max_connections=args.redis_connections))
+    print(
+        f"streams={args.streams} classes={max(1, args.streams // args.streams_per_class)} "
+        f"interval_ms={args.interval_ms} duration_s={args.duration_s} mock_text_ratio={args.mock_text_ratio}"
+    )
+    try:
+        for writer_mode in args.writer:
+            for impl in args.impl:
+                res = await _run_once(args, r, impl, writer_mode)
+                print(
+                    f"writer={writer_mode:<12} impl={impl:<8} frames={res['frames']:>7} errors={res['errors']:>3} "
+                    f"p50={res['p50_ms']:>8.2f}ms p99={res['p99_ms']:>8.2f}ms max={res['max_ms']:>8.2f}ms "
+                    f"cpu_s={res['cpu_s']:.2f}"
+                )
+    finally:
+        await r.aclose()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--streams", type=int, default=5000)
+    parser.add_argument("--streams-per-class", type=int, default=50)
+    parser.add_argument("--interval-ms", type=int, default=200)
+    parser.add_argument("--duration-s", type=float, default=10.0)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--mock-text-ratio", type=float, default=0.2)
+    parser.add_argument("--redis-connections", type=int, default=64)
+    parser.add_argument("--flush-ms", type=int, default=20)
+    parser.add_argument("--writer", nargs="+", choices=["direct", "write_behind"], default=["direct", "write_behind"])
+    parser.add_argument("--impl", nargs="+", choices=["legacy", "current"], default=["legacy", "current"])
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,99 @@
+"""
+RUNNING 课堂索引基准：对比旧的 KEYS + 逐个 HGETALL 与 RedisFactStore.list_running_sessions。
+
+用法（请使用独立的 Redis DB，脚本结束会清理自己写入的 key）：
+    python tests/bench_running_index.py --redis-url redis://localhost:6379/15 --history 10000 --running 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from redis.asyncio import Redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.infra.redis_fact_store import RedisFactStore  # noqa: E402
+
+
+async def _legacy_list_running(r: Redis, store: RedisFactStore) -> list[str]:
+    keys = await r.keys("class:*:progress")
+    out: list[str] = []
+    for k in keys:
+        if isinstance(k, (bytes, bytearray)):
+            k = k.decode("utf-8", errors="replace")
+        parts = str(k).split(":")
+        if len(parts) < 3:
+            continue
+        prog = await store.get_progress(parts[1])
+        if prog.status == "RUNNING":
+            out.append(parts[1])
+    return out
+
+
+async def _seed(store: RedisFactStore, prefix: str, start: int, count: int, status: str) -> None:
+    for i in range(start, start + count):
+        session_id = f"{prefix}{i}"
+        await store.init_classroom(session_id, {"session_id": session_id})
+        if status != "RUNNING":
+            await store.set_status(session_id, status)
+
+
+async def _timeit(fn, rounds: int) -> tuple[float, int]:
+    n = 0
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        n = len(await fn())
+    return (time.perf_counter() - t0) / rounds * 1000, n
+
+
+async def _cleanup(r: Redis, prefix: str) -> None:
+    async for k in r.scan_iter(match=f"class:{prefix}*", count=1000):
+        await r.delete(k)
+    members = await r.smembers(RedisFactStore._k_running())
+    stale = [m for m in members if (m.decode() if isinstance(m, bytes) else m).startswith(prefix)]
+    if stale:
+        await r.srem(RedisFactStore._k_running(), *stale)
+
+
+async def _main(args: argparse.Namespace) -> int:
+    r = Redis.from_url(args.redis_url, decode_responses=False)
+    store = RedisFactStore(r)
+    prefix = f"bench_{int(time.time())}_"
+    try:
+        await _seed(store, prefix, 0, args.running, "RUNNING")
+        seeded = 0
+        print(f"{'history':>8} {'legacy_ms':>10} {'index_ms':>10} {'running':>8}")
+        for target in sorted({0, *args.steps, args.history}):
+            if target > args.history:
+                continue
+            await _seed(store, prefix, args.running + seeded, target - seeded, "ENDED")
+            seeded = target
+            legacy_ms, n1 = await _timeit(lambda: _legacy_list_running(r, store), args.rounds)
+            index_ms, n2 = await _timeit(store.list_running_sessions, args.rounds)
+            print(f"{target:>8} {legacy_ms:>10.2f} {index_ms:>10.2f} {n2:>8}")
+            if n1 < n2:
+                print(f"  warn: legacy found {n1} < index {n2}")
+    finally:
+        await _cleanup(r, prefix)
+        await r.aclose()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--history", type=int, default=10000)
+    parser.add_argument("--running", type=int, default=300)
+    parser.add_argument("--steps", type=int, nargs="*", default=[1000, 5000])
+    parser.add_argument("--rounds", type=int, default=5)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
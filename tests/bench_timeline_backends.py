@@ -0,0 +1,103 @@
+"""
+时间线后端基准：对比 ZsetTimeline 与 StreamTimeline 的批量写入、阶段总结窗口读取、全量读取与内存占用。
+
+请使用独立的 Redis DB：
+    python tests/bench_timeline_backends.py --redis-url redis://localhost:6379/15 --utterances 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from redis.asyncio import Redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.infra.redis_fact_store import RedisFactStore  # noqa: E402
+from app.infra.timeline import build_timeline  # noqa: E402
+
+
+def _utterances(session_id: str, n: int, t0: float) -> list[tuple[float, dict]]:
+    out: list[tuple[float, dict]] = []
+    for i in range(n):
+        ts = t0 + i * 0.001
+        out.append(
+            (
+                ts,
+                {
+                    "session_id": session_id,
+                    "user_id": f"stu_{i % 40}",
+                    "user_name": f"学生{i % 40}",
+                    "role": "student" if i % 5 else "teacher",
+                    "text": "好的" if i % 7 == 0 else f"第{i}句：我们来看一下这道题的第三人称单数用法。",
+                    "start_time": ts,
+                    "end_time": ts,
+                    "timestamp": ts,
+                    "confidence": 1.0,
+                },
+            )
+        )
+    return out
+
+
+async def _bench_backend(r: Redis, backend: str, args: argparse.Namespace) -> None:
+    store = RedisFactStore(r, timeline=build_timeline(backend, stream_maxlen=args.utterances * 2))
+    session_id = f"bencht_{int(time.time() * 1000)}_{backend}"
+    items = _utterances(session_id, args.utterances, time.time())
+    key = store._k_utterances(session_id)
+    try:
+        start = time.perf_counter()
+        for i in range(0, len(items), args.batch):
+            await store.append_utterances(session_id, items[i : i + args.batch])
+        write_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        total = 0
+        for k in range(args.reads):
+            idx = k * 37 % max(1, len(items) - 121)
+            lo, hi = items[idx][0], items[idx + 120][0] if len(items) > 121 else items[-1][0]
+            total += len(await store.list_utterances(session_id, start_ts_exclusive=lo, end_ts_inclusive=hi, limit=120))
+        window_ms = (time.perf_counter() - start) / args.reads * 1000
+
+        start = time.perf_counter()
+        full = await store.list_utterances(session_id, start_ts_exclusive=0.0, limit=args.utterances * 2)
+        full_ms = (time.perf_counter() - start) * 1000
+
+        mem = None if args.skip_memory else await r.memory_usage(key, samples=0)
+        print(
+            f"{backend:>6} stored={len(full):>6} write_per_s={len(items) / write_s:>10,.0f} "
+            f"window_read_ms={window_ms:>7.2f} (avg {total / args.reads:.0f} items) full_read_ms={full_ms:>8.2f} "
+            f"memory_bytes={mem}"
+        )
+    finally:
+        await r.delete(key, f"class:{session_id}:progress")
+
+
+async def _main(args: argparse.Namespace) -> int:
+    r = Redis.from_url(args.redis_url, decode_responses=False)
+    try:
+        for backend in args.backends:
+            await _bench_backend(r, backend, args)
+    finally:
+        await r.aclose()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--backends", nargs="+", default=["zset", "stream"])
+    parser.add_argument("--utterances", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--skip-memory", action="store_true", help="服务端不支持 MEMORY USAGE 时使用")
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
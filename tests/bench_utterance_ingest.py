@@ -0,0 +1,93 @@
+"""
+发言写入吞吐基准：单个 Redis 连接上，逐条 append_utterance（每帧一次往返）vs UtteranceWriteBehind 批量刷盘。
+
+模拟 --streams 路并发学生流，每路顺序写入 --per-stream 条发言，请使用独立的 Redis DB：
+    python tests/bench_utterance_ingest.py --redis-url redis://localhost:6379/15 --streams 200 --per-stream 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+from redis.asyncio import BlockingConnectionPool, Redis
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.infra.redis_fact_store import RedisFactStore  # noqa: E402
+from app.infra.utterance_write_behind import UtteranceWriteBehind  # noqa: E402
+
+
+def _utterance(session_id: str, stream: int, i: int) -> tuple[float, dict]:
+    ts = time.time()
+    return ts, {
+        "session_id": session_id,
+        "user_id": f"stu_{stream}",
+        "user_name": f"学生{stream}",
+        "role": "student",
+        "text": f"第{i}句：老师我不太懂第三人称单数要不要加s？",
+        "start_time": ts,
+        "end_time": ts,
+        "timestamp": ts,
+        "confidence": 1.0,
+    }
+
+
+async def _run(append, args: argparse.Namespace, prefix: str) -> float:
+    async def _stream(k: int) -> None:
+        session_id = f"{prefix}{k % args.sessions}"
+        for i in range(args.per_stream):
+            ts, u = _utterance(session_id, k, i)
+            await append(session_id, ts, u)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[_stream(k) for k in range(args.streams)])
+    return time.perf_counter() - t0
+
+
+async def _main(args: argparse.Namespace) -> int:
+    pool = BlockingConnectionPool.from_url(args.redis_url, max_connections=1)
+    r = Redis(connection_pool=pool, decode_responses=False)
+    store = RedisFactStore(r)
+    total = args.streams * args.per_stream
+    try:
+        prefix = f"benchi_{int(time.time())}_direct_"
+        dt = await _run(store.append_utterance, args, prefix)
+        print(f"direct       items={total} elapsed={dt:.3f}s per_s={total / dt:,.0f}")
+
+        prefix = f"benchi_{int(time.time())}_batched_"
+        writer = UtteranceWriteBehind(store, flush_ms=args.flush_ms, batch_size=args.batch_size)
+        writer.start()
+        t0 = time.perf_counter()
+        ack_dt = await _run(writer.append, args, prefix)
+        await writer.close()
+        dt = time.perf_counter() - t0
+        print(
+            f"write-behind items={total} acked_in={ack_dt:.3f}s durable_in={dt:.3f}s per_s={total / dt:,.0f} "
+            f"stats={writer.stats()}"
+        )
+    finally:
+        keys = [k async for k in r.scan_iter(match="class:benchi_*", count=1000)]
+        if keys:
+            await r.delete(*keys)
+        await r.aclose()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--per-stream", type=int, default=50)
+    parser.add_argument("--flush-ms", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=256)
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
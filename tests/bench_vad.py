@@ -0,0 +1,171 @@
+"""
+VAD 基准：模拟大量学生流（大部分时间静音、偶尔发言，背景噪声各不相同），统计 VAD 丢弃的音频比例、
+语音帧召回率、每路 CPU 占用（不需要 Redis 与网络）。
+
+合成音频：发言为带音节包络的谐波信号；背景为各路不同电平的白噪声或低频“风扇”噪声，夹杂少量纸张摩擦类的
+高过零率噪声。对比：
+- per-frame：每帧单独调用一次（VAD_BATCH_MS=0）
+- batched：同一时刻各路的帧攒成一批（VAD_BATCH_MS>0 时的行为）
+- fixed：关闭噪声底自适应（只用绝对能量阈值），看自适应阈值对高噪声路的作用
+
+    python tests/bench_vad.py
+    python tests/bench_vad.py --streams 400 --seconds 60 --frame-ms 40 --backends python numpy
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import struct
+import sys
+from dataclasses import replace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.multimodal.vad import VadConfig, VoiceActivityDetector, np  # noqa: E402
+
+
+def _pack(samples: list[float]) -> bytes:
+    return struct.pack(f"<{len(samples)}h", *(max(-32768, min(32767, int(s))) for s in samples))
+
+
+def _noise(n: int, rnd: random.Random, *, db: float, lowpass: float = 0.0) -> list[float]:
+    out, y = [], 0.0
+    for _ in range(n):
+        y = lowpass * y + (1 - lowpass) * rnd.gauss(0, 1)
+        out.append(y)
+    rms = math.sqrt(sum(v * v for v in out) / n) or 1.0
+    scale = 32768 * 10 ** (db / 20) / rms
+    return [v * scale for v in out]
+
+
+def _speech(n: int, rnd: random.Random, *, sample_rate: int, db: float, pitch: float) -> list[float]:
+    # 5 个谐波 + 约 4Hz 的音节包络（音节之间有短暂停顿），音高缓慢漂移
+    amp = 32768 * 10 ** (db / 20)
+    syllable = rnd.uniform(3.5, 5.0)
+    out = []
+    phase = 0.0
+    for i in range(n):
+        t = i / sample_rate
+        f0 = pitch * (1 + 0.08 * math.sin(2 * math.pi * 0.7 * t))
+        phase += 2 * math.pi * f0 / sample_rate
+        env = max(0.0, math.sin(2 * math.pi * syllable * t)) ** 0.6
+        out.append(amp * env * sum(math.sin(h * phase) / h for h in range(1, 6)))
+    return out
+
+
+def _build_pool(args: argparse.Namespace, rnd: random.Random) -> dict[str, list[bytes]]:
+    """预先合成若干帧，按类型随机取用；发言取自连续的语音轨，保证包络连续。"""
+    n = args.sample_rate * args.frame_ms // 1000
+    track_frames = int(args.speech_pool_s * 1000 / args.frame_ms)
+    pool: dict[str, list[bytes]] = {}
+    for name, db, lowpass in (("quiet", -65.0, 0.0), ("room", -55.0, 0.0), ("fan", -42.0, 0.97)):
+        pool[name] = [_pack(_noise(n, rnd, db=db, lowpass=lowpass)) for _ in range(args.pool_frames)]
+    pool["rustle"] = [_pack(_noise(n, rnd, db=-38.0)) for _ in range(args.pool_frames)]
+    for name, pitch in (("speech_lo", 130.0), ("speech_hi", 230.0)):
+        voice = _speech(n * track_frames, rnd, sample_rate=args.sample_rate, db=-22.0, pitch=pitch)
+        bg = _noise(n * track_frames, rnd, db=-58.0)
+        mixed = [v + b for v, b in zip(voice, bg)]
+        pool[name] = [_pack(mixed[i * n : (i + 1) * n]) for i in range(track_frames)]
+    return pool
+
+
+def _schedule(args: argparse.Namespace, rnd: random.Random, pool: dict[str, list[bytes]]):
+    """每路的逐帧音频与标注：(audio, is_speech)。第 0 路是老师（发言多），其余学生偶尔发言。"""
+    frames = int(args.seconds * 1000 / args.frame_ms)
+    per_s = 1000 / args.frame_ms
+    streams = []
+    for s in range(args.streams):
+        bg = rnd.choices(("quiet", "room", "fan"), weights=(3, 5, 2))[0]
+        voice = pool[rnd.choice(("speech_lo", "speech_hi"))]
+        talk_share = 0.6 if s == 0 else args.talk_share
+        seq: list[tuple[bytes, bool]] = []
+        while len(seq) < frames:
+            if rnd.random() < talk_share:
+                length = int(rnd.uniform(1.0, 6.0) * per_s)
+                start = rnd.randrange(len(voice))
+                seq.extend((voice[(start + i) % len(voice)], True) for i in range(length))
+            else:
+                length = int(rnd.uniform(2.0, 15.0) * per_s)
+                for _ in range(length):
+                    kind = "rustle" if rnd.random() < args.rustle_share else bg
+                    seq.append((rnd.choice(pool[kind]), False))
+        streams.append(seq[:frames])
+    return streams
+
+
+def _run(args: argparse.Namespace, streams, *, backend: str, batched: bool, adaptive: bool) -> dict:
+    cfg = VadConfig(sample_rate=args.sample_rate, hangover_ms=args.hangover_ms, snr_db=args.snr_db)
+    if not adaptive:
+        cfg = replace(cfg, noise_rise_db_per_s=0.0, noise_init_db=-200.0)
+    det = VoiceActivityDetector(cfg, backend=backend)
+    frames = len(streams[0])
+    step = args.frame_ms / 1000
+    speech = speech_kept = silence = silence_kept = 0
+    for i in range(frames):
+        ts = 1_700_000_000.0 + i * step
+        items = [("bench", f"u{s}", ts, streams[s][i][0], False) for s in range(len(streams))]
+        if batched:
+            outs = det.process(items)
+        else:
+            outs = [det.process([item])[0] for item in items]
+        for s, out in enumerate(outs):
+            kept = any(t == ts for t, _, _ in out)
+            if streams[s][i][1]:
+                speech += 1
+                speech_kept += kept
+            else:
+                silence += 1
+                silence_kept += kept
+    stats = det.stats()
+    return {
+        **stats,
+        "speech_recall": speech_kept / speech if speech else 0.0,
+        "silence_passed": silence_kept / silence if silence else 0.0,
+        "speech_share": speech / (speech + silence),
+        "us_per_frame": stats["busy_s"] / stats["frames_in"] * 1e6,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--frame-ms", type=int, default=100)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--talk-share", type=float, default=0.1, help="学生每次轮到时开口的概率")
+    parser.add_argument("--rustle-share", type=float, default=0.02, help="静音帧中纸张摩擦类噪声的比例")
+    parser.add_argument("--hangover-ms", type=int, default=400)
+    parser.add_argument("--snr-db", type=float, default=10.0)
+    parser.add_argument("--pool-frames", type=int, default=32)
+    parser.add_argument("--speech-pool-s", type=float, default=8.0)
+    parser.add_argument("--backends", nargs="+", choices=["python", "numpy"], default=None)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    backends = args.backends or (["python", "numpy"] if np is not None else ["python"])
+    rnd = random.Random(args.seed)
+    pool = _build_pool(args, rnd)
+    streams = _schedule(args, rnd, pool)
+    print(
+        f"streams={args.streams} seconds={args.seconds} frame_ms={args.frame_ms} "
+        f"hangover_ms={args.hangover_ms} snr_db={args.snr_db} numpy={'yes' if np is not None else 'no'}"
+    )
+    runs = [(b, batched, True) for b in backends for batched in (False, True)]
+    runs.append((backends[-1], True, False))
+    for backend, batched, adaptive in runs:
+        res = _run(args, streams, backend=backend, batched=batched, adaptive=adaptive)
+        label = f"{backend}/{'batched' if batched else 'per-frame'}{'' if adaptive else '/fixed'}"
+        print(
+            f"{label:<24} drop={res['drop_ratio'] * 100:5.1f}% (speech share {res['speech_share'] * 100:.1f}%) "
+            f"speech_recall={res['speech_recall'] * 100:5.1f}% silence_passed={res['silence_passed'] * 100:5.1f}% "
+            f"segments={res['segments']} cpu/stream={res['cpu_per_stream'] * 100:.3f}% of a core "
+            f"({res['us_per_frame']:.1f}us/frame)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
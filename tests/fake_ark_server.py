@@ -0,0 +1,148 @@
+"""
+本地假方舟服务：模拟 `/chat/completions`（非流式 JSON 与 SSE 流式），用于离线测首字延迟与联调：
+    python tests/fake_ark_server.py --port 18080 --first-token-ms 800 --token-ms 30
+    python tests/fake_ark_server.py --port 18080 --error-rate 0.2 --rate-limit-rate 0.1 --slow-rate 0.05 --slow-ms 8000
+    ARK_BASE_URL=http://127.0.0.1:18080 ARK_API_KEY=fake uvicorn app.main:app
+
+回复文本固定，按字符切成 token；首 token 前等待 first-token-ms，之后每个 token 间隔 token-ms。
+故障注入：按比例返回 5xx / 429（带 Retry-After）或额外延迟 slow-ms，并发超过 max-concurrency 时返回 429；`POST /_fault/outage?on=1` 切换整段故障（全部 503）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import dataclass, field
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+DEFAULT_REPLY = (
+    "好的，以下是一段课中提醒话术：同学们，我们刚才学习了一般现在时第三人称单数的变化规则，"
+    "请大家注意主语是 he、she、it 时动词要加 s 或 es，否定句要用 doesn't 加动词原形。"
+    "接下来请同桌之间互相出两道题练习一下。"
+)
+
+
+@dataclass
+class FakeArkConfig:
+    reply: str = DEFAULT_REPLY
+    first_token_ms: float = 800.0
+    token_ms: float = 30.0
+    chars_per_token: int = 2
+    error_rate: float = 0.0
+    error_status: int = 503
+    rate_limit_rate: float = 0.0
+    retry_after_s: float = 0.2
+    slow_rate: float = 0.0
+    slow_ms: float = 5000.0
+    outage: bool = False
+    max_concurrency: int = 0
+    seed: int | None = None
+    counters: dict[str, int] = field(
+        default_factory=lambda: {"requests": 0, "errors": 0, "rate_limited": 0, "slow": 0, "in_flight": 0}
+    )
+
+
+def _tokens(cfg: FakeArkConfig) -> list[str]:
+    n = max(1, cfg.chars_per_token)
+    return [cfg.reply[i : i + n] for i in range(0, len(cfg.reply), n)]
+
+
+def build_app(cfg: FakeArkConfig) -> FastAPI:
+    app = FastAPI()
+    rnd = random.Random(cfg.seed)
+
+    @app.post("/_fault/outage")
+    async def set_outage(on: int = 1):
+        cfg.outage = bool(on)
+        return {"outage": cfg.outage}
+
+    @app.get("/_fault/counters")
+    async def counters():
+        return cfg.counters
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        tokens = _tokens(cfg)
+        cfg.counters["requests"] += 1
+
+        roll = rnd.random()
+        if cfg.outage or roll < cfg.error_rate:
+            cfg.counters["errors"] += 1
+            return JSONResponse({"error": {"code": "InternalServiceError"}}, status_code=cfg.error_status)
+        over_limit = cfg.max_concurrency > 0 and cfg.counters["in_flight"] >= cfg.max_concurrency
+        if over_limit or roll < cfg.error_rate + cfg.rate_limit_rate:
+            cfg.counters["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"code": "RateLimitExceeded"}},
+                status_code=429,
+                headers={"Retry-After": str(cfg.retry_after_s)},
+            )
+        extra_s = 0.0
+        if rnd.random() < cfg.slow_rate:
+            cfg.counters["slow"] += 1
+            extra_s = cfg.slow_ms / 1000
+
+        if not body.get("stream"):
+            cfg.counters["in_flight"] += 1
+            try:
+                await asyncio.sleep(extra_s + (cfg.first_token_ms + cfg.token_ms * (len(tokens) - 1)) / 1000)
+            finally:
+                cfg.counters["in_flight"] -= 1
+            return JSONResponse({"choices": [{"message": {"role": "assistant", "content": cfg.reply}}]})
+
+        async def events():
+            cfg.counters["in_flight"] += 1
+            try:
+                await asyncio.sleep(extra_s + cfg.first_token_ms / 1000)
+                for i, tok in enumerate(tokens):
+                    if i:
+                        await asyncio.sleep(cfg.token_ms / 1000)
+                    chunk = {"choices": [{"index": 0, "delta": {"content": tok}}]}
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                yield "data: [DONE]\n\n"
+            finally:
+                cfg.counters["in_flight"] -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--first-token-ms", type=float, default=800.0)
+    parser.add_argument("--token-ms", type=float, default=30.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-ms", type=float, default=5000.0)
+    parser.add_argument("--max-concurrency", type=int, default=0, help="超过该并发直接返回 429（模拟方舟并发配额）")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    cfg = FakeArkConfig(
+        first_token_ms=args.first_token_ms,
+        token_ms=args.token_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit_rate=args.rate_limit_rate,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+        max_concurrency=args.max_concurrency,
+        seed=args.seed,
+    )
+    uvicorn.run(build_app(cfg), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,233 @@
+"""
+本地假 ASR 服务：按火山引擎大模型流式语音识别协议（app/core/asr_protocol.py）应答，回放预置的课堂转写文本，
+用于离线联调与测端到端接入延迟：
+    python tests/fake_asr_server.py --port 18081 --utterance-ms 3000 --latency-ms 300
+    ASR_ENABLED=true ASR_WS_URL=ws://127.0.0.1:18081/api/v3/sauc/bigmodel uvicorn app.main:app
+
+每条连接按收到的音频时长推进：每累计 utterance-ms 毫秒音频定稿一句（definite，文本按顺序取自 --transcripts 或内置文本），
+期间每 interim-every 个音频包返回一次未定稿的中间结果；收到最后一包时把剩余音频定稿并以负序号结束。
+PCM 有语音之后连续静音达到 end_window_size（请求里的值，默认 800ms）时判停，把这句定稿到静音开始处。
+结果在处理后延迟 latency-ms 发出（模拟识别耗时）。故障注入：--drop-after-s 在收到该时长音频后直接断开连接，
+--error-rate 按比例在初始化时返回 server error。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.asr_protocol import (  # noqa: E402
+    AUDIO_ONLY_REQUEST,
+    FULL_CLIENT_REQUEST,
+    decode_message,
+    encode_server_error,
+    encode_server_response,
+)
+
+
+DEFAULT_TRANSCRIPTS = (
+    "同学们好，今天我们学习一般现在时的第三人称单数。",
+    "请大家先看黑板上的这几个例句。",
+    "老师，he like apples 这句话对吗？",
+    "不对，主语是 he 的时候动词要加 s，应该是 he likes apples。",
+    "那否定句怎么说呢？",
+    "否定句要用 doesn't 加动词原形，比如 she doesn't play football。",
+    "接下来请同桌之间互相出两道题练习一下。",
+    "我出好了，请你把 it rains every day 改成否定句。",
+)
+
+
+@dataclass
+class FakeAsrConfig:
+    transcripts: tuple[str, ...] = DEFAULT_TRANSCRIPTS
+    utterance_ms: float = 3000.0
+    interim_every: int = 10
+    latency_ms: float = 300.0
+    end_window_ms: int = 800
+    # 峰值低于该值（s16le）的音频包算静音
+    silence_peak: int = 500
+    drop_after_s: float = 0.0
+    error_rate: float = 0.0
+    seed: int | None = None
+    counters: dict[str, int] = field(
+        default_factory=lambda: {"connections": 0, "active": 0, "audio_packets": 0, "finals": 0, "endpoints": 0, "errors": 0, "drops": 0}
+    )
+
+
+def build_app(cfg: FakeAsrConfig) -> FastAPI:
+    app = FastAPI()
+    rnd = random.Random(cfg.seed)
+    next_line = [0]
+
+    def take_line() -> str:
+        line = cfg.transcripts[next_line[0] % len(cfg.transcripts)]
+        next_line[0] += 1
+        return line
+
+    @app.get("/_fault/counters")
+    async def counters():
+        return cfg.counters
+
+    @app.websocket("/api/v3/sauc/bigmodel")
+    async def sauc(websocket: WebSocket):
+        await websocket.accept()
+        cfg.counters["connections"] += 1
+        cfg.counters["active"] += 1
+        outbox: asyncio.Queue = asyncio.Queue()
+
+        async def sender() -> None:
+            # 按入队顺序、在各自的到期时间发出，模拟识别耗时且不乱序
+            while True:
+                item = await outbox.get()
+                if item is None:
+                    return
+                deliver_at, data = item
+                delay = deliver_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await websocket.send_bytes(data)
+
+        send_task = asyncio.create_task(sender())
+
+        def respond(utterances: list[dict], *, seq: int, last: bool = False, audio_ms: float = 0.0) -> None:
+            payload = {
+                "audio_info": {"duration": int(audio_ms)},
+                "result": {"text": "".join(u["text"] for u in utterances), "utterances": utterances},
+            }
+            outbox.put_nowait(
+                (time.perf_counter() + cfg.latency_ms / 1000, encode_server_response(payload, seq=seq, last=last))
+            )
+
+        try:
+            first = decode_message(await websocket.receive_bytes())
+            if first.msg_type != FULL_CLIENT_REQUEST:
+                await websocket.send_bytes(encode_server_error(45000001, "first message must be full client request"))
+                return
+            if rnd.random() < cfg.error_rate:
+                cfg.counters["errors"] += 1
+                await websocket.send_bytes(encode_server_error(55000031, "server busy"))
+                return
+            audio = first.payload.get("audio", {})
+            bytes_per_ms = audio.get("rate", 16000) * audio.get("bits", 16) // 8 * audio.get("channel", 1) / 1000
+            opus = audio.get("codec") == "opus"
+            end_window_ms = int((first.payload.get("request") or {}).get("end_window_size") or cfg.end_window_ms)
+
+            audio_ms = 0.0
+            utt_start = 0.0
+            silence_ms = 0.0
+            packets = 0
+            current = take_line()
+            while True:
+                msg = decode_message(await websocket.receive_bytes())
+                if msg.msg_type != AUDIO_ONLY_REQUEST:
+                    continue
+                packets += 1
+                cfg.counters["audio_packets"] += 1
+                packet_ms = 20.0 if opus and len(msg.payload) else len(msg.payload) / bytes_per_ms
+                audio_ms += packet_ms
+                if not opus and len(msg.payload) >= 2:
+                    samples = array("h", bytes(msg.payload[: len(msg.payload) - len(msg.payload) % 2]))
+                    silent = max(samples) < cfg.silence_peak and -min(samples) < cfg.silence_peak
+                    silence_ms = silence_ms + packet_ms if silent else 0.0
+
+                if cfg.drop_after_s and audio_ms >= cfg.drop_after_s * 1000:
+                    cfg.counters["drops"] += 1
+                    await websocket.close(code=1011)
+                    return
+
+                if msg.is_last:
+                    utterances = []
+                    if audio_ms > utt_start:
+                        cfg.counters["finals"] += 1
+                        utterances.append(
+                            {"text": current, "start_time": int(utt_start), "end_time": int(audio_ms), "definite": True}
+                        )
+                    respond(utterances, seq=msg.seq or -1, last=True, audio_ms=audio_ms)
+                    return
+                if silence_ms >= end_window_ms and audio_ms - silence_ms > utt_start:
+                    # 判停：这句到静音开始处结束，之后的静音不计入下一句
+                    cfg.counters["finals"] += 1
+                    cfg.counters["endpoints"] += 1
+                    utt = {
+                        "text": current,
+                        "start_time": int(utt_start),
+                        "end_time": int(audio_ms - silence_ms),
+                        "definite": True,
+                    }
+                    respond([utt], seq=msg.seq or 1, audio_ms=audio_ms)
+                    utt_start = audio_ms
+                    current = take_line()
+                elif silence_ms >= end_window_ms:
+                    utt_start = audio_ms
+                elif audio_ms - utt_start >= cfg.utterance_ms:
+                    cfg.counters["finals"] += 1
+                    utt = {"text": current, "start_time": int(utt_start), "end_time": int(audio_ms), "definite": True}
+                    respond([utt], seq=msg.seq or 1, audio_ms=audio_ms)
+                    utt_start = audio_ms
+                    current = take_line()
+                elif cfg.interim_every and packets % cfg.interim_every == 0:
+                    progress = (audio_ms - utt_start) / cfg.utterance_ms
+                    partial = current[: max(1, int(len(current) * progress))]
+                    utt = {"text": partial, "start_time": int(utt_start), "end_time": int(audio_ms), "definite": False}
+                    respond([utt], seq=msg.seq or 1, audio_ms=audio_ms)
+        except WebSocketDisconnect:
+            return
+        finally:
+            cfg.counters["active"] -= 1
+            outbox.put_nowait(None)
+            try:
+                await send_task
+            except Exception:
+                pass
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+
+    return app
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18081)
+    parser.add_argument("--transcripts", default=None, help="每行一句的文本文件，按顺序循环回放")
+    parser.add_argument("--utterance-ms", type=float, default=3000.0)
+    parser.add_argument("--interim-every", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--end-window-ms", type=int, default=800, help="请求未带 end_window_size 时的判停静音时长")
+    parser.add_argument("--drop-after-s", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    transcripts = DEFAULT_TRANSCRIPTS
+    if args.transcripts:
+        lines = [ln.strip() for ln in Path(args.transcripts).read_text(encoding="utf-8").splitlines()]
+        transcripts = tuple(ln for ln in lines if ln) or DEFAULT_TRANSCRIPTS
+    cfg = FakeAsrConfig(
+        transcripts=transcripts,
+        utterance_ms=args.utterance_ms,
+        interim_every=args.interim_every,
+        latency_ms=args.latency_ms,
+        end_window_ms=args.end_window_ms,
+        drop_after_s=args.drop_after_s,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(build_app(cfg), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
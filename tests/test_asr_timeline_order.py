@@ -0,0 +1,94 @@
+"""
+ASR 定稿结果乱序到达时的阶段总结覆盖：两个发言人的识别延迟不同，音频时间较早的一条在阶段总结推进游标之后
+才到达，仍应进入下一次阶段总结（时间线按到达时间排序，音频时间只保留在 start_time / end_time 字段）。
+
+阶段总结用桩替代（不调用方舟），需要 Redis；课堂使用随机 session_id，不清空库：
+
+    python tests/test_asr_timeline_order.py --redis-url redis://localhost:6379/15
+    REDIS_URL=redis://localhost:6379/15 python -m pytest -q tests/test_asr_timeline_order.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+from time import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+os.environ.setdefault("ARK_API_KEY", "test")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+# 每次检查都允许总结，只要有新发言
+os.environ["STAGE_SUMMARY_MIN_INTERVAL_S"] = "0"
+os.environ["STAGE_SUMMARY_MIN_CHARS"] = "1"
+
+
+class _StubSummarizer:
+    def __init__(self) -> None:
+        self.texts: list[str] = []
+
+    async def summarize_stage(self, *, utterances_text: str, **_kw):
+        from app.core.summarization import StageSummary
+
+        self.texts.append(utterances_text)
+        return StageSummary(timestamp=time(), summary=f"第 {len(self.texts)} 段", knowledge_points=[], classroom_insights=[])
+
+
+async def _run() -> None:
+    # settings 在导入时读取环境变量，放在函数里导入以便 --redis-url 生效
+    from app.core.app_context import AppContext
+    from app.core.asr_client import AsrResult, AsrSpeaker
+
+    ctx = AppContext()
+    stub = _StubSummarizer()
+    ctx.stage_scheduler._summarizer = stub
+    session_id = f"test-asr-order-{uuid.uuid4().hex[:8]}"
+    teacher = AsrSpeaker(user_id="t1", user_name="王老师", role="teacher")
+    student = AsrSpeaker(user_id="s1", user_name="小明", role="student")
+    try:
+        await ctx.store.init_classroom(session_id, {"session_id": session_id})
+        t0 = time() - 10
+        # 学生先开口（音频时间更早），但识别更慢；老师后开口、先出定稿
+        await ctx._on_asr_result(
+            session_id, teacher, AsrResult(text="今天讲分数的加法", confidence=None, start_time=t0 + 3, end_time=t0 + 5)
+        )
+        await ctx.stage_scheduler._process_session(session_id)
+        await ctx._on_asr_result(
+            session_id, student, AsrResult(text="老师我有个问题", confidence=None, start_time=t0 + 1, end_time=t0 + 2)
+        )
+        await ctx.stage_scheduler._process_session(session_id)
+
+        assert len(stub.texts) == 2, stub.texts
+        assert "今天讲分数的加法" in stub.texts[0] and "老师我有个问题" not in stub.texts[0], stub.texts
+        assert "老师我有个问题" in stub.texts[1] and "今天讲分数的加法" not in stub.texts[1], stub.texts
+
+        items, _ = await ctx.store.read_utterances(session_id, cursor=None, start_ts_exclusive=0.0, limit=10)
+        by_text = {u["text"]: u for u in items}
+        assert [u["text"] for u in items] == ["今天讲分数的加法", "老师我有个问题"]
+        assert by_text["老师我有个问题"]["start_time"] == t0 + 1
+        assert by_text["老师我有个问题"]["end_time"] == t0 + 2
+    finally:
+        await ctx.shutdown()
+
+
+def test_late_asr_result_after_stage_summary_is_summarized() -> None:
+    asyncio.run(_run())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+    test_late_asr_result_after_stage_summary_is_summarized()
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,64 @@
+"""
+VAD 丢弃静音后 ASR 的时间换算与段落结束：段落结束不再带 is_last（ASR 连接保持），只透传客户端的结束帧；
+服务端按已发送音频计的偏移换算回 timestamp 时跳过被丢弃的静音（不需要 Redis 与网络）。
+
+    python tests/test_asr_vad_segments.py
+    python -m pytest -q tests/test_asr_vad_segments.py
+"""
+
+from __future__ import annotations
+
+import struct
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.asr_client import _SentAudioClock  # noqa: E402
+from app.multimodal.vad import VadConfig, VoiceActivityDetector  # noqa: E402
+
+_RATE = 16000
+_FRAME = _RATE // 10  # 100ms
+
+
+def _tone() -> bytes:
+    return struct.pack(f"<{_FRAME}h", *(8000 if (i // 20) % 2 else -8000 for i in range(_FRAME)))
+
+
+def test_clock_skips_dropped_silence() -> None:
+    clock = _SentAudioClock(_RATE * 2)
+    # 0~1s 发言，1~4s 静音被丢弃，4~5s 再次发言
+    for i in range(10):
+        clock.sent(100.0 + i * 0.1, _FRAME * 2)
+    for i in range(10):
+        clock.sent(104.0 + i * 0.1, _FRAME * 2)
+    assert abs(clock.to_ts(500) - 100.5) < 1e-9
+    assert abs(clock.to_ts(1500) - 104.5) < 1e-9
+    assert clock.spans(100.5, 110.0) == [(100.5, 101.0), (104.0, 105.0)]
+
+
+def test_segment_end_keeps_stream_open() -> None:
+    det = VoiceActivityDetector(VadConfig(sample_rate=_RATE, hangover_ms=200), backend="python")
+    silence = bytes(_FRAME * 2)
+    out = []
+    frames = [_tone()] * 5 + [silence] * 10 + [_tone()] * 5 + [silence] * 2
+    for i, audio in enumerate(frames):
+        out += det.process([("c", "u", 100.0 + i * 0.1, audio, False)])[0]
+    assert det.segments == 2
+    assert not any(last for _, _, last in out)
+    # 客户端的结束帧是静音：补一个空的结束帧
+    (last,) = det.process([("c", "u", 110.0, silence, True)])
+    assert last == [(110.0, b"", True)]
+    # 之后没有放行过音频，再来一个静音结束帧不再补发
+    assert det.process([("c", "u", 110.1, silence, True)]) == [[]]
+
+
+def main() -> int:
+    test_clock_skips_dropped_silence()
+    test_segment_end_keeps_stream_open()
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
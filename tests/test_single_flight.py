@@ -0,0 +1,185 @@
+"""
+SingleFlight 的取消语义：某个调用方取消只影响它自己；所有调用方都离开后才取消底层请求并移除 key；
+流式请求中途加入的调用方先补发已收到的增量（不需要 Redis 与网络）。
+
+    python tests/test_single_flight.py
+    python -m pytest -q tests/test_single_flight.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.llm.single_flight import SingleFlight  # noqa: E402
+
+
+class _Upstream:
+    """可控的底层请求：release 之前一直挂起，记录调用与取消次数。"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def call(self) -> str:
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return "result"
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_cancelled_waiter_detaches() -> None:
+    async def run() -> None:
+        sf, up = SingleFlight(), _Upstream()
+        a = asyncio.create_task(sf.do("k", up.call))
+        b = asyncio.create_task(sf.do("k", up.call))
+        await _settle()
+        a.cancel()
+        await _settle()
+        assert a.cancelled()
+        assert up.cancelled == 0
+        up.release.set()
+        assert await b == "result"
+        assert up.calls == 1
+        assert sf.stats() == {"in_flight": 0, "coalesced": 1, "abandoned": 0}
+
+    asyncio.run(run())
+
+
+def test_all_waiters_cancelled_cancels_request() -> None:
+    async def run() -> None:
+        sf, up = SingleFlight(), _Upstream()
+        waiters = [asyncio.create_task(sf.do("k", up.call)) for _ in range(3)]
+        await _settle()
+        for w in waiters:
+            w.cancel()
+        await _settle()
+        assert up.cancelled == 1
+        assert sf.stats()["in_flight"] == 0 and sf.stats()["abandoned"] == 1
+        # key 已移除：相同请求重新发起
+        up.release.set()
+        assert await sf.do("k", up.call) == "result"
+        assert up.calls == 2
+
+    asyncio.run(run())
+
+
+def test_stream_late_joiner_replays_earlier_deltas() -> None:
+    async def run() -> None:
+        sf = SingleFlight()
+        gate = asyncio.Event()
+        produced = 0
+
+        async def source():
+            nonlocal produced
+            for piece in ("a", "b"):
+                produced += 1
+                yield piece
+            await gate.wait()
+            for piece in ("c", "d"):
+                produced += 1
+                yield piece
+
+        async def collect(out: list[str]) -> None:
+            async for piece in sf.stream("k", source):
+                out.append(piece)
+
+        first: list[str] = []
+        late: list[str] = []
+        t1 = asyncio.create_task(collect(first))
+        await _settle()
+        assert first == ["a", "b"]
+        t2 = asyncio.create_task(collect(late))
+        await _settle()
+        assert late == ["a", "b"]
+        gate.set()
+        await asyncio.gather(t1, t2)
+        assert first == late == ["a", "b", "c", "d"]
+        assert produced == 4
+        assert sf.stats()["in_flight"] == 0 and sf.stats()["coalesced"] == 1
+
+    asyncio.run(run())
+
+
+def test_stream_all_consumers_leave_cancels_producer() -> None:
+    async def run() -> None:
+        sf = SingleFlight()
+        closed = asyncio.Event()
+
+        async def source():
+            try:
+                yield "a"
+                await asyncio.Event().wait()
+                yield "never"
+            finally:
+                closed.set()
+
+        async def consume() -> None:
+            async for _ in sf.stream("k", source):
+                pass
+
+        consumers = [asyncio.create_task(consume()) for _ in range(2)]
+        await _settle()
+        for c in consumers:
+            c.cancel()
+        await asyncio.wait_for(closed.wait(), timeout=1.0)
+        assert sf.stats()["in_flight"] == 0 and sf.stats()["abandoned"] == 1
+
+    asyncio.run(run())
+
+
+def test_stream_producer_cancelled_surfaces_to_consumers() -> None:
+    async def run() -> None:
+        sf = SingleFlight()
+
+        async def source():
+            yield "a"
+            await asyncio.Event().wait()
+
+        got: list[str] = []
+        errors: list[BaseException] = []
+
+        async def consume() -> None:
+            try:
+                async for piece in sf.stream("k", source):
+                    got.append(piece)
+            except asyncio.CancelledError as e:
+                errors.append(e)
+
+        consumer = asyncio.create_task(consume())
+        await _settle()
+        # 底层请求被外部取消（例如进程退出）：_produce 把 CancelledError 记为 shared.error，调用方收到同样的异常
+        (shared,) = sf._streams.values()
+        shared.task.cancel()
+        await asyncio.wait_for(consumer, timeout=1.0)
+        assert got == ["a"]
+        assert len(errors) == 1 and isinstance(errors[0], asyncio.CancelledError)
+        assert sf.stats()["in_flight"] == 0
+
+    asyncio.run(run())
+
+
+def main() -> int:
+    test_cancelled_waiter_detaches()
+    test_all_waiters_cancelled_cancels_request()
+    test_stream_late_joiner_replays_earlier_deltas()
+    test_stream_all_consumers_leave_cancels_producer()
+    test_stream_producer_cancelled_surfaces_to_consumers()
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
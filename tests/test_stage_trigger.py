@@ -0,0 +1,116 @@
+"""
+阶段总结触发引擎（StageSummaryTrigger）的计数：阶段总结的 LLM 调用期间到达的发言不在本次窗口里，
+总结完成后仍要计入待总结字符数，满足 min_chars 时重新排期。存储与 LLM 用桩替代，不需要 Redis。
+
+    python tests/test_stage_trigger.py
+    python -m pytest -q tests/test_stage_trigger.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.schedulers import StageSummaryScheduler  # noqa: E402
+from app.core.stage_trigger import StageSummaryTrigger  # noqa: E402
+from app.core.summarization import StageSummary  # noqa: E402
+from app.infra.redis_fact_store import SessionProgress  # noqa: E402
+
+
+def test_utterances_during_llm_call_stay_pending() -> None:
+    trigger = StageSummaryTrigger(min_chars=100, min_interval_s=60)
+    trigger.track("c1")
+    trigger.on_utterance("c1", 1000.0, 120)
+    # 1000 的发言触发总结；LLM 调用期间 1005 的发言到达，1006 总结完成，窗口只覆盖到 1000
+    trigger.on_utterance("c1", 1005.0, 90)
+    trigger.on_summarized("c1", 1000.0)
+    trigger.on_utterance("c1", 1007.0, 20)
+
+    st = trigger._states["c1"]
+    assert st.pending_chars == 110, st
+    assert st.armed_at == 1000.0 + 60, st
+    assert trigger.pop_due(now=1059.0) == []
+    assert trigger.pop_due(now=1060.0) == ["c1"]
+
+
+def test_summarized_window_drops_covered_chars() -> None:
+    trigger = StageSummaryTrigger(min_chars=100, min_interval_s=60)
+    trigger.track("c1")
+    trigger.on_utterance("c1", 1000.0, 120)
+    trigger.on_utterance("c1", 1005.0, 90)
+    trigger.on_summarized("c1", 1005.0)
+    # 已被覆盖的时间戳（例如写入延迟到达的重复事件）不再计数
+    trigger.on_utterance("c1", 1004.0, 50)
+
+    st = trigger._states["c1"]
+    assert st.pending_chars == 0, st
+    assert st.armed_at is None, st
+
+
+class _Store:
+    def __init__(self, utterances: list[dict]) -> None:
+        self.utterances = utterances
+        self.summaries: list[dict] = []
+
+    async def get_progress(self, session_id: str) -> SessionProgress:
+        return SessionProgress(status="RUNNING", last_stage_summary_ts=0.0, last_utterance_ts=0.0)
+
+    async def read_utterances(self, session_id: str, *, cursor, start_ts_exclusive: float, limit: int):
+        return self.utterances[:limit], "c"
+
+    async def append_stage_summary(self, session_id: str, timestamp: float, summary: dict, *, cursor=None) -> None:
+        self.summaries.append(summary)
+
+
+class _Summarizer:
+    def __init__(self, on_call) -> None:
+        self._on_call = on_call
+
+    async def summarize_stage(self, *, utterances_text: str, **_kw) -> StageSummary:
+        self._on_call()
+        return StageSummary(timestamp=1006.0, summary="s", knowledge_points=[], classroom_insights=[])
+
+
+def test_scheduler_keeps_utterances_that_arrive_during_summary() -> None:
+    settings = SimpleNamespace(
+        stage_summary_tick_interval_s=1.0,
+        stage_summary_concurrency=1,
+        stage_summary_trigger="event",
+        stage_summary_min_chars=100,
+        stage_summary_min_interval_s=60,
+        stage_summary_max_utterances=200,
+    )
+    first = {"timestamp": 1000.0, "role": "teacher", "user_name": "王老师", "text": "甲" * 100}
+    during = {"timestamp": 1005.0, "role": "student", "user_name": "小明", "text": "乙" * 90}
+    store = _Store([first])
+    scheduler = StageSummaryScheduler(
+        store=store,
+        summarizer=_Summarizer(lambda: scheduler.on_utterance("c1", during)),
+        settings=settings,
+    )
+    scheduler.on_session_opened("c1")
+    scheduler.on_utterance("c1", first)
+    asyncio.run(scheduler._process_session("c1"))
+
+    st = scheduler._trigger._states["c1"]
+    assert store.summaries and store.summaries[0]["window"]["end_ts_inclusive"] == 1000.0
+    assert st.last_summary_ts == 1000.0, st
+    assert st.pending and st.pending[0][0] == 1005.0, st
+    scheduler.on_utterance("c1", {"timestamp": 1007.0, "role": "student", "user_name": "小红", "text": "丙" * 10})
+    assert st.pending_chars >= 100 and st.armed_at is not None, st
+
+
+def main() -> int:
+    test_utterances_during_llm_call_stay_pending()
+    test_summarized_window_drops_covered_chars()
+    test_scheduler_keeps_utterances_that_arrive_during_summary()
+    print("ok")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())